@@ -0,0 +1,156 @@
+"""
+Async versions of the hot read endpoints, served under /api/async/.
+
+They take the same parameters and return the same JSON as the project list,
+detail, search and feedback thread views, but are Django async views that
+read through the async ORM (``async for``, ``aget``) and the async cache API.
+Under an ASGI server such as uvicorn (see README) a request that is waiting
+on the database or the cache then no longer pins a worker thread, so one
+process can hold many more open requests than it has threads.
+
+Django 4.2 still runs each ORM query in a thread through ``sync_to_async``,
+so the queries themselves are no cheaper; what is saved is the thread held
+for the rest of the request. The search ranking and the facet counts, which
+are plain ORM code shared with the sync views, are called the same way.
+"""
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.http import HttpResponse
+from rest_framework import status
+from rest_framework.exceptions import APIException, AuthenticationFailed, NotAuthenticated, NotFound
+from rest_framework.request import Request
+from rest_framework.utils.urls import replace_query_param
+
+from . import caching, facets, fieldsets, search, search_logs
+from .authentication import CachedJWTAuthentication
+from .models import Project
+from .pagination import FeedbackThreadPagination, KeysetPagination
+from .renderers import FastJSONRenderer
+from .serializers import FeedbackThreadSerializer, ProjectSerializer
+from .views import ProjectFeedbackView, ProjectSearchView
+
+renderer = FastJSONRenderer()
+
+
+def render(data, status_code=status.HTTP_200_OK, headers=None):
+    return HttpResponse(renderer.render(data), status=status_code, content_type='application/json', headers=headers)
+
+
+def api_view(view):
+    """
+    Wrap an async read view: GET only, DRF's Request for the query parameters
+    and the user, and DRF exceptions rendered as DRF's handler renders them.
+    The credentials are checked up front, as DRF's views do, so a bad token is
+    rejected even by views that never look at the user.
+    """
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD'):
+            return render({'detail': f'Method "{request.method}" not allowed.'}, status.HTTP_405_METHOD_NOT_ALLOWED)
+        authenticator = CachedJWTAuthentication()
+        request = Request(request, authenticators=[authenticator])
+        try:
+            await sync_to_async(lambda: request.user)()
+            return await view(request, *args, **kwargs)
+        except APIException as exc:
+            data = exc.detail if isinstance(exc.detail, (list, dict)) else {'detail': exc.detail}
+            headers = None
+            if isinstance(exc, (AuthenticationFailed, NotAuthenticated)):
+                headers = {'WWW-Authenticate': authenticator.authenticate_header(request)}
+            return render(data, exc.status_code, headers)
+    return wrapper
+
+
+async def cached(request, resources, build):
+    data, headers = await caching.acached_data(request, resources, build)
+    if data is None:
+        return HttpResponse(status=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return render(data, headers=headers)
+
+
+def serialize_projects(projects, fields, request):
+    return ProjectSerializer(projects, many=True, fields=fields, context={'request': request}).data
+
+
+@api_view
+async def project_list(request):
+    fields = fieldsets.from_request(request, ProjectSerializer)
+    filters = facets.from_request(request)
+    names = facets.requested(request)
+
+    async def build():
+        paginator = KeysetPagination()
+        rating_index = await sync_to_async(facets.use_rating_index)(filters, paginator.get_page_size(request))
+        queryset = facets.filter_queryset(Project.objects.all(), filters, rating_index=rating_index)
+        keep = [field.lstrip('-') for field in paginator.ordering]
+        page = await paginator.apaginate_queryset(fieldsets.shape(queryset, ProjectSerializer, fields, keep), request)
+        data = paginator.get_paginated_response(serialize_projects(page, fields, request)).data
+        if names:
+            data['facets'] = await sync_to_async(facets.count)(filters, names)
+        return data
+    return await cached(request, ['projects', 'users'], build)
+
+
+@api_view
+async def project_detail(request, pk):
+    fields = fieldsets.from_request(request, ProjectSerializer)
+
+    async def build():
+        try:
+            project = await fieldsets.shape(Project.objects.all(), ProjectSerializer, fields).aget(pk=pk)
+        except Project.DoesNotExist:
+            raise NotFound('No Project matches the given query.')
+        return ProjectSerializer(project, fields=fields, context={'request': request}).data
+    return await cached(request, [f'project:{pk}', 'users'], build)
+
+
+@api_view
+async def project_search(request):
+    view = ProjectSearchView()
+    keyword = request.query_params.get('q', '')
+    categories = [
+        category
+        for value in request.query_params.getlist('category')
+        for category in value.split(',') if category
+    ]
+    page = view.get_int_param(request, 'page', 1)
+    page_size = min(view.get_int_param(request, 'page_size', view.page_size), view.max_page_size)
+    fields = fieldsets.from_request(request, ProjectSerializer)
+    offset = (page - 1) * page_size
+
+    if search.tokenize(keyword):
+        ranked = await sync_to_async(search.search)(keyword, categories, offset, page_size + 1)
+        ids = [project_id for project_id, score in ranked]
+    else:
+        projects = Project.objects.order_by('-created_at', '-id')
+        if categories:
+            projects = projects.filter(category__in=categories)
+        ids = [project_id async for project_id in projects.values_list('id', flat=True)[offset:offset + page_size + 1]]
+
+    has_next = len(ids) > page_size
+    ids = ids[:page_size]
+    if page == 1:
+        # A full log buffer flushes inside record(), which must not run on the event loop
+        await sync_to_async(lambda: search_logs.record(request.user.id, keyword, len(ids)))()
+    position = {project_id: index for index, project_id in enumerate(ids)}
+    projects = [
+        project async for project in fieldsets.shape(Project.objects.filter(id__in=ids), ProjectSerializer, fields)
+    ]
+    projects.sort(key=lambda project: position[project.id])
+
+    next_link = None
+    if has_next:
+        next_link = replace_query_param(request.build_absolute_uri(), 'page', page + 1)
+    return render({'next': next_link, 'results': serialize_projects(projects, fields, request)})
+
+
+@api_view
+async def project_feedback(request, project_id):
+    async def build():
+        paginator = FeedbackThreadPagination()
+        page = await paginator.apaginate_queryset(ProjectFeedbackView().get_queryset(project_id), request)
+        serializer = FeedbackThreadSerializer(page, many=True, context={'request': request})
+        return paginator.get_paginated_response(serializer.data).data
+    # Comments embed their author's name and avatar
+    return await cached(request, [f'project:{project_id}', 'users'], build)
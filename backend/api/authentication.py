@@ -0,0 +1,95 @@
+"""
+JWT authentication that does not load the user row on every request.
+
+After the token is validated, the principal (the few user fields that
+permissions and views read) is taken from a short-lived in-process cache
+instead of a query. Each request gets its own ``User`` instance built from the
+cached values; any other field is loaded lazily if a view touches it.
+
+Saving or deleting a user bumps its ``user:<id>`` version stamp (see
+``caching``), and a cached principal is only used while its stamp is current,
+so a change or deactivation takes effect on the next request of every process
+that shares the cache. Bulk ``update()`` calls skip the signals; those changes
+are picked up once ``AUTH_PRINCIPAL_TTL`` runs out. Each process keeps at most
+``AUTH_PRINCIPAL_CACHE_SIZE`` principals, dropping the least recently used.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+
+from . import caching
+from .models import User
+
+PRINCIPAL_FIELDS = ('id', 'username', 'role', 'is_active', 'is_staff', 'is_superuser')
+# Model.from_db() takes the loaded fields in model order
+_loaded_fields = [field.attname for field in User._meta.concrete_fields if field.attname in PRINCIPAL_FIELDS]
+
+# user id -> (expires at, version stamps, field values), least recently used first
+_principals = OrderedDict()
+_lock = threading.Lock()
+
+
+def ttl():
+    return getattr(settings, 'AUTH_PRINCIPAL_TTL', 60)
+
+
+def max_entries():
+    return getattr(settings, 'AUTH_PRINCIPAL_CACHE_SIZE', 10000)
+
+
+def resource(user_id):
+    return f'user:{user_id}'
+
+
+def forget(user_id=None):
+    """Drop one cached principal, or all of them."""
+    with _lock:
+        if user_id is None:
+            _principals.clear()
+        else:
+            _principals.pop(user_id, None)
+
+
+def principal(user_id):
+    """Return a ``User`` with the principal fields loaded, or None if there is no such user."""
+    stamps = caching.versions([resource(user_id)])
+    now = time.monotonic()
+    with _lock:
+        entry = _principals.get(user_id)
+        if entry is not None:
+            _principals.move_to_end(user_id)
+    if entry is None or entry[0] <= now or entry[1] != stamps:
+        # The stamps were read before the row, so a change made after this
+        # query moves them and the entry is never served stale
+        values = User.objects.filter(pk=user_id).values_list(*_loaded_fields).first()
+        if values is None:
+            forget(user_id)
+            return None
+        entry = (now + ttl(), stamps, values)
+        with _lock:
+            _principals[user_id] = entry
+            _principals.move_to_end(user_id)
+            while len(_principals) > max_entries():
+                _principals.popitem(last=False)
+    return User.from_db('default', _loaded_fields, entry[2])
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_('Token contained no recognizable user identification'))
+
+        user = principal(user_id)
+        if user is None:
+            raise AuthenticationFailed(_('User not found'), code='user_not_found')
+        if not user.is_active:
+            raise AuthenticationFailed(_('User is inactive'), code='user_inactive')
+        return user
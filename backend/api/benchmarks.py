@@ -0,0 +1,459 @@
+"""
+Helpers for the benchmark_api and benchmark_concurrency management commands.
+
+Endpoints are driven in-process through Django's test client from a pool of
+threads, so the numbers cover URL routing, views, serializers and the database
+but not the network or an application server. The helpers for
+benchmark_concurrency at the end of the file run gunicorn and uvicorn instead
+and send them real HTTP requests.
+"""
+import asyncio
+import itertools
+import json
+import math
+import resource
+import socket
+import subprocess
+import sys
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Count
+from django.test import Client, RequestFactory, override_settings
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.tokens import AccessToken
+
+from . import leaderboard
+from .authentication import CachedJWTAuthentication
+from .models import Feedback, Project, User
+from .renderers import FastJSONRenderer
+from .serializers import FeedbackSerializer, FeedbackThreadSerializer, ProjectSerializer
+
+# Metrics where a larger value is a regression, and those where a smaller one is
+HIGHER_IS_WORSE = ('p50_ms', 'p95_ms', 'p99_ms', 'queries_per_request', 'peak_memory_kb')
+LOWER_IS_WORSE = ('throughput_rps',)
+
+
+class QueryCounter:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of an already sorted list."""
+    if not values:
+        return 0.0
+    # Rounded first so that e.g. 0.1 * 30 is rank 3, not 4
+    rank = math.ceil(round(fraction * len(values), 9))
+    return values[min(max(rank - 1, 0), len(values) - 1)]
+
+
+def default_endpoints():
+    """The endpoints to benchmark, resolved against the seeded data."""
+    popular = (
+        Feedback.objects.order_by().values('project_id')
+        .annotate(n=Count('id')).order_by('-n').values_list('project_id', flat=True).first()
+    )
+    endpoints = {
+        'project_list': '/api/projects/?page_size=20',
+        'project_search': '/api/projects/search/?q=platform',
+        'leaderboard': '/api/leaderboard/',
+    }
+    if popular is not None:
+        endpoints['project_feedback'] = f'/api/projects/{popular}/feedback/'
+    return endpoints
+
+
+def cache_buster(path):
+    """
+    Return a function giving a variant of ``path`` that no cache has answered
+    yet: its own query string misses the response cache, and leaderboards,
+    which are cached by their parameters, are dropped first.
+    """
+    numbers = itertools.count()
+    separator = '&' if '?' in path else '?'
+    board_keys = leaderboard.cached_board_keys() if path.startswith('/api/leaderboard/') else []
+
+    def target():
+        if board_keys:
+            cache.delete_many(board_keys)
+        return f'{path}{separator}nocache={next(numbers)}'
+    return target
+
+
+def drive(path, requests=200, concurrency=8, warmup=5, headers=None, bust_cache=True):
+    """
+    Send ``requests`` GETs to ``path`` from ``concurrency`` threads and
+    summarize them. With ``bust_cache`` no request is answered from a cache,
+    so the numbers cover the view, the serializer and the queries.
+    """
+    headers = headers or {}
+    latencies = []
+    queries = []
+    errors = []
+    lock = threading.Lock()
+    target = cache_buster(path) if bust_cache else lambda: path
+
+    def worker(count):
+        client = Client()
+        counter = QueryCounter()
+        own_latencies, own_queries, own_errors = [], [], 0
+        try:
+            with connection.execute_wrapper(counter):
+                for _ in range(count):
+                    url = target()
+                    before = counter.count
+                    started = time.perf_counter()
+                    response = client.get(url, **headers)
+                    own_latencies.append((time.perf_counter() - started) * 1000)
+                    own_queries.append(counter.count - before)
+                    own_errors += response.status_code >= 400
+        finally:
+            connection.close()
+        with lock:
+            latencies.extend(own_latencies)
+            queries.extend(own_queries)
+            errors.append(own_errors)
+
+    warm = Client()
+    for _ in range(warmup):
+        warm.get(target(), **headers)
+
+    shares = [requests // concurrency + (i < requests % concurrency) for i in range(concurrency)]
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(worker, [share for share in shares if share]))
+    wall = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        'requests': len(latencies),
+        'errors': sum(errors),
+        'p50_ms': round(percentile(latencies, 0.50), 3),
+        'p95_ms': round(percentile(latencies, 0.95), 3),
+        'p99_ms': round(percentile(latencies, 0.99), 3),
+        'throughput_rps': round(len(latencies) / wall, 1) if wall else 0.0,
+        'queries_per_request': round(sum(queries) / len(queries), 2) if queries else 0.0,
+        'peak_memory_kb': peak_memory(target, headers),
+    }
+
+
+def auth_scenarios():
+    """Authentication alone, per request: the stock JWT class against the cached-principal one."""
+    return {'auth_jwt': JWTAuthentication, 'auth_cached_jwt': CachedJWTAuthentication}
+
+
+def drive_auth(authentication_class, requests=200, warmup=5):
+    """Authenticate ``requests`` bearer-token requests with ``authentication_class`` and summarize them."""
+    user = User.objects.filter(is_active=True).order_by('id').first()
+    token = str(AccessToken.for_user(user))
+    authenticator = authentication_class()
+    factory = RequestFactory()
+
+    def authenticate():
+        request = Request(factory.get('/api/', HTTP_AUTHORIZATION=f'Bearer {token}'))
+        return authenticator.authenticate(request)
+
+    for _ in range(warmup):
+        authenticate()
+    counter = QueryCounter()
+    latencies, errors = [], 0
+    started = time.perf_counter()
+    with connection.execute_wrapper(counter):
+        for _ in range(requests):
+            began = time.perf_counter()
+            errors += authenticate() is None
+            latencies.append((time.perf_counter() - began) * 1000)
+    wall = time.perf_counter() - started
+
+    tracemalloc.start()
+    try:
+        authenticate()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    latencies.sort()
+    return {
+        'requests': len(latencies),
+        'errors': errors,
+        'p50_ms': round(percentile(latencies, 0.50), 3),
+        'p95_ms': round(percentile(latencies, 0.95), 3),
+        'p99_ms': round(percentile(latencies, 0.99), 3),
+        'throughput_rps': round(len(latencies) / wall, 1) if wall else 0.0,
+        'queries_per_request': round(counter.count / len(latencies), 2) if latencies else 0.0,
+        'peak_memory_kb': round(peak / 1024, 1),
+    }
+
+
+def serialization_pages(rows=10000):
+    """(serializer class, instances) pairs for the list serializers, loaded the way their views load them."""
+    projects = list(
+        Project.objects.select_related('user', 'rating_stats', 'thumbnail_image')
+        .prefetch_related('feedback_set').order_by('-created_at', '-id')[:rows]
+    )
+    feedbacks = list(Feedback.objects.select_related('user__avatar').order_by('created_at', 'id')[:rows])
+    return {
+        'project_list': (ProjectSerializer, projects),
+        'feedback_list': (FeedbackSerializer, feedbacks),
+        'feedback_thread': (FeedbackThreadSerializer, feedbacks),
+    }
+
+
+def serialize_page(serializer_class, instances, renderer, fast, repeat=3):
+    """Best-of-``repeat`` seconds to serialize and to render ``instances``, and the rendered bytes."""
+    context = {'request': Request(RequestFactory().get('/api/'))}
+    serialize_times, render_times = [], []
+    with override_settings(FAST_LIST_SERIALIZERS=fast):
+        for _ in range(repeat):
+            started = time.perf_counter()
+            data = serializer_class(instances, many=True, context=context).data
+            serialized = time.perf_counter()
+            body = renderer.render(data)
+            serialize_times.append(serialized - started)
+            render_times.append(time.perf_counter() - serialized)
+    return min(serialize_times), min(render_times), body
+
+
+def serialization_throughput(serializer_class, instances, repeat=3):
+    """Rows per second through DRF's serializers and JSONRenderer, and through the fast path."""
+    results = {}
+    bodies = {}
+    modes = {'drf': (JSONRenderer(), False), 'fast': (FastJSONRenderer(), True)}
+    for mode, (renderer, fast) in modes.items():
+        serialize, render, bodies[mode] = serialize_page(serializer_class, instances, renderer, fast, repeat)
+        results[mode] = {
+            'rows': len(instances),
+            'serialize_rows_per_s': round(len(instances) / serialize, 1) if serialize else 0.0,
+            'render_rows_per_s': round(len(instances) / render, 1) if render else 0.0,
+            'total_rows_per_s': round(len(instances) / (serialize + render), 1) if serialize + render else 0.0,
+        }
+    results['identical'] = bodies['drf'] == bodies['fast']
+    return results
+
+
+def peak_memory(target, headers=None, repeat=3):
+    """Peak Python allocation while serving one request to ``target()``, measured apart from the latency run."""
+    client = Client()
+    peak = 0
+    for _ in range(repeat):
+        url = target()
+        tracemalloc.start()
+        try:
+            client.get(url, **(headers or {}))
+            peak = max(peak, tracemalloc.get_traced_memory()[1])
+        finally:
+            tracemalloc.stop()
+    return round(peak / 1024, 1)
+
+
+def compare(results, baseline, tolerance):
+    """Return a list of human-readable regressions of ``results`` against ``baseline``."""
+    regressions = []
+    for name, metrics in results.items():
+        base = baseline.get(name)
+        if not base:
+            continue
+        for metric in HIGHER_IS_WORSE:
+            # Query counts are deterministic, so any increase counts
+            allowed = 0 if metric == 'queries_per_request' else tolerance
+            if metric in base and metrics[metric] > base[metric] * (1 + allowed) + 1e-9:
+                regressions.append(f'{name}: {metric} {metrics[metric]} > baseline {base[metric]}')
+        for metric in LOWER_IS_WORSE:
+            if metric in base and metrics[metric] < base[metric] * (1 - tolerance):
+                regressions.append(f'{name}: {metric} {metrics[metric]} < baseline {base[metric]}')
+    return regressions
+
+
+def load_baseline(path):
+    with open(path) as handle:
+        return json.load(handle)
+
+
+def save_baseline(path, results):
+    with open(path, 'w') as handle:
+        json.dump(results, handle, indent=2, sort_keys=True)
+        handle.write('\n')
+
+
+# benchmark_concurrency: real application servers driven over HTTP
+
+# mode: (server, URL prefix of the endpoints it is sent)
+CONCURRENCY_MODES = {
+    'wsgi': ('gunicorn', '/api/'),
+    'asgi': ('uvicorn', '/api/async/'),
+    'asgi_sync_views': ('uvicorn', '/api/'),
+}
+# Seconds both servers keep an idle connection open
+KEEP_ALIVE = 75
+
+
+def concurrency_endpoints(project_id):
+    """The read endpoints that have async versions, relative to a mode's URL prefix."""
+    return {
+        'project_list': 'projects/?page_size=20',
+        'project_detail': f'projects/{project_id}/',
+        'project_search': 'projects/search/?q=platform',
+        'project_feedback': f'projects/{project_id}/feedback/',
+    }
+
+
+def server_command(server, port, workers, threads, connections):
+    if server == 'gunicorn':
+        # gthread stops accepting at --worker-connections and only keeps that
+        # many minus --threads connections alive, so leave room for every client.
+        # An overloaded worker can take longer than the default 2s keep-alive to
+        # read a request that is already waiting, and would drop the connection.
+        return [
+            sys.executable, '-m', 'gunicorn', 'config.wsgi:application',
+            '--bind', f'127.0.0.1:{port}', '--workers', str(workers),
+            '--worker-class', 'gthread', '--threads', str(threads),
+            '--worker-connections', str(2 * connections), '--backlog', str(2 * connections),
+            '--keep-alive', str(KEEP_ALIVE), '--log-level', 'warning',
+        ]
+    return [
+        sys.executable, '-m', 'uvicorn', 'config.asgi:application',
+        '--host', '127.0.0.1', '--port', str(port), '--workers', str(workers),
+        '--backlog', str(2 * connections), '--timeout-keep-alive', str(KEEP_ALIVE),
+        '--lifespan', 'off', '--no-access-log', '--log-level', 'warning',
+    ]
+
+
+def manage(*args, env):
+    """Run a manage.py command in a child process with ``env``."""
+    subprocess.run([sys.executable, 'manage.py', *args], cwd=settings.BASE_DIR, env=env, check=True)
+
+
+@contextmanager
+def serve(command, port, env, timeout=30):
+    """Start an application server and wait until it answers on ``port``."""
+    process = subprocess.Popen(command, cwd=settings.BASE_DIR, env=env)
+    try:
+        deadline = time.monotonic() + timeout
+        while True:
+            if process.poll() is not None:
+                raise RuntimeError(f'{command[2]} exited with status {process.returncode}')
+            try:
+                if request_once(port, '/api/projects/?page_size=1')[0] == 200:
+                    break
+            except OSError:
+                pass
+            if time.monotonic() > deadline:
+                raise RuntimeError(f'{command[2]} did not answer on port {port} within {timeout}s')
+            time.sleep(0.2)
+        yield process
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait()
+
+
+def request_once(port, path):
+    """(status, body) of one GET, for setup rather than measurement."""
+    with socket.create_connection(('127.0.0.1', port), timeout=5) as sock:
+        sock.sendall(f'GET {path} HTTP/1.1\r\nHost: 127.0.0.1\r\nConnection: close\r\n\r\n'.encode())
+        response = b''
+        while chunk := sock.recv(65536):
+            response += chunk
+    head, _, body = response.partition(b'\r\n\r\n')
+    return int(head.split()[1]), body
+
+
+async def read_response(reader):
+    """Read one HTTP/1.1 response; returns (status, whether the server is closing the connection)."""
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionError('Connection closed by the server')
+    status = int(status_line.split()[1])
+    length, chunked, close = 0, False, False
+    while (line := await reader.readline()) not in (b'\r\n', b''):
+        name, _, value = line.decode('latin-1').partition(':')
+        name, value = name.strip().lower(), value.strip().lower()
+        if name == 'content-length':
+            length = int(value)
+        elif name == 'transfer-encoding':
+            chunked = 'chunked' in value
+        elif name == 'connection':
+            close = value == 'close'
+    if chunked:
+        while size := int((await reader.readline()).split(b';')[0], 16):
+            await reader.readexactly(size + 2)
+        await reader.readline()
+    else:
+        await reader.readexactly(length)
+    return status, close
+
+
+async def hammer(port, path, connections, duration, bust_cache=True, timeout=30):
+    """
+    Keep ``connections`` keep-alive connections busy with GETs of ``path`` for
+    ``duration`` seconds and summarize the responses. With ``bust_cache`` every
+    request gets its own query string so none is answered from the response cache.
+    """
+    latencies = []
+    errors = 0
+    numbers = itertools.count()
+    separator = '&' if '?' in path else '?'
+    deadline = time.perf_counter() + duration
+
+    async def client():
+        nonlocal errors
+        reader = writer = None
+        while time.perf_counter() < deadline:
+            target = f'{path}{separator}nocache={next(numbers)}' if bust_cache else path
+            try:
+                if writer is None:
+                    reader, writer = await asyncio.wait_for(asyncio.open_connection('127.0.0.1', port), timeout)
+                started = time.perf_counter()
+                writer.write(f'GET {target} HTTP/1.1\r\nHost: 127.0.0.1\r\n\r\n'.encode())
+                await writer.drain()
+                status, close = await asyncio.wait_for(read_response(reader), timeout)
+                latencies.append((time.perf_counter() - started) * 1000)
+                errors += status >= 400
+            except (OSError, ValueError, asyncio.IncompleteReadError, asyncio.TimeoutError):
+                errors += 1
+                close = True
+                await asyncio.sleep(0.05)
+            if close and writer is not None:
+                writer.close()
+                reader = writer = None
+        if writer is not None:
+            writer.close()
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(connections)))
+    wall = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        'requests': len(latencies),
+        'errors': errors,
+        'p50_ms': round(percentile(latencies, 0.50), 3),
+        'p95_ms': round(percentile(latencies, 0.95), 3),
+        'p99_ms': round(percentile(latencies, 0.99), 3),
+        'throughput_rps': round(len(latencies) / wall, 1) if wall else 0.0,
+    }
+
+
+def raise_open_file_limit(needed):
+    """Raise the soft limit on open files towards ``needed``, as far as the hard limit allows."""
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft != resource.RLIM_INFINITY and soft < needed:
+        target = needed if hard == resource.RLIM_INFINITY else min(needed, hard)
+        resource.setrlimit(resource.RLIMIT_NOFILE, (target, hard))
+    return resource.getrlimit(resource.RLIMIT_NOFILE)[0]
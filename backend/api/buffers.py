@@ -0,0 +1,114 @@
+import atexit
+import itertools
+import logging
+import threading
+import time
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+_buffers = []
+
+
+class WriteBehindBuffer:
+    """
+    Collects writes in memory and hands them to ``flush_fn`` in batches.
+
+    A batch is flushed when it reaches ``max_size`` items, when a request
+    finishes after the oldest item has waited ``max_age`` seconds, or at exit.
+    Items added with the same key replace each other, so repeated writes to
+    the same row collapse into one. Items being flushed stay visible through
+    ``get`` and ``pending`` until the flush has finished. An item added while
+    another with its key was being flushed is passed, with the flushed one, to
+    ``rebase(item, flushed)`` once the flush succeeds, for items that record
+    what they change from.
+    """
+
+    def __init__(self, name, flush_fn, max_size=None, max_age=None, rebase=None):
+        self.name = name
+        self.flush_fn = flush_fn
+        self.rebase = rebase
+        self.max_size = max_size or getattr(settings, 'WRITE_BEHIND_MAX_SIZE', 500)
+        self.max_age = max_age if max_age is not None else getattr(settings, 'WRITE_BEHIND_MAX_AGE', 1.0)
+        self.lock = threading.Lock()
+        self.flush_lock = threading.Lock()
+        self.items = {}
+        self.flushing = {}
+        self.first_added = None
+        self.sequence = itertools.count()
+        _buffers.append(self)
+
+    def __len__(self):
+        return len(self.items)
+
+    def add(self, item, key=None):
+        if key is None:
+            key = ('seq', next(self.sequence))
+        with self.lock:
+            self.items.pop(key, None)
+            self.items[key] = item
+            if self.first_added is None:
+                self.first_added = time.monotonic()
+            full = len(self.items) >= self.max_size
+        if full:
+            self.flush()
+
+    def get(self, key, default=None):
+        with self.lock:
+            if key in self.items:
+                return self.items[key]
+            return self.flushing.get(key, default)
+
+    def pending(self):
+        with self.lock:
+            return list({**self.flushing, **self.items}.values())
+
+    def is_due(self):
+        with self.lock:
+            if not self.items:
+                return False
+            return len(self.items) >= self.max_size or time.monotonic() - self.first_added >= self.max_age
+
+    def flush(self):
+        """Write out everything buffered so far. Returns the number of items written."""
+        with self.flush_lock:
+            with self.lock:
+                batch, self.items = self.items, {}
+                self.flushing = batch
+                self.first_added = None
+            if not batch:
+                return 0
+            flushed = False
+            try:
+                self.flush_fn(list(batch.values()))
+                flushed = True
+            except Exception:
+                logger.exception('Flushing the %s buffer failed; %d items requeued', self.name, len(batch))
+                with self.lock:
+                    # Newer writes to the same key win over the failed batch
+                    self.items = {**{k: v for k, v in batch.items() if k not in self.items}, **self.items}
+                    if self.first_added is None:
+                        self.first_added = time.monotonic()
+                return 0
+            finally:
+                with self.lock:
+                    if flushed and self.rebase is not None:
+                        for key in batch.keys() & self.items.keys():
+                            self.items[key] = self.rebase(self.items[key], batch[key])
+                    self.flushing = {}
+            return len(batch)
+
+
+def flush_due():
+    for buffer in _buffers:
+        if buffer.is_due():
+            buffer.flush()
+
+
+def flush_all():
+    for buffer in _buffers:
+        buffer.flush()
+
+
+atexit.register(flush_all)
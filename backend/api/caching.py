@@ -0,0 +1,141 @@
+"""
+Version stamps and conditional GET for the public read endpoints.
+
+Every cacheable resource (e.g. ``projects`` or ``project:12``) has a version
+stamp in the cache that is bumped whenever something it depends on is saved or
+deleted. A response's ETag is derived from the request and the stamps of the
+resources it depends on, so a client holding a current ETag gets a 304 without
+the view touching the database, and the serialized body is cached under the
+same ETag until one of those stamps moves.
+"""
+import hashlib
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.http import http_date, parse_etags, parse_http_date_safe
+from rest_framework import status
+from rest_framework.response import Response
+
+VERSION_PREFIX = 'version:'
+RESPONSE_PREFIX = 'response:'
+RESPONSE_TIMEOUT = 60 * 60
+# Every response also depends on this stamp
+GLOBAL_RESOURCE = 'all'
+
+
+def _stamp():
+    return time.time_ns()
+
+
+def bump(*resources):
+    """Move the stamps of the given resources now and again once the transaction commits."""
+    def apply():
+        now = _stamp()
+        cache.set_many({VERSION_PREFIX + resource: now for resource in resources}, None)
+
+    # The second bump drops anything cached from a read that ran before the commit
+    apply()
+    transaction.on_commit(apply)
+
+
+def bump_all():
+    """Invalidate every cached response, after bulk writes that skip the signals."""
+    bump(GLOBAL_RESOURCE)
+
+
+def versions(resources):
+    keys = [VERSION_PREFIX + resource for resource in [GLOBAL_RESOURCE, *resources]]
+    stamps = cache.get_many(keys)
+    missing = {key: _stamp() for key in keys if key not in stamps}
+    if missing:
+        cache.set_many(missing, None)
+        stamps.update(missing)
+    return [stamps[key] for key in keys]
+
+
+async def aversions(resources):
+    keys = [VERSION_PREFIX + resource for resource in [GLOBAL_RESOURCE, *resources]]
+    stamps = await cache.aget_many(keys)
+    missing = {key: _stamp() for key in keys if key not in stamps}
+    if missing:
+        await cache.aset_many(missing, None)
+        stamps.update(missing)
+    return [stamps[key] for key in keys]
+
+
+def make_etag(request, stamps):
+    renderer = getattr(request, 'accepted_media_type', '')
+    identity = f'{request.build_absolute_uri()}|{renderer}|' + ','.join(str(stamp) for stamp in stamps)
+    return '"' + hashlib.md5(identity.encode('utf-8')).hexdigest() + '"'
+
+
+def is_not_modified(request, etag, last_modified):
+    # "*" is left to matches_any(), since it only matches a resource that exists
+    if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+    if if_none_match:
+        etags = [tag.removeprefix('W/') for tag in parse_etags(if_none_match)]
+        return etag in etags
+    if_modified_since = parse_http_date_safe(request.META.get('HTTP_IF_MODIFIED_SINCE', ''))
+    return if_modified_since is not None and int(last_modified) <= if_modified_since
+
+
+def matches_any(request):
+    return '*' in parse_etags(request.META.get('HTTP_IF_NONE_MATCH', ''))
+
+
+class ConditionalCacheMixin:
+    """
+    Adds ``cached_response`` to a view: answers If-None-Match/If-Modified-Since
+    with 304 and otherwise serves the cached body for the current versions.
+    """
+    cache_resources = ()
+
+    def get_cache_resources(self):
+        return list(self.cache_resources)
+
+    def cached_response(self, request, build):
+        etag, headers, not_modified = validators(request, versions(self.get_cache_resources()))
+        if not_modified:
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+        key = RESPONSE_PREFIX + etag
+        data = cache.get(key)
+        if data is None:
+            data = build()
+            cache.set(key, data, RESPONSE_TIMEOUT)
+        if matches_any(request):
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers=headers)
+        return Response(data, headers=headers)
+
+
+def validators(request, stamps):
+    """(etag, response headers, whether the client's copy is current) for the given stamps."""
+    etag = make_etag(request, stamps)
+    last_modified = max(stamps) / 1e9
+    headers = {
+        'ETag': etag,
+        'Last-Modified': http_date(last_modified),
+        'Cache-Control': 'no-cache',
+    }
+    return etag, headers, is_not_modified(request, etag, last_modified)
+
+
+async def acached_data(request, resources, build):
+    """
+    ConditionalCacheMixin.cached_response for async views. ``build`` is a
+    coroutine function. Returns (data, headers); data is None when the client's
+    copy is current and the response should be a 304.
+    """
+    etag, headers, not_modified = validators(request, await aversions(resources))
+    if not_modified:
+        return None, headers
+
+    key = RESPONSE_PREFIX + etag
+    data = await cache.aget(key)
+    if data is None:
+        data = await build()
+        await cache.aset(key, data, RESPONSE_TIMEOUT)
+    if matches_any(request):
+        return None, headers
+    return data, headers
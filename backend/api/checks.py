@@ -0,0 +1,43 @@
+"""
+System checks for settings that only go wrong once there are several workers.
+
+Version stamps, cached responses, leaderboards and the authentication stamps
+all live in the default cache. With a per-process cache every worker keeps
+its own copy, so a write handled by one worker leaves the others serving
+stale responses and still accepting deactivated users.
+"""
+import os
+
+from django.conf import settings
+from django.core import checks
+from django.core.exceptions import ImproperlyConfigured
+
+PER_PROCESS_CACHES = ('django.core.cache.backends.locmem.LocMemCache',)
+
+
+def worker_count():
+    """Server processes, from WEB_CONCURRENCY as uvicorn and gunicorn read it."""
+    try:
+        return int(os.environ.get('WEB_CONCURRENCY', 1))
+    except ValueError:
+        return 1
+
+
+@checks.register(checks.Tags.caches)
+def check_shared_cache(app_configs=None, **kwargs):
+    backend = settings.CACHES['default']['BACKEND']
+    if worker_count() > 1 and backend in PER_PROCESS_CACHES:
+        return [checks.Error(
+            f'WEB_CONCURRENCY is {worker_count()} but the default cache is {backend}, '
+            'which each worker keeps to itself.',
+            hint='Set REDIS_URL to share a Redis cache between the workers, or run a single worker.',
+            id='api.E001',
+        )]
+    return []
+
+
+def require_shared_cache():
+    """Refuse to start a server whose workers would not share the cache."""
+    errors = check_shared_cache()
+    if errors:
+        raise ImproperlyConfigured(f'{errors[0].msg} {errors[0].hint}')
@@ -0,0 +1,304 @@
+"""
+Live project updates: a publish/subscribe broker and the Server-Sent Events
+stream on /api/projects/<id>/events/.
+
+Writes publish a small event per change, built once however many clients are
+listening: ``feedback`` (a comment as the feedback thread serializes it),
+``feedback_deleted`` ({'id': ...}), ``reactions`` (the project's counts) and
+``ratings`` (the project's rating summary). Clients apply them to what they
+have already loaded instead of polling the thread and the counts.
+
+EVENTS_BROKER picks the broker. InProcessBroker fans out to the listeners of
+the same process, which covers runserver and a single uvicorn worker.
+LocalSocketBroker also forwards every event to the other worker processes on
+the same host through Unix datagram sockets in EVENTS_SOCKET_DIR. Another
+transport, such as Redis pub/sub, needs a class with the same publish(),
+subscribe() and unsubscribe().
+
+Under ASGI each stream is an async generator that holds no thread while it
+waits. Under WSGI it blocks one of the server's threads for as long as it is
+open. Streams end after EVENTS_STREAM_TIMEOUT seconds, or as soon as a client
+falls EVENTS_QUEUE_SIZE events behind. The browser's EventSource then
+reconnects by itself, and the client reloads what it shows.
+"""
+import asyncio
+import atexit
+import json
+import logging
+import os
+import queue
+import socket
+import tempfile
+import threading
+import time
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.db import transaction
+from django.http import StreamingHttpResponse
+from django.utils.module_loading import import_string
+
+from .renderers import FastJSONRenderer
+
+logger = logging.getLogger(__name__)
+
+renderer = FastJSONRenderer()
+
+
+def channel(project_id):
+    return f'project:{project_id}'
+
+
+def stream_timeout():
+    return getattr(settings, 'EVENTS_STREAM_TIMEOUT', 5 * 60)
+
+
+def heartbeat_interval():
+    return getattr(settings, 'EVENTS_HEARTBEAT', 15)
+
+
+class Subscription:
+    """One listener's queue of events on a channel, read from a thread."""
+
+    def __init__(self, channel):
+        self.channel = channel
+        self.queue = self.make_queue(getattr(settings, 'EVENTS_QUEUE_SIZE', 100))
+        self.overflowed = False
+
+    def make_queue(self, size):
+        return queue.Queue(size)
+
+    def deliver(self, event):
+        """Queue an event. Called from whichever thread published it."""
+        self.put(event)
+
+    def put(self, event):
+        try:
+            self.queue.put_nowait(event)
+        except (queue.Full, asyncio.QueueFull):
+            self.overflowed = True
+
+    def get(self, timeout):
+        """The next event, or None after ``timeout`` seconds without one."""
+        try:
+            return self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+class AsyncSubscription(Subscription):
+    """A Subscription read from an event loop. Create it on that loop."""
+
+    def __init__(self, channel):
+        self.loop = asyncio.get_running_loop()
+        super().__init__(channel)
+
+    def make_queue(self, size):
+        return asyncio.Queue(size)
+
+    def deliver(self, event):
+        try:
+            self.loop.call_soon_threadsafe(self.put, event)
+        except RuntimeError:
+            # The loop has closed; the stream is gone
+            pass
+
+    async def get(self, timeout):
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+class InProcessBroker:
+    """Fans events out to the subscriptions of this process."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.subscriptions = {}
+
+    def subscribe(self, channel, subscription_class=Subscription):
+        subscription = subscription_class(channel)
+        with self.lock:
+            self.subscriptions.setdefault(channel, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self.lock:
+            listeners = self.subscriptions.get(subscription.channel, set())
+            listeners.discard(subscription)
+            if not listeners:
+                self.subscriptions.pop(subscription.channel, None)
+
+    def has_listeners(self, channel):
+        with self.lock:
+            return bool(self.subscriptions.get(channel))
+
+    def publish(self, channel, event):
+        self.dispatch(channel, event)
+
+    def dispatch(self, channel, event):
+        with self.lock:
+            listeners = list(self.subscriptions.get(channel, ()))
+        for subscription in listeners:
+            subscription.deliver(event)
+
+
+class LocalSocketBroker(InProcessBroker):
+    """
+    An InProcessBroker that also passes events between the worker processes
+    of one host. A broker binds a socket named after its process in
+    ``directory`` once something subscribes to it, and a publisher sends each
+    event to every socket there but its own. Sockets left behind by dead
+    workers are removed when a send is refused.
+    """
+
+    def __init__(self, directory=None):
+        super().__init__()
+        self.directory = directory or getattr(settings, 'EVENTS_SOCKET_DIR', None) or os.path.join(
+            tempfile.gettempdir(), 'void-events'
+        )
+        os.makedirs(self.directory, exist_ok=True)
+        self.path = os.path.join(self.directory, f'{os.getpid()}-{id(self):x}.sock')
+        self.sender = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self.receiver = None
+
+    def subscribe(self, channel, subscription_class=Subscription):
+        self.listen()
+        return super().subscribe(channel, subscription_class)
+
+    def has_listeners(self, channel):
+        # Other workers' listeners are unknown; any worker listening may care
+        return super().has_listeners(channel) or any(self.peers())
+
+    def listen(self):
+        with self.lock:
+            if self.receiver is not None:
+                return
+            if os.path.exists(self.path):
+                os.unlink(self.path)
+            self.receiver = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+            self.receiver.bind(self.path)
+        atexit.register(self.close)
+        threading.Thread(target=self.receive, name='events-receiver', daemon=True).start()
+
+    def receive(self):
+        while True:
+            try:
+                message = json.loads(self.receiver.recv(1 << 20))
+            except OSError:
+                return
+            except ValueError:
+                logger.warning('Dropped a malformed event message')
+                continue
+            self.dispatch(message['channel'], message['event'])
+
+    def peers(self):
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            if name.endswith('.sock') and path != self.path:
+                yield path
+
+    def publish(self, channel, event):
+        self.dispatch(channel, event)
+        message = renderer.render({'channel': channel, 'event': event})
+        for path in self.peers():
+            try:
+                self.sender.sendto(message, path)
+            except (ConnectionRefusedError, FileNotFoundError):
+                try:
+                    os.unlink(path)
+                except FileNotFoundError:
+                    pass
+            except OSError:
+                logger.exception('Sending an event to %s failed', path)
+
+    def close(self):
+        if self.receiver is not None:
+            self.receiver.close()
+            try:
+                os.unlink(self.path)
+            except FileNotFoundError:
+                pass
+
+
+@lru_cache(maxsize=None)
+def broker():
+    return import_string(getattr(settings, 'EVENTS_BROKER', 'api.events.InProcessBroker'))()
+
+
+def publish(project_id, event_type, build):
+    """
+    Publish an event on a project's channel once the current transaction
+    commits. ``build`` returns the event's data and is only called when
+    someone may be listening, so unwatched projects cost no queries.
+    """
+    def send():
+        name = channel(project_id)
+        if not broker().has_listeners(name):
+            return
+        try:
+            broker().publish(name, {'type': event_type, 'data': build()})
+        except Exception:
+            # Live updates are best effort and must never fail the write
+            logger.exception('Publishing %s on %s failed', event_type, name)
+    transaction.on_commit(send)
+
+
+def absolute_media_urls(value, request):
+    """Event data is built without a request, so its media URLs are made absolute per stream."""
+    if isinstance(value, str) and value.startswith(settings.MEDIA_URL):
+        return request.build_absolute_uri(value)
+    if isinstance(value, dict):
+        return {key: absolute_media_urls(item, request) for key, item in value.items()}
+    if isinstance(value, list):
+        return [absolute_media_urls(item, request) for item in value]
+    return value
+
+
+def encode(event, request):
+    data = renderer.render(absolute_media_urls(event['data'], request))
+    return b'event: ' + event['type'].encode() + b'\ndata: ' + data + b'\n\n'
+
+
+RETRY = b'retry: 3000\n\n'
+HEARTBEAT = b': keepalive\n\n'
+
+
+def stream(request, project_id):
+    """A text/event-stream response with the project's events."""
+    name = channel(project_id)
+    if isinstance(request, ASGIRequest):
+        content = async_events(name, request)
+    else:
+        content = sync_events(name, request)
+    response = StreamingHttpResponse(content, content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # Keeps nginx and similar proxies from buffering the stream
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+def sync_events(name, request):
+    subscription = broker().subscribe(name)
+    try:
+        yield RETRY
+        deadline = time.monotonic() + stream_timeout()
+        while not subscription.overflowed and (remaining := deadline - time.monotonic()) > 0:
+            event = subscription.get(min(heartbeat_interval(), remaining))
+            yield HEARTBEAT if event is None else encode(event, request)
+    finally:
+        broker().unsubscribe(subscription)
+
+
+async def async_events(name, request):
+    subscription = broker().subscribe(name, AsyncSubscription)
+    try:
+        yield RETRY
+        deadline = time.monotonic() + stream_timeout()
+        while not subscription.overflowed and (remaining := deadline - time.monotonic()) > 0:
+            event = await subscription.get(min(heartbeat_interval(), remaining))
+            yield HEARTBEAT if event is None else encode(event, request)
+    finally:
+        broker().unsubscribe(subscription)
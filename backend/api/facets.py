@@ -0,0 +1,277 @@
+"""
+Server-side filters and facet counts for the project list.
+
+``?category=``, ``?institution=`` and ``?author=`` (usernames) take one or
+more comma-separated values. ``?rating_min=`` and ``?rating_max=`` bound the
+overall average rating, which leaves out projects nobody has rated.
+``?facets=category,institution`` adds the number of matching projects per
+value to the response. Each facet is counted with every filter but its own, so
+the counts say how many projects picking that value as well would show.
+
+The filters read indexed columns: the author's institution is copied onto the
+project and the average rating is stored with the rating aggregates. The
+counts come from ProjectFacetCount, which holds the number of projects per
+category, institution and half-star bin of the average rating, and is kept up
+to date by ``track()`` around every change to those three, so counting is a
+sum over a few thousand rows however many projects there are. A rating bound
+that falls inside a bin leaves that bin's projects to be counted from the
+project table, as is everything under a filter on authors, which narrows the
+list down to a handful of projects.
+"""
+import math
+from collections import Counter
+from contextlib import contextmanager
+from functools import reduce
+from operator import or_
+
+from django.db import transaction
+from django.db.models import Count, ExpressionWrapper, F, FloatField, OuterRef, Q, Subquery, Sum
+from rest_framework.exceptions import ValidationError
+
+from .fieldsets import parse
+from .models import Project, ProjectFacetCount, User
+
+FACETS = ('category', 'institution')
+# Institutions can run into the thousands; only the most common are counted
+FACET_LIMIT = 20
+RATING_BOUNDS = ('rating_min', 'rating_max')
+# Width of the rating bins in ProjectFacetCount
+RATING_STEP = 0.5
+
+
+def parse_rating(request, name, errors):
+    value = request.query_params.get(name)
+    if value in (None, ''):
+        return None
+    try:
+        rating = float(value)
+    except ValueError:
+        rating = math.nan
+    if not math.isfinite(rating):
+        errors[name] = 'A number is required.'
+        return None
+    return rating
+
+
+def from_request(request):
+    """Validate the filter parameters and return them as {name: values or bound}."""
+    errors = {}
+    filters = {name: parse(request, name) for name in ('category', 'institution', 'author')}
+    categories = {choice for choice, label in Project.CATEGORY_CHOICES}
+    unknown = sorted(set(filters['category']) - categories)
+    if unknown:
+        errors['category'] = f"Unknown categories: {', '.join(unknown)}."
+    for name in RATING_BOUNDS:
+        filters[name] = parse_rating(request, name, errors)
+    if errors:
+        raise ValidationError(errors)
+    return filters
+
+
+def requested(request):
+    """The facets named by ``?facets=``."""
+    names = parse(request, 'facets')
+    unknown = sorted(set(names) - set(FACETS))
+    if unknown:
+        raise ValidationError({'facets': f"Unknown facets: {', '.join(unknown)}; choose from {', '.join(FACETS)}."})
+    return [name for name in FACETS if name in names]
+
+
+def rating_bounds(filters, field):
+    bounds = {}
+    if filters['rating_min'] is not None:
+        bounds[f'{field}__gte'] = filters['rating_min']
+    if filters['rating_max'] is not None:
+        bounds[f'{field}__lte'] = filters['rating_max']
+    return bounds
+
+
+def rating_bin(rating):
+    return math.floor(rating / RATING_STEP) * RATING_STEP
+
+
+def split_rating_bounds(filters):
+    """
+    Split the rating bounds over the bins: returns (Q over the counts for the
+    bins wholly in range, bins the bounds cut through).
+    """
+    whole, cut = Q(), set()
+    if filters['rating_min'] is not None:
+        whole &= Q(rating__gte=filters['rating_min'])
+        if rating_bin(filters['rating_min']) < filters['rating_min']:
+            cut.add(rating_bin(filters['rating_min']))
+    if filters['rating_max'] is not None:
+        whole &= Q(rating__lte=filters['rating_max'] - RATING_STEP)
+        cut.add(rating_bin(filters['rating_max']))
+    return whole, sorted(cut)
+
+
+def in_bins(bins, field):
+    return reduce(or_, (Q(**{f'{field}__gte': low, f'{field}__lt': low + RATING_STEP}) for low in bins))
+
+
+def use_rating_index(filters, page_size):
+    """
+    Whether a page of rating-filtered projects is cheaper to find through the
+    rating index than by walking the list in date order. The index reads every
+    project in range and sorts them, the walk reads about page_size * total /
+    matching projects. SQLite cannot tell a narrow range from a wide one; the
+    facet counts can.
+    """
+    if not rating_bounds(filters, 'rating'):
+        return True
+    whole, cut = split_rating_bounds(filters)
+    # Counting the cut bins whole overestimates a little, which is fine here
+    in_range = (whole | Q(rating__in=cut)) if cut else whole
+    totals = ProjectFacetCount.objects.aggregate(
+        total=Sum('count'),
+        matching=Sum('count', filter=in_range & ~Q(rating=ProjectFacetCount.UNRATED)),
+    )
+    matching = totals['matching'] or 0
+    return matching * matching <= page_size * (totals['total'] or 0)
+
+
+def filter_queryset(queryset, filters, skip=None, rating='rating_stats__overall_average', rating_index=True):
+    """
+    Apply ``filters`` to a project queryset, or with ``rating='rating'`` to the
+    facet counts, leaving out the filter named ``skip``. ``rating_index=False``
+    hides the rating column from the index; see use_rating_index().
+    """
+    if filters['category'] and skip != 'category':
+        queryset = queryset.filter(category__in=filters['category'])
+    if filters['institution'] and skip != 'institution':
+        queryset = queryset.filter(institution__in=filters['institution'])
+    if filters['author']:
+        queryset = queryset.filter(user__username__in=filters['author'])
+    bounds = rating_bounds(filters, rating if rating_index else 'unindexed_rating')
+    if bounds and not rating_index:
+        # rating + 0 matches the same rows but cannot be looked up in the index
+        queryset = queryset.alias(unindexed_rating=ExpressionWrapper(F(rating) + 0.0, output_field=FloatField()))
+    return queryset.filter(**bounds)
+
+
+def count_projects(projects, name):
+    return (
+        projects.exclude(Q(**{f'{name}__isnull': True}) | Q(**{name: ''}))
+        .order_by().values(name)
+        .annotate(count=Count('pk'))
+    )
+
+
+def count_values(filters, name):
+    if filters['author']:
+        rows = count_projects(filter_queryset(Project.objects.all(), filters, skip=name), name)
+        cut = []
+    else:
+        counts = ProjectFacetCount.objects.exclude(**{name: ''})
+        cut = []
+        if rating_bounds(filters, 'rating'):
+            whole, cut = split_rating_bounds(filters)
+            counts = counts.exclude(rating=ProjectFacetCount.UNRATED).filter(whole)
+        unbounded = {**filters, 'rating_min': None, 'rating_max': None}
+        rows = (
+            filter_queryset(counts, unbounded, skip=name, rating='rating')
+            .order_by().values(name)
+            .annotate(count=Sum('count'))
+            .filter(count__gt=0)
+        )
+    if not cut:
+        return [
+            {'value': row[name], 'count': row['count']}
+            for row in rows.order_by('-count', name)[:FACET_LIMIT]
+        ]
+
+    # Add the projects in the bins the bounds cut through, counted one by one
+    totals = Counter({row[name]: row['count'] for row in rows})
+    projects = filter_queryset(Project.objects.all(), filters, skip=name)
+    projects = projects.filter(in_bins(cut, 'rating_stats__overall_average'))
+    totals.update({row[name]: row['count'] for row in count_projects(projects, name)})
+    ordered = sorted(totals.items(), key=lambda item: (-item[1], item[0]))
+    return [{'value': value, 'count': total} for value, total in ordered[:FACET_LIMIT]]
+
+
+def count(filters, names):
+    """{facet: [{'value': ..., 'count': ...}]} with the most common values first."""
+    return {name: count_values(filters, name) for name in names}
+
+
+# Maintaining ProjectFacetCount
+
+def cell(category, institution, rating):
+    return category, institution or '', ProjectFacetCount.UNRATED if rating is None else rating_bin(rating)
+
+
+def project_cells(projects):
+    """Counter of the cells the given projects are counted in."""
+    rows = projects.order_by().values_list('category', 'institution', 'rating_stats__overall_average')
+    return Counter(cell(*row) for row in rows)
+
+
+def adjust(deltas):
+    """Apply {(category, institution, rating): change} to the counts."""
+    deltas = {key: delta for key, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    with transaction.atomic():
+        ProjectFacetCount.objects.bulk_create(
+            [ProjectFacetCount(category=category, institution=institution, rating=rating)
+             for category, institution, rating in deltas],
+            ignore_conflicts=True,
+        )
+        for (category, institution, rating), delta in deltas.items():
+            ProjectFacetCount.objects.filter(category=category, institution=institution, rating=rating).update(
+                count=F('count') + delta
+            )
+
+
+@contextmanager
+def track(projects):
+    """Move the given projects to their new cells once the block has changed them."""
+    with transaction.atomic():
+        before = project_cells(projects)
+        yield
+        after = project_cells(projects)
+        after.subtract(before)
+        adjust(after)
+
+
+def rebuild_counts(batch_size=1000):
+    """Recompute the counts from the project table. Returns the number of cells written."""
+    counts = Counter()
+    rows = (
+        Project.objects.order_by()
+        .values_list('category', 'institution', 'rating_stats__overall_average')
+        .annotate(count=Count('pk'))
+    )
+    for category, institution, rating, total in rows:
+        counts[cell(category, institution, rating)] += total
+    with transaction.atomic():
+        ProjectFacetCount.objects.all().delete()
+        ProjectFacetCount.objects.bulk_create(
+            [
+                ProjectFacetCount(category=category, institution=institution, rating=rating, count=total)
+                for (category, institution, rating), total in counts.items()
+            ],
+            batch_size=batch_size,
+        )
+    return len(counts)
+
+
+def copy_institution(user_id, institution):
+    """Copy one author's institution onto their projects. Returns the number of projects changed."""
+    projects = Project.objects.filter(user_id=user_id)
+    with track(projects):
+        return projects.exclude(institution=institution).update(institution=institution)
+
+
+def sync_institutions(user_ids=None):
+    """
+    Copy every author's institution, or only the given authors', onto their
+    projects, after bulk writes that skip the signals. The counts need a
+    rebuild_counts() afterwards.
+    """
+    projects = Project.objects.all()
+    if user_ids is not None:
+        projects = projects.filter(user_id__in=user_ids)
+    institution = User.objects.filter(pk=OuterRef('user_id')).values('institution')[:1]
+    return projects.update(institution=Subquery(institution))
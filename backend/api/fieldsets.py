@@ -0,0 +1,68 @@
+"""
+Sparse fieldsets (``?fields=``) and opt-in nested data (``?expand=``).
+
+A serializer that supports them declares three things. ``expandable_fields``
+are left out unless requested. ``field_sources`` maps a field to the columns
+it reads; a field that is not listed reads the column of the same name.
+``prefetch_fields`` maps a nested field to the relation it walks. The views
+shape the queryset from the same selection, so a response that only needs a
+few fields neither transfers nor queries the rest.
+"""
+from rest_framework.exceptions import ValidationError
+
+
+def parse(request, name):
+    """Comma-separated names from one or more ``name`` query parameters."""
+    return [
+        item.strip()
+        for value in request.query_params.getlist(name)
+        for item in value.split(',') if item.strip()
+    ]
+
+
+def select(serializer_class, fields=None, expand=None):
+    """
+    The names to serialize, in declaration order: ``fields`` when given, else
+    every field that is not expandable, plus the ``expand`` ones.
+    """
+    declared = serializer_class.Meta.fields
+    chosen = set(fields) if fields else set(declared) - set(serializer_class.expandable_fields)
+    chosen.update(expand or ())
+    return [name for name in declared if name in chosen]
+
+
+def from_request(request, serializer_class):
+    """Validate ``?fields=`` and ``?expand=`` and return the names to serialize."""
+    fields, expand = parse(request, 'fields'), parse(request, 'expand')
+    errors = {}
+    unknown = sorted(set(fields) - set(serializer_class.Meta.fields))
+    if unknown:
+        errors['fields'] = f"Unknown fields: {', '.join(unknown)}."
+    not_expandable = sorted(set(expand) - set(serializer_class.expandable_fields))
+    if not_expandable:
+        errors['expand'] = (
+            f"Cannot expand {', '.join(not_expandable)}; "
+            f"choose from {', '.join(serializer_class.expandable_fields)}."
+        )
+    if errors:
+        raise ValidationError(errors)
+    return select(serializer_class, fields, expand)
+
+
+def shape(queryset, serializer_class, selected, keep=('id',)):
+    """
+    Restrict ``queryset`` to the columns, joins and prefetches the ``selected``
+    fields read. ``keep`` names columns needed regardless, such as the ordering.
+    """
+    only = set(keep)
+    related = set()
+    prefetch = []
+    for name in selected:
+        for source in serializer_class.field_sources.get(name, [name]):
+            only.add(source)
+            if '__' in source:
+                related.add(source.rsplit('__', 1)[0])
+        if name in serializer_class.prefetch_fields:
+            prefetch.append(serializer_class.prefetch_fields[name])
+    queryset = queryset.select_related(*sorted(related)).only(*sorted(only))
+    return queryset.prefetch_related(*prefetch) if prefetch else queryset
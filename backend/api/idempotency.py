@@ -0,0 +1,89 @@
+"""
+Client idempotency keys for unsafe requests.
+
+A client that may retry a request sends the same ``Idempotency-Key`` header
+each time. The first successful response is stored with a fingerprint of the
+request, so a retry gets that response replayed instead of repeating the
+write, and reusing a key for a different request is rejected.
+"""
+import hashlib
+import json
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework.exceptions import APIException, ValidationError
+from rest_framework.response import Response
+
+from .models import IdempotencyKey
+
+HEADER = 'HTTP_IDEMPOTENCY_KEY'
+MAX_KEY_LENGTH = 255
+
+
+class KeyReused(APIException):
+    status_code = 422
+    default_detail = 'This Idempotency-Key was already used for a different request.'
+    default_code = 'idempotency_key_reused'
+
+
+def ttl():
+    return timedelta(seconds=getattr(settings, 'IDEMPOTENCY_KEY_TTL', 24 * 60 * 60))
+
+
+def fingerprint(request):
+    body = json.dumps(request.data, sort_keys=True, default=str)
+    return hashlib.sha256(f'{request.method} {request.path}\n{body}'.encode('utf-8')).hexdigest()
+
+
+def replay(user, key, digest):
+    """The stored response for ``key``, or None if it has not been used (or has expired)."""
+    stored = IdempotencyKey.objects.filter(user=user, key=key).first()
+    if stored is None:
+        return None
+    if stored.created_at < timezone.now() - ttl():
+        stored.delete()
+        return None
+    if stored.fingerprint != digest:
+        raise KeyReused()
+    return Response(stored.response, status=stored.status_code, headers={'Idempotent-Replayed': 'true'})
+
+
+def idempotent(request, handler):
+    """
+    Run ``handler`` (which returns a Response) at most once per Idempotency-Key.
+    The handler's writes and the stored response commit together; error
+    responses are not stored so the client can fix the request and retry.
+    """
+    key = request.META.get(HEADER)
+    if not key:
+        return handler()
+    if len(key) > MAX_KEY_LENGTH:
+        raise ValidationError({'Idempotency-Key': f'Keys are at most {MAX_KEY_LENGTH} characters.'})
+
+    digest = fingerprint(request)
+    stored = replay(request.user, key, digest)
+    if stored is not None:
+        return stored
+    try:
+        with transaction.atomic():
+            response = handler()
+            if response.status_code < 300:
+                IdempotencyKey.objects.create(
+                    user=request.user, key=key, fingerprint=digest,
+                    status_code=response.status_code, response=response.data,
+                )
+    except IntegrityError:
+        # A concurrent retry with the same key committed first
+        stored = replay(request.user, key, digest)
+        if stored is None:
+            raise
+        return stored
+    return response
+
+
+def purge_expired():
+    """Delete keys past their TTL. Returns the number deleted."""
+    deleted, _ = IdempotencyKey.objects.filter(created_at__lt=timezone.now() - ttl()).delete()
+    return deleted
@@ -0,0 +1,203 @@
+"""
+Content-addressed image storage with resized variants.
+
+An upload is stored once under the SHA-256 of its bytes, so re-uploading the
+same picture reuses the existing asset. Resized WebP and JPEG variants are
+generated by the job workers (api/jobs.py), so the request only pays for
+hashing and writing the original, and a variant run that fails or is cut
+short by a restart is retried with backoff. Re-uploading an image whose
+variants failed queues them again. Because every path is derived from the
+content, variant URLs never change and can be cached by browsers and CDNs
+indefinitely.
+"""
+import hashlib
+import io
+import logging
+import os
+import uuid
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import IntegrityError, transaction
+from PIL import Image, ImageOps, UnidentifiedImageError
+from rest_framework.exceptions import ValidationError
+
+from . import caching, jobs
+from .models import ImageAsset, Project
+
+logger = logging.getLogger(__name__)
+
+# Longest edge in pixels of each variant
+VARIANT_SIZES = {'small': 160, 'medium': 480, 'large': 1200}
+FORMATS = {
+    'webp': ('WEBP', {'quality': 80, 'method': 4}),
+    'jpeg': ('JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+EXTENSIONS = {'JPEG': 'jpg', 'PNG': 'png', 'WEBP': 'webp', 'GIF': 'gif'}
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+GENERATE_VARIANTS = 'generate_image_variants'
+
+
+class VariantsFailed(Exception):
+    pass
+
+
+def max_size():
+    return getattr(settings, 'IMAGE_UPLOAD_MAX_SIZE', 20 * 1024 ** 2)
+
+
+def read_upload(upload):
+    """
+    Return (digest, bytes) of an uploaded file, reading it in chunks. Raises
+    ValidationError once it is larger than IMAGE_UPLOAD_MAX_SIZE.
+    """
+    too_large = ValidationError({'image': f'Images are at most {max_size()} bytes.'})
+    if upload.size is not None and upload.size > max_size():
+        raise too_large
+    digest = hashlib.sha256()
+    buffer = io.BytesIO()
+    for chunk in upload.chunks():
+        if buffer.tell() + len(chunk) > max_size():
+            raise too_large
+        digest.update(chunk)
+        buffer.write(chunk)
+    return digest.hexdigest(), buffer.getvalue()
+
+
+def inspect(data):
+    """Return (format, width, height), or raise ValidationError if ``data`` is not a supported image."""
+    try:
+        with Image.open(io.BytesIO(data)) as image:
+            image.verify()
+            image_format, (width, height) = image.format, image.size
+    except (UnidentifiedImageError, Image.DecompressionBombError, OSError, SyntaxError):
+        raise ValidationError({'image': 'Upload a valid JPEG, PNG, WebP or GIF image.'})
+    if image_format not in EXTENSIONS:
+        raise ValidationError({'image': 'Upload a valid JPEG, PNG, WebP or GIF image.'})
+    return image_format, width, height
+
+
+def store(upload, user=None):
+    """
+    Store an uploaded image and queue its variants. Returns (asset, created);
+    an identical upload returns the existing asset, with its variants queued
+    again if they failed.
+    """
+    digest, data = read_upload(upload)
+    existing = ImageAsset.objects.filter(digest=digest).first()
+    if existing is not None:
+        if existing.status == 'Failed':
+            retry(existing)
+        return existing, False
+
+    image_format, width, height = inspect(data)
+    asset = ImageAsset(digest=digest, width=width, height=height, uploaded_by=user)
+    name = asset.original.field.generate_filename(asset, f'original.{EXTENSIONS[image_format]}')
+    # Written outside the transaction under a name of its own, and moved into
+    # place only by the upload whose row is inserted
+    temporary = default_storage.save(f'{os.path.dirname(name)}/{uuid.uuid4().hex}.tmp', ContentFile(data))
+    try:
+        with transaction.atomic():
+            asset.original.name = name
+            asset.save()
+            jobs.enqueue(GENERATE_VARIANTS, {'asset': asset.pk})
+            os.replace(default_storage.path(temporary), default_storage.path(name))
+    except IntegrityError:
+        # The same image was uploaded concurrently
+        return ImageAsset.objects.get(digest=digest), False
+    finally:
+        default_storage.delete(temporary)
+    return asset, True
+
+
+def retry(asset):
+    with transaction.atomic():
+        # Only one of several concurrent re-uploads queues the retry
+        if ImageAsset.objects.filter(pk=asset.pk, status='Failed').update(status='Pending'):
+            jobs.enqueue(GENERATE_VARIANTS, {'asset': asset.pk})
+    asset.status = 'Pending'
+
+
+def render(image, size, image_format, options):
+    variant = image.copy()
+    variant.thumbnail((size, size), Image.LANCZOS)
+    if image_format == 'JPEG' and variant.mode != 'RGB':
+        variant = variant.convert('RGB')
+    output = io.BytesIO()
+    variant.save(output, image_format, **options)
+    return output.getvalue()
+
+
+@jobs.task(GENERATE_VARIANTS, atomic=False)
+def generate_queued_variants(payloads):
+    """
+    Generate the variants of a batch of assets. Any failure fails the batch so
+    the job queue retries it; assets that succeeded are skipped on the retry.
+    """
+    failed = [payload['asset'] for payload in payloads if not generate_variants(payload['asset'])]
+    if failed:
+        raise VariantsFailed(f'Generating variants failed for images {failed}')
+
+
+def generate_variants(asset_id):
+    """
+    Write every variant of an asset and mark it ready. Returns False, with the
+    asset marked 'Failed', if that did not work.
+    """
+    asset = ImageAsset.objects.filter(pk=asset_id).first()
+    if asset is None or asset.status == 'Ready':
+        return True
+    directory = os.path.dirname(asset.original.name)
+    variants = {}
+    try:
+        with asset.original.open('rb') as handle:
+            image = ImageOps.exif_transpose(Image.open(handle))
+            image.load()
+        if image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGBA' if 'A' in image.getbands() else 'RGB')
+        for name, size in VARIANT_SIZES.items():
+            variants[name] = {}
+            for extension, (image_format, options) in FORMATS.items():
+                path = f'{directory}/{name}.{extension}'
+                if not default_storage.exists(path):
+                    default_storage.save(path, ContentFile(render(image, size, image_format, options)))
+                variants[name][extension] = path
+    except Exception:
+        logger.exception('Generating variants of image %s failed', asset.digest)
+        ImageAsset.objects.filter(pk=asset_id).update(status='Failed')
+        return False
+    ImageAsset.objects.filter(pk=asset_id).update(variants=variants, status='Ready')
+
+    # Responses embedding this image now have variant URLs to show
+    project_ids = Project.objects.filter(thumbnail_image_id=asset_id).values_list('id', flat=True)
+    caching.bump('projects', 'users', *(f'project:{project_id}' for project_id in project_ids))
+    return True
+
+
+def urls(asset, request=None):
+    """Public URLs of an asset: the original plus every variant that has been generated."""
+    if asset is None:
+        return None
+
+    def absolute(path):
+        url = default_storage.url(path)
+        return request.build_absolute_uri(url) if request is not None else url
+
+    return {
+        'status': asset.status,
+        'width': asset.width,
+        'height': asset.height,
+        'original': absolute(asset.original.name),
+        'variants': {
+            name: {extension: absolute(path) for extension, path in formats.items()}
+            for name, formats in asset.variants.items()
+        },
+    }
+
+
+def set_avatar(user, upload):
+    asset, _ = store(upload, user)
+    user.avatar = asset
+    user.save(update_fields=['avatar'])
+    return asset
@@ -0,0 +1,156 @@
+"""
+A persistent job queue on the application database, without an external broker.
+
+Jobs are inserted in the same transaction as the write that caused them, so
+a job exists exactly when that write committed, and enqueueing costs one
+INSERT on the request path. Worker processes (``manage.py run_jobs``) claim
+ready jobs in batches and hand every payload of one task to its handler in a
+single call, so handlers can do set-based work. A failing batch is retried
+with exponential backoff; jobs that keep failing are left as 'Failed'.
+"""
+import logging
+import os
+import socket
+import time
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+_tasks = {}
+
+MAX_BACKOFF = 60 * 60
+
+
+def task(name, atomic=True):
+    """
+    Register ``handler(payloads)`` as the task ``name``. A handler normally
+    runs in the same transaction that deletes its jobs. Slow work, which must
+    not hold the database's write lock that long, can set ``atomic=False``:
+    the jobs are then deleted only after it returns, so it must be safe to
+    run again.
+    """
+    def register(handler):
+        _tasks[name] = (handler, atomic)
+        return handler
+    return register
+
+
+def enqueue(name, payload, run_at=None):
+    if name not in _tasks:
+        raise KeyError(f'Unknown task {name!r}')
+    return Job.objects.create(name=name, payload=payload, run_at=run_at or timezone.now())
+
+
+def enqueue_many(name, payloads):
+    if name not in _tasks:
+        raise KeyError(f'Unknown task {name!r}')
+    return Job.objects.bulk_create([Job(name=name, payload=payload) for payload in payloads])
+
+
+def worker_name():
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+def backoff(attempts):
+    return timedelta(seconds=min(2 ** attempts, MAX_BACKOFF))
+
+
+def claim(worker, batch_size):
+    """Lock up to ``batch_size`` ready jobs for ``worker`` and return them."""
+    now = timezone.now()
+    lock_timeout = timedelta(seconds=getattr(settings, 'JOB_LOCK_TIMEOUT', 5 * 60))
+    ready = Q(status='Queued', run_at__lte=now) | Q(status='Running', locked_at__lt=now - lock_timeout)
+    # One UPDATE picks and locks the batch. It starts as a write, so SQLite waits
+    # for the lock instead of failing to upgrade a read, and the readiness check
+    # is applied again to each row, so two workers never take the same job.
+    candidates = Job.objects.filter(ready).order_by('run_at', 'id').values('id')[:batch_size]
+    claimed = Job.objects.filter(ready, id__in=candidates).update(status='Running', locked_by=worker, locked_at=now)
+    if not claimed:
+        return []
+    return list(Job.objects.filter(status='Running', locked_by=worker, locked_at=now).order_by('id'))
+
+
+def run_batch(name, batch):
+    handler, atomic = _tasks.get(name, (None, True))
+    ids = [job.id for job in batch]
+    try:
+        if handler is None:
+            raise KeyError(f'Unknown task {name!r}')
+        if not atomic:
+            handler([job.payload for job in batch])
+            Job.objects.filter(id__in=ids).delete()
+            return True
+        with transaction.atomic():
+            # Writing first takes SQLite's write lock up front; a transaction
+            # that reads first can fail to upgrade while another worker writes
+            Job.objects.filter(id__in=ids).update(locked_at=timezone.now())
+            handler([job.payload for job in batch])
+            Job.objects.filter(id__in=ids).delete()
+    except Exception:
+        logger.exception('Task %s failed for %d jobs', name, len(batch))
+        fail(batch, traceback.format_exc())
+        return False
+    return True
+
+
+def fail(batch, error):
+    max_attempts = getattr(settings, 'JOB_MAX_ATTEMPTS', 5)
+    now = timezone.now()
+    for job in batch:
+        job.attempts += 1
+        job.last_error = error
+        job.locked_by, job.locked_at = '', None
+        if job.attempts >= max_attempts:
+            job.status = 'Failed'
+        else:
+            job.status = 'Queued'
+            job.run_at = now + backoff(job.attempts)
+    Job.objects.bulk_update(batch, ['attempts', 'last_error', 'locked_by', 'locked_at', 'status', 'run_at'])
+
+
+def run_pending(worker=None, batch_size=None):
+    """Run ready jobs until none are left. Returns (succeeded, failed) job counts."""
+    worker = worker or worker_name()
+    batch_size = batch_size or getattr(settings, 'JOB_BATCH_SIZE', 100)
+    succeeded = failed = 0
+    while True:
+        claimed = claim(worker, batch_size)
+        if not claimed:
+            return succeeded, failed
+        by_name = {}
+        for job in claimed:
+            by_name.setdefault(job.name, []).append(job)
+        for name, batch in by_name.items():
+            if run_batch(name, batch):
+                succeeded += len(batch)
+            else:
+                failed += len(batch)
+
+
+def work(batch_size=None, poll_interval=1.0, should_stop=lambda: False):
+    """Worker loop: run jobs as they become ready until ``should_stop()``."""
+    worker = worker_name()
+    logger.info('Job worker %s started', worker)
+    try:
+        while not should_stop():
+            succeeded, failed = run_pending(worker, batch_size)
+            if not succeeded and not failed:
+                time.sleep(poll_interval)
+    finally:
+        connection.close()
+
+
+def retry_failed(ids=None):
+    """Put failed jobs back in the queue. Returns how many were requeued."""
+    failed = Job.objects.filter(status='Failed')
+    if ids is not None:
+        failed = failed.filter(id__in=ids)
+    return failed.update(status='Queued', attempts=0, run_at=timezone.now(), last_error='')
@@ -0,0 +1,290 @@
+"""
+Cached top-K leaderboards.
+
+Each board keeps the best ``2 * LEADERBOARD_SIZE`` candidates in the cache
+together with a ``floor``: an upper bound on the score of every project that
+was left out. When a rating arrives only that project's score is recomputed
+and moved within the candidates. The board is dropped and rebuilt on the next
+read only when too few candidates remain above the floor to fill the top K.
+
+The boards that can be cached are a fixed set: every metric, category and
+window, with event windows limited to the ones named in LEADERBOARD_EVENTS.
+A rating write looks all of them up with one get_many, so there is no shared
+registry to keep in step, and each board still expires on its own so a
+missed update cannot outlive its timeout. Admins may rank any other window
+with start and end; such boards are built on each request and never cached.
+"""
+import hashlib
+import time as clock
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Avg, Count, F, FloatField
+from django.db.models.functions import Cast
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from .models import Project, ProjectRatingStats, Rating
+
+METRICS = ('overall',) + Rating.CRITERIA
+WINDOWS = ('all', 'week', 'event')
+CATEGORIES = tuple(value for value, label in Project.CATEGORY_CHOICES)
+
+BOARD_SIZE = getattr(settings, 'LEADERBOARD_SIZE', 10)
+CANDIDATES = 2 * BOARD_SIZE
+# Windowed boards are rebuilt periodically so that old ratings age out
+WINDOW_TTL = getattr(settings, 'LEADERBOARD_WINDOW_TTL', 60 * 60)
+# All-time boards are kept up to date by rating writes; this only bounds how
+# long one can stay wrong if an update is lost
+BOARD_TTL = getattr(settings, 'LEADERBOARD_TTL', 24 * 60 * 60)
+
+
+class InvalidBoard(ValueError):
+    pass
+
+
+def parse_bound(value, end=False):
+    if not value:
+        return None
+    try:
+        day = parse_date(value)
+        moment = datetime.combine(day, time.max if end else time.min) if day else parse_datetime(value)
+    except ValueError:
+        moment = None
+    if moment is None:
+        raise InvalidBoard(f'Invalid date: {value}')
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
+
+
+def events():
+    """The named event windows: {name: (start, end)} from LEADERBOARD_EVENTS."""
+    return getattr(settings, 'LEADERBOARD_EVENTS', {})
+
+
+def board_params(metric='overall', window='all', category=None, event=None, start=None, end=None):
+    """
+    Validate request parameters into the identity of a board. An event window
+    is either a named ``event`` or, for callers allowed to, ``start`` and ``end``.
+    """
+    if metric not in METRICS:
+        raise InvalidBoard(f'metric must be one of: {", ".join(METRICS)}')
+    if window not in WINDOWS:
+        raise InvalidBoard(f'window must be one of: {", ".join(WINDOWS)}')
+    if category and category not in CATEGORIES:
+        raise InvalidBoard(f'category must be one of: {", ".join(CATEGORIES)}')
+    params = {
+        'metric': metric, 'window': window, 'category': category or None,
+        'event': None, 'since': None, 'until': None,
+    }
+    if window == 'event':
+        if event:
+            if event not in events():
+                raise InvalidBoard(f'Unknown event: {event}')
+            params['event'] = event
+            start, end = events()[event]
+        params['since'] = parse_bound(start)
+        params['until'] = parse_bound(end, end=True)
+        if params['since'] is None or params['until'] is None:
+            raise InvalidBoard('An event window needs an event, or both start and end')
+        if params['since'] > params['until']:
+            raise InvalidBoard('start must be before end')
+    return params
+
+
+def is_custom(params):
+    """An event window that is not one of LEADERBOARD_EVENTS."""
+    return params['window'] == 'event' and params['event'] is None
+
+
+def board_key(params):
+    identity = '|'.join(
+        str(params[name].isoformat() if hasattr(params[name], 'isoformat') else params[name])
+        for name in ('metric', 'window', 'category', 'since', 'until')
+    )
+    return 'leaderboard:' + hashlib.md5(identity.encode('utf-8')).hexdigest()
+
+
+def board_timeout(board):
+    return max(board['expires_at'] - clock.time(), 1)
+
+
+def cached_board_keys():
+    """The key of every board that may be in the cache."""
+    windows = [('all', None), ('week', None)] + [('event', name) for name in events()]
+    return [
+        board_key(board_params(metric, window, category, event))
+        for metric in METRICS
+        for window, event in windows
+        for category in (None,) + CATEGORIES
+    ]
+
+
+# Scoring
+
+def stats_score(metric):
+    criteria = Rating.CRITERIA if metric == 'overall' else (metric,)
+    total = sum((F(f'{criterion}_sum') for criterion in criteria[1:]), F(f'{criteria[0]}_sum'))
+    return Cast(total, FloatField()) / (F('count') * len(criteria))
+
+
+def rating_score(metric):
+    criteria = Rating.CRITERIA if metric == 'overall' else (metric,)
+    total = sum((F(criterion) for criterion in criteria[1:]), F(criteria[0]))
+    return Avg(Cast(total, FloatField())) / len(criteria)
+
+
+def ranked_rows(board, project_ids=None):
+    """Yield (project_id, score, count) for the board's window, best first."""
+    if board['window'] == 'all':
+        rows = ProjectRatingStats.objects.filter(count__gt=0)
+        if board['category']:
+            rows = rows.filter(project__category=board['category'])
+        if project_ids is not None:
+            rows = rows.filter(project_id__in=project_ids)
+        rows = rows.annotate(score=stats_score(board['metric'])).values_list('project_id', 'score', 'count')
+    else:
+        rows = Rating.objects.order_by()
+        if board['since']:
+            rows = rows.filter(created_at__gte=board['since'])
+        if board['until']:
+            rows = rows.filter(created_at__lte=board['until'])
+        if board['category']:
+            rows = rows.filter(project__category=board['category'])
+        if project_ids is not None:
+            rows = rows.filter(project_id__in=project_ids)
+        rows = (
+            rows.values('project_id')
+            .annotate(score=rating_score(board['metric']), count=Count('id'))
+            .values_list('project_id', 'score', 'count')
+        )
+    return rows.order_by('-score', '-count', 'project_id')
+
+
+def describe(project_ids):
+    projects = Project.objects.filter(id__in=project_ids).select_related('user').only(
+        'id', 'title', 'category', 'thumbnail', 'user__username'
+    )
+    return {
+        project.id: {
+            'title': project.title,
+            'category': project.category,
+            'thumbnail': project.thumbnail,
+            'username': project.user.username,
+        }
+        for project in projects
+    }
+
+
+# Building and reading boards
+
+def build_board(params):
+    board = dict(params)
+    if board['window'] == 'week':
+        board['since'] = timezone.now() - timedelta(days=7)
+    board['expires_at'] = clock.time() + (BOARD_TTL if board['window'] == 'all' else WINDOW_TTL)
+    rows = list(ranked_rows(board)[:CANDIDATES + 1])
+    board['floor'] = rows[CANDIDATES][1] if len(rows) > CANDIDATES else None
+    rows = rows[:CANDIDATES]
+    info = describe([project_id for project_id, score, count in rows])
+    board['entries'] = [
+        {'project': project_id, 'score': score, 'count': count, **info[project_id]}
+        for project_id, score, count in rows if project_id in info
+    ]
+    return board
+
+
+def get_board(params):
+    if is_custom(params):
+        return build_board(params)
+    key = board_key(params)
+    board = cache.get(key)
+    if board is None:
+        board = build_board(params)
+        cache.set(key, board, board_timeout(board))
+    return board
+
+
+def top(params, limit=BOARD_SIZE):
+    board = get_board(params)
+    return [
+        {'rank': rank, **entry}
+        for rank, entry in enumerate(board['entries'][:min(limit, BOARD_SIZE)], start=1)
+    ]
+
+
+# Incremental refresh
+
+def live_boards():
+    return cache.get_many(cached_board_keys())
+
+
+def apply_score(board, project_id, score, count, info):
+    """Move one project within a board. Returns False if the board must be rebuilt."""
+    entries = [entry for entry in board['entries'] if entry['project'] != project_id]
+    was_listed = len(entries) != len(board['entries'])
+    if count and (was_listed or board['floor'] is None or score > board['floor']):
+        entries.append({'project': project_id, 'score': score, 'count': count, **info})
+    entries.sort(key=lambda entry: (-entry['score'], -entry['count'], entry['project']))
+
+    floor = board['floor']
+    if len(entries) > CANDIDATES:
+        best_dropped = entries[CANDIDATES]['score']
+        floor = best_dropped if floor is None else max(floor, best_dropped)
+        entries = entries[:CANDIDATES]
+    board['entries'] = entries
+    board['floor'] = floor
+    if floor is None:
+        return True
+    return sum(1 for entry in entries if entry['score'] >= floor) >= BOARD_SIZE
+
+
+def refresh_projects(project_ids, rated_at=None):
+    """
+    Update every cached board that may contain these projects after their
+    ratings changed. ``rated_at`` is the time of the rating that changed, if
+    known, so that windows not covering it are left alone.
+    """
+    project_ids = set(project_ids)
+    boards = live_boards()
+    if not boards or not project_ids:
+        return
+
+    info = describe(project_ids)
+    scores = {}
+    for key, board in boards.items():
+        if rated_at is not None:
+            if board['since'] and rated_at < board['since']:
+                continue
+            if board['until'] and rated_at > board['until']:
+                continue
+        targets = [
+            project_id for project_id in project_ids
+            if project_id in info and board['category'] in (None, info[project_id]['category'])
+        ]
+        if not targets:
+            continue
+
+        window = (board['metric'], board['window'], board['since'], board['until'])
+        if window not in scores:
+            scores[window] = {
+                project_id: (score, count)
+                for project_id, score, count in ranked_rows({**board, 'category': None}, project_ids)
+            }
+        valid = True
+        for project_id in targets:
+            score, count = scores[window].get(project_id, (0.0, 0))
+            valid = apply_score(board, project_id, score, count, info[project_id]) and valid
+        if valid:
+            cache.set(key, board, board_timeout(board))
+        else:
+            cache.delete(key)
+
+
+def forget_project(project_id):
+    """Drop boards that show a project whose details changed or that was deleted."""
+    for key, board in live_boards().items():
+        if any(entry['project'] == project_id for entry in board['entries']):
+            cache.delete(key)
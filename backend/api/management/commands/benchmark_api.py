@@ -0,0 +1,88 @@
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import setup_databases, setup_test_environment, teardown_databases, teardown_test_environment
+from api import benchmarks, buffers
+
+
+class Command(BaseCommand):
+    help = (
+        'Seed a throwaway database and benchmark the read endpoints: latency percentiles, '
+        'throughput, queries per request and peak memory, optionally against a JSON baseline'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=200)
+        parser.add_argument('--projects', type=int, default=2000)
+        parser.add_argument('--feedback-per-project', type=float, default=5)
+        parser.add_argument('--ratings-per-project', type=float, default=5)
+        parser.add_argument('--reactions-per-project', type=float, default=5)
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument('--requests', type=int, default=200, help='Requests per endpoint')
+        parser.add_argument('--concurrency', type=int, default=8, help='Concurrent client threads')
+        parser.add_argument('--endpoint', action='append', dest='endpoints',
+                            help='Only run this endpoint (repeatable)')
+        parser.add_argument('--cached', action='store_true',
+                            help='Repeat the same URL so responses come from the response and leaderboard caches')
+        parser.add_argument('--baseline', help='JSON baseline to compare against')
+        parser.add_argument('--save-baseline', help='Write the results to this JSON file')
+        parser.add_argument('--tolerance', type=float, default=0.2,
+                            help='Allowed relative slowdown before a metric counts as a regression')
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        old_config = setup_databases(verbosity=0, interactive=False)
+        try:
+            self.stdout.write('Seeding benchmark database...')
+            call_command(
+                'populate_db',
+                users=options['users'],
+                projects=options['projects'],
+                feedback_per_project=options['feedback_per_project'],
+                ratings_per_project=options['ratings_per_project'],
+                reactions_per_project=options['reactions_per_project'],
+                seed=options['seed'],
+                stdout=self.stdout,
+            )
+            results = self.run_endpoints(options)
+            buffers.flush_all()
+        finally:
+            teardown_databases(old_config, verbosity=0)
+            teardown_test_environment()
+
+        self.report(results)
+        if options['save_baseline']:
+            benchmarks.save_baseline(options['save_baseline'], results)
+            self.stdout.write(f"Baseline written to {options['save_baseline']}")
+        if options['baseline']:
+            regressions = benchmarks.compare(results, benchmarks.load_baseline(options['baseline']), options['tolerance'])
+            if regressions:
+                raise CommandError('Regressions against baseline:\n  ' + '\n  '.join(regressions))
+            self.stdout.write(self.style.SUCCESS('No regressions against baseline'))
+
+    def run_endpoints(self, options):
+        endpoints = benchmarks.default_endpoints()
+        scenarios = benchmarks.auth_scenarios()
+        if options['endpoints']:
+            unknown = set(options['endpoints']) - set(endpoints) - set(scenarios)
+            if unknown:
+                raise CommandError(f"Unknown endpoints: {', '.join(sorted(unknown))}")
+            endpoints = {name: endpoints[name] for name in options['endpoints'] if name in endpoints}
+            scenarios = {name: scenarios[name] for name in options['endpoints'] if name in scenarios}
+
+        results = {}
+        for name, path in endpoints.items():
+            self.stdout.write(f'Benchmarking {name} ({path})...')
+            results[name] = benchmarks.drive(
+                path, options['requests'], options['concurrency'], bust_cache=not options['cached']
+            )
+        for name, authentication_class in scenarios.items():
+            self.stdout.write(f'Benchmarking {name} ({authentication_class.__name__}.authenticate)...')
+            results[name] = benchmarks.drive_auth(authentication_class, options['requests'])
+        return results
+
+    def report(self, results):
+        columns = ['p50_ms', 'p95_ms', 'p99_ms', 'throughput_rps', 'queries_per_request', 'peak_memory_kb', 'errors']
+        width = max([len(name) for name in results] + [8])
+        self.stdout.write('endpoint'.ljust(width) + ''.join(column.rjust(20) for column in columns))
+        for name, metrics in results.items():
+            self.stdout.write(name.ljust(width) + ''.join(str(metrics[column]).rjust(20) for column in columns))
@@ -0,0 +1,104 @@
+import asyncio
+import json
+import os
+import tempfile
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from api import benchmarks
+
+
+class Command(BaseCommand):
+    help = (
+        'Seed a throwaway SQLite database, serve it with gunicorn (WSGI) and uvicorn (ASGI) and compare '
+        'latency percentiles and throughput of the read endpoints under many concurrent connections'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=200)
+        parser.add_argument('--projects', type=int, default=2000)
+        parser.add_argument('--feedback-per-project', type=float, default=5)
+        parser.add_argument('--ratings-per-project', type=float, default=5)
+        parser.add_argument('--reactions-per-project', type=float, default=5)
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument('--connections', type=int, default=1000, help='Concurrent keep-alive connections')
+        parser.add_argument('--duration', type=float, default=10, help='Seconds per endpoint')
+        parser.add_argument('--warmup', type=float, default=2, help='Unmeasured seconds before each endpoint')
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='Server processes')
+        parser.add_argument('--threads', type=int, default=32, help='Threads per gunicorn worker')
+        parser.add_argument('--port', type=int, default=8765)
+        parser.add_argument('--mode', action='append', dest='modes', choices=list(benchmarks.CONCURRENCY_MODES),
+                            help='Only run this mode (repeatable); wsgi and asgi by default')
+        parser.add_argument('--endpoint', action='append', dest='endpoints',
+                            help='Only run this endpoint (repeatable)')
+        parser.add_argument('--cached', action='store_true',
+                            help='Repeat the same URL so responses come from the response cache')
+
+    def handle(self, *args, **options):
+        modes = options['modes'] or ['wsgi', 'asgi']
+        endpoint_names = list(benchmarks.concurrency_endpoints(0))
+        if options['endpoints']:
+            unknown = set(options['endpoints']) - set(endpoint_names)
+            if unknown:
+                raise CommandError(f"Unknown endpoints: {', '.join(sorted(unknown))}")
+            endpoint_names = [name for name in endpoint_names if name in options['endpoints']]
+
+        # One descriptor per client connection and one per server-side socket
+        needed = 2 * options['connections'] + 256
+        limit = benchmarks.raise_open_file_limit(needed)
+        if limit < needed:
+            raise CommandError(f'The open file limit is {limit}; {needed} are needed for {options["connections"]} connections')
+
+        with tempfile.TemporaryDirectory() as directory:
+            env = {**os.environ, 'DB_ENGINE': 'sqlite', 'SQLITE_PATH': str(Path(directory) / 'benchmark.sqlite3')}
+            self.stdout.write('Seeding benchmark database...')
+            benchmarks.manage('migrate', '--noinput', '--verbosity', '0', env=env)
+            benchmarks.manage(
+                'populate_db',
+                '--users', str(options['users']),
+                '--projects', str(options['projects']),
+                '--feedback-per-project', str(options['feedback_per_project']),
+                '--ratings-per-project', str(options['ratings_per_project']),
+                '--reactions-per-project', str(options['reactions_per_project']),
+                '--seed', str(options['seed']),
+                env=env,
+            )
+            results = {}
+            for mode in modes:
+                results.update(self.run_mode(mode, endpoint_names, env, options))
+        self.report(results)
+
+    def run_mode(self, mode, endpoint_names, env, options):
+        server, prefix = benchmarks.CONCURRENCY_MODES[mode]
+        port = options['port']
+        command = benchmarks.server_command(
+            server, port, options['workers'], options['threads'], options['connections']
+        )
+        results = {}
+        self.stdout.write(f"Starting {server} with {options['workers']} worker(s) for {mode}...")
+        with benchmarks.serve(command, port, env):
+            body = benchmarks.request_once(port, '/api/projects/?page_size=1')[1]
+            project_id = json.loads(body)['results'][0]['id']
+            endpoints = benchmarks.concurrency_endpoints(project_id)
+            for name in endpoint_names:
+                path = prefix + endpoints[name]
+                self.stdout.write(f"Benchmarking {mode} {name} ({path}, {options['connections']} connections)...")
+                asyncio.run(benchmarks.hammer(
+                    port, path, min(options['connections'], 50), options['warmup'], not options['cached']
+                ))
+                results[(mode, name)] = asyncio.run(benchmarks.hammer(
+                    port, path, options['connections'], options['duration'], not options['cached']
+                ))
+        return results
+
+    def report(self, results):
+        columns = ['requests', 'errors', 'p50_ms', 'p95_ms', 'p99_ms', 'throughput_rps']
+        width = max([len(mode) for mode, name in results] + [4]) + 2
+        name_width = max([len(name) for mode, name in results] + [8]) + 2
+        self.stdout.write(
+            'mode'.ljust(width) + 'endpoint'.ljust(name_width) + ''.join(column.rjust(16) for column in columns)
+        )
+        for (mode, name), metrics in results.items():
+            self.stdout.write(
+                mode.ljust(width) + name.ljust(name_width) + ''.join(str(metrics[column]).rjust(16) for column in columns)
+            )
@@ -0,0 +1,56 @@
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import setup_databases, setup_test_environment, teardown_databases, teardown_test_environment
+from api import benchmarks
+
+
+class Command(BaseCommand):
+    help = (
+        'Seed a throwaway database and compare rows per second of the list serializers and JSON '
+        'renderer against the compiled serializers and orjson renderer'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=10000, help='Rows per page')
+        parser.add_argument('--users', type=int, default=200)
+        parser.add_argument('--feedback-per-project', type=float, default=5)
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument('--repeat', type=int, default=3, help='Runs per measurement; the best is reported')
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        old_config = setup_databases(verbosity=0, interactive=False)
+        try:
+            self.stdout.write('Seeding benchmark database...')
+            call_command(
+                'populate_db',
+                users=options['users'],
+                projects=options['rows'],
+                feedback_per_project=options['feedback_per_project'],
+                seed=options['seed'],
+                stdout=self.stdout,
+            )
+            results = {}
+            for name, (serializer_class, instances) in benchmarks.serialization_pages(options['rows']).items():
+                self.stdout.write(f'Benchmarking {name} ({len(instances)} rows)...')
+                results[name] = benchmarks.serialization_throughput(serializer_class, instances, options['repeat'])
+        finally:
+            teardown_databases(old_config, verbosity=0)
+            teardown_test_environment()
+
+        self.report(results)
+        different = [name for name, result in results.items() if not result['identical']]
+        if different:
+            raise CommandError(f"Fast output differs from DRF's for: {', '.join(different)}")
+
+    def report(self, results):
+        columns = ['serialize_rows_per_s', 'render_rows_per_s', 'total_rows_per_s']
+        width = max([len(name) for name in results] + [8]) + 7
+        self.stdout.write('page'.ljust(width) + ''.join(column.rjust(24) for column in columns) + 'speedup'.rjust(10))
+        for name, result in results.items():
+            for mode in ('drf', 'fast'):
+                metrics = result[mode]
+                line = f'{name} {mode}'.ljust(width) + ''.join(str(metrics[column]).rjust(24) for column in columns)
+                if mode == 'fast' and result['drf']['total_rows_per_s']:
+                    line += f"{metrics['total_rows_per_s'] / result['drf']['total_rows_per_s']:.2f}x".rjust(10)
+                self.stdout.write(line)
@@ -1,119 +1,201 @@
-from django.core.management.base import BaseCommand
-from django.utils import timezone
-from api.models import User, Project, Feedback, Rating, Reaction, Collaboration, Notification, SearchLog, Report
+from itertools import islice
 import random
 
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Max
+from api import caching, facets, notifications, ratings, reactions, search
+from api.models import User, Project, Feedback, Rating, Reaction, Collaboration, Notification, SearchLog, Report
+
+FIRST_NAMES = ['Alice', 'Bob', 'Charlie', 'David', 'Eve', 'Frank', 'Grace', 'Heidi', 'Ivan', 'Judy']
+
+PROJECT_TOPICS = [
+    ('AI-Powered Chatbot', 'A chatbot that uses AI to provide customer support.'),
+    ('E-Commerce Platform', 'A platform for buying and selling products online.'),
+    ('Social Media Analytics Tool', 'A tool to analyze social media trends and metrics.'),
+    ('Online Learning Management System', 'A system to manage online courses and student progress.'),
+    ('Healthcare Appointment Scheduler', 'An application to schedule and manage healthcare appointments.'),
+    ('Campus Navigation App', 'A mobile app that guides students between buildings.'),
+    ('Energy Usage Dashboard', 'A dashboard that visualizes energy consumption in real time.'),
+    ('Plant Disease Detector', 'A computer vision model that spots plant diseases from photos.'),
+]
+
+FEEDBACK_PHRASES = [
+    'Great presentation', 'The demo was clear', 'Consider adding tests', 'Impressive results',
+    'The UI could be simpler', 'Well researched', 'Nice use of machine learning', 'Needs more documentation',
+]
+
+CATEGORIES = ['Hackathon', 'Class Project', 'Research']
+
+
 class Command(BaseCommand):
-    help = 'Populate the database with dummy data'
-
-    def handle(self, *args, **kwargs):
-        # Create Users
-        users = []
-        user_names = ['Alice', 'Bob', 'Charlie', 'David', 'Eve']
-        for i, name in enumerate(user_names):
-            user = User.objects.create_user(
-                username=f'{name.lower()}{random.randint(1, 10000)}',
-                email=f'{name.lower()}{random.randint(1, 10000)}@example.com',
-                password='password',
-                role=random.choice(['Presenter', 'Reviewer', 'Admin']),
-                institution=f'Institution {i}'
+    help = 'Populate the database with dummy data, from a handful of rows up to benchmark scale'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=5)
+        parser.add_argument('--projects', type=int, default=5)
+        parser.add_argument('--feedback-per-project', type=float, default=4,
+                            help='Average number of comments per project')
+        parser.add_argument('--ratings-per-project', type=float, default=3,
+                            help='Average number of ratings per project')
+        parser.add_argument('--reactions-per-project', type=float, default=4,
+                            help='Average number of reactions per project')
+        parser.add_argument('--zipf', type=float, default=1.0,
+                            help='Zipf exponent of project popularity; 0 spreads activity evenly')
+        parser.add_argument('--seed', type=int, default=None, help='Seed for a reproducible dataset')
+        parser.add_argument('--batch-size', type=int, default=2000)
+        parser.add_argument('--password', default='password')
+
+    def handle(self, *args, **options):
+        if options['users'] < 1 or options['projects'] < 1:
+            raise CommandError('--users and --projects must be at least 1')
+        self.rng = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+
+        user_ids = self.create_users(options['users'], options['password'])
+        project_ids = self.create_projects(options['projects'], user_ids)
+
+        # Popularity follows a Zipf distribution over a shuffled project order
+        popularity = [1 / (rank ** options['zipf']) for rank in range(1, len(project_ids) + 1)]
+        self.rng.shuffle(popularity)
+        total = sum(popularity)
+        self.weights = [weight / total for weight in popularity]
+
+        feedback = self.bulk_insert(Feedback, self.generate_feedback(
+            project_ids, user_ids, options['feedback_per_project']))
+        rated = self.bulk_insert(Rating, self.generate_ratings(
+            project_ids, user_ids, options['ratings_per_project']))
+        reacted = self.bulk_insert(Reaction, self.generate_reactions(
+            project_ids, user_ids, options['reactions_per_project']))
+        self.bulk_insert(Collaboration, (
+            Collaboration(
+                project_id=self.rng.choice(project_ids),
+                user_id=self.rng.choice(user_ids),
+                status=self.rng.choice(['Pending', 'Accepted', 'Rejected']),
             )
-            users.append(user)
-
-        project_titles = [
-            'AI-Powered Chatbot',
-            'E-Commerce Platform',
-            'Social Media Analytics Tool',
-            'Online Learning Management System',
-            'Healthcare Appointment Scheduler'
-        ]
-
-        project_descriptions = [
-            'A chatbot that uses AI to provide customer support.',
-            'A platform for buying and selling products online.',
-            'A tool to analyze social media trends and metrics.',
-            'A system to manage online courses and student progress.',
-            'An application to schedule and manage healthcare appointments.'
-        ]
-
-        # Create Projects
-        projects = []
-        for i in range(len(project_titles)):
-            project = Project.objects.create(
-                user=random.choice(users),
-                title=project_titles[i],
-                description=project_descriptions[i],
-                category=random.choice(['Hackathon', 'Class Project', 'Research']),
-                created_at=timezone.now(),
-                thumbnail=f'https://picsum.photos/seed/{i}/150',
+            for _ in range(len(project_ids) * 2)
+        ))
+        self.bulk_insert(Notification, (
+            Notification(
+                user_id=self.rng.choice(user_ids),
+                message=f'Notification message {i}',
+                is_read=self.rng.random() < 0.5,
+            )
+            for i in range(len(user_ids) * 2)
+        ))
+        self.bulk_insert(SearchLog, (
+            SearchLog(
+                user_id=self.rng.choice(user_ids),
+                query=self.rng.choice(PROJECT_TOPICS)[0].split()[0].lower(),
+                result_count=self.rng.randint(0, 20),
             )
-            projects.append(project)
-
-        # Create Feedback
-        for i in range(20):
-            Feedback.objects.create(
-                project=random.choice(projects),
-                user=random.choice(users),
-                comment=f'Feedback comment {i}',
-                created_at=timezone.now()
+            for _ in range(len(user_ids) * 2)
+        ))
+        self.bulk_insert(Report, (
+            Report(
+                reported_by_id=self.rng.choice(user_ids),
+                project_id=self.rng.choice(project_ids),
+                reason=f'Report reason {i}',
+                status=self.rng.choice(['Pending', 'Reviewed', 'Resolved']),
             )
+            for i in range(max(len(project_ids) // 20, 5))
+        ))
 
-        # Create Ratings
-        for project in projects:
-            for _ in range(random.randint(1, 5)):
-                Rating.objects.create(
-                    project=project,
-                    user=random.choice(users),
-                    creativity=random.randint(1, 5),
-                    technical_skills=random.randint(1, 5),
-                    impact=random.randint(1, 5),
-                    presentation=random.randint(1, 5),
-                    created_at=timezone.now()
-                )
+        # Bulk inserts skip the signals that maintain derived tables
+        self.stdout.write('Rebuilding search index and aggregates...')
+        search.rebuild_index(batch_size=self.batch_size)
+        facets.sync_institutions()
+        ratings.rebuild_stats(batch_size=self.batch_size)
+        for start in range(0, len(project_ids), self.batch_size):
+            reactions.recount(project_ids[start:start + self.batch_size])
+        notifications.rebuild_unread_counts()
+        caching.bump_all()
 
-        # Create Reactions
-        for i in range(20):
-            Reaction.objects.create(
-                project=random.choice(projects),
-                user=random.choice(users),
-                reaction_type=random.choice(['Like', 'Love', 'Clap', 'ThumbsUp', 'Star']),
-                created_at=timezone.now()
-            )
+        self.stdout.write(self.style.SUCCESS(
+            f'Successfully populated the database with {len(user_ids)} users, {len(project_ids)} projects, '
+            f'{feedback} feedback, {rated} ratings and {reacted} reactions'
+        ))
 
-        # Create Collaborations
-        for i in range(10):
-            Collaboration.objects.create(
-                project=random.choice(projects),
-                user=random.choice(users),
-                status=random.choice(['Pending', 'Accepted', 'Rejected']),
-                created_at=timezone.now()
-            )
+    def bulk_insert(self, model, objects, return_ids=False):
+        """
+        Insert a stream of unsaved objects in chunks. Returns the number
+        inserted, or their primary keys with ``return_ids``.
+        """
+        ids = []
+        inserted = 0
+        objects = iter(objects)
+        with transaction.atomic():
+            while True:
+                chunk = list(islice(objects, self.batch_size))
+                if not chunk:
+                    return ids if return_ids else inserted
+                created = model.objects.bulk_create(chunk)
+                inserted += len(created)
+                if return_ids:
+                    ids.extend(obj.pk for obj in created)
 
-        # Create Notifications
-        for i in range(10):
-            Notification.objects.create(
-                user=random.choice(users),
-                message=f'Notification message {i}',
-                is_read=random.choice([True, False]),
-                created_at=timezone.now()
+    def create_users(self, count, password):
+        # Hash once: every generated account shares the same password
+        hashed = make_password(password)
+        offset = (User.objects.aggregate(last=Max('id'))['last'] or 0) + 1
+        names = [f'{FIRST_NAMES[i % len(FIRST_NAMES)].lower()}{offset + i}' for i in range(count)]
+        return self.bulk_insert(User, (
+            User(
+                username=name,
+                email=f'{name}@example.com',
+                password=hashed,
+                role=self.rng.choice(['Presenter', 'Reviewer', 'Admin']),
+                institution=f'Institution {self.rng.randint(0, max(count // 50, 4))}',
             )
+            for name in names
+        ), return_ids=True)
 
-        # Create Search Logs
-        for i in range(10):
-            SearchLog.objects.create(
-                user=random.choice(users),
-                query=f'Search query {i}',
-                created_at=timezone.now()
+    def create_projects(self, count, user_ids):
+        numbered = count > len(PROJECT_TOPICS)
+        return self.bulk_insert(Project, (
+            Project(
+                user_id=self.rng.choice(user_ids),
+                title=f'{PROJECT_TOPICS[i % len(PROJECT_TOPICS)][0]} {i}' if numbered else PROJECT_TOPICS[i][0],
+                description=PROJECT_TOPICS[i % len(PROJECT_TOPICS)][1],
+                category=self.rng.choice(CATEGORIES),
+                thumbnail=f'https://picsum.photos/seed/{i}/150',
             )
+            for i in range(count)
+        ), return_ids=True)
 
-        # Create Reports
-        for i in range(5):
-            Report.objects.create(
-                reported_by=random.choice(users),
-                project=random.choice(projects),
-                reason=f'Report reason {i}',
-                status=random.choice(['Pending', 'Reviewed', 'Resolved']),
-                created_at=timezone.now()
-            )
+    def per_project(self, average, project_ids, limit=None):
+        """Yield (project_id, n) with n following the popularity weights."""
+        total = average * len(project_ids)
+        for project_id, weight in zip(project_ids, self.weights):
+            expected = total * weight
+            n = int(expected) + (self.rng.random() < expected - int(expected))
+            yield project_id, n if limit is None else min(n, limit)
+
+    def generate_feedback(self, project_ids, user_ids, average):
+        for project_id, n in self.per_project(average, project_ids):
+            for _ in range(n):
+                yield Feedback(
+                    project_id=project_id,
+                    user_id=self.rng.choice(user_ids),
+                    comment=f'{self.rng.choice(FEEDBACK_PHRASES)}.',
+                )
+
+    def generate_ratings(self, project_ids, user_ids, average):
+        # One rating per reviewer and project
+        for project_id, n in self.per_project(average, project_ids, limit=len(user_ids)):
+            for user_id in self.rng.sample(user_ids, n):
+                yield Rating(
+                    project_id=project_id,
+                    user_id=user_id,
+                    creativity=self.rng.randint(1, 5),
+                    technical_skills=self.rng.randint(1, 5),
+                    impact=self.rng.randint(1, 5),
+                    presentation=self.rng.randint(1, 5),
+                )
 
-        self.stdout.write(self.style.SUCCESS('Successfully populated the database with dummy data')) 
\ No newline at end of file
+    def generate_reactions(self, project_ids, user_ids, average):
+        reaction_types = [choice for choice, label in Reaction.REACTION_CHOICES]
+        for project_id, n in self.per_project(average, project_ids, limit=len(user_ids)):
+            for user_id in self.rng.sample(user_ids, n):
+                yield Reaction(project_id=project_id, user_id=user_id, reaction_type=self.rng.choice(reaction_types))
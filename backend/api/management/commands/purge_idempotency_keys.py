@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from api.idempotency import purge_expired
+
+
+class Command(BaseCommand):
+    help = 'Delete stored idempotency keys older than IDEMPOTENCY_KEY_TTL'
+
+    def handle(self, *args, **options):
+        deleted = purge_expired()
+        self.stdout.write(self.style.SUCCESS(f'Deleted {deleted} expired idempotency keys'))
@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from api.uploads import purge_stale
+
+
+class Command(BaseCommand):
+    help = 'Delete unfinished resumable uploads idle for longer than RESUMABLE_UPLOAD_TTL'
+
+    def handle(self, *args, **options):
+        deleted = purge_stale()
+        self.stdout.write(self.style.SUCCESS(f'Deleted {deleted} stale uploads'))
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+from api import caching, facets
+
+
+class Command(BaseCommand):
+    help = 'Copy author institutions onto projects and rebuild the project facet counts'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        facets.sync_institutions()
+        written = facets.rebuild_counts(batch_size=options['batch_size'])
+        caching.bump('projects')
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {written} facet counts'))
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+from api.ratings import rebuild_stats
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the per-project rating aggregates from the rating table'
+
+    def add_arguments(self, parser):
+        parser.add_argument('project_ids', nargs='*', type=int, help='Only rebuild these projects')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        project_ids = options['project_ids'] or None
+        written = rebuild_stats(project_ids, batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt rating aggregates for {written} projects'))
@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from api.notifications import rebuild_unread_counts
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the per-user unread notification counters'
+
+    def handle(self, *args, **options):
+        written = rebuild_unread_counts()
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt unread counters for {written} users'))
@@ -0,0 +1,53 @@
+import multiprocessing
+import signal
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from api import jobs
+
+
+class Command(BaseCommand):
+    help = 'Run queued background jobs in one or more worker processes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=1, help='Number of worker processes')
+        parser.add_argument('--batch-size', type=int, default=None, help='Jobs claimed at a time (JOB_BATCH_SIZE)')
+        parser.add_argument('--poll-interval', type=float, default=1.0, help='Seconds to sleep when the queue is empty')
+        parser.add_argument('--once', action='store_true', help='Run the jobs that are ready now, then exit')
+        parser.add_argument('--retry-failed', action='store_true', help='Requeue failed jobs first')
+
+    def handle(self, *args, **options):
+        if options['retry_failed']:
+            self.stdout.write(f'Requeued {jobs.retry_failed()} failed jobs')
+        if options['once']:
+            succeeded, failed = jobs.run_pending(batch_size=options['batch_size'])
+            self.stdout.write(self.style.SUCCESS(f'Ran {succeeded} jobs, {failed} failed'))
+            return
+
+        # Children must not inherit the parent's database connections
+        connections.close_all()
+        context = multiprocessing.get_context('fork')
+        stop = context.Event()
+        workers = [
+            context.Process(target=work, args=(stop, options['batch_size'], options['poll_interval']), daemon=True)
+            for _ in range(max(options['workers'], 1))
+        ]
+        for worker in workers:
+            worker.start()
+        self.stdout.write(self.style.SUCCESS(f'Started {len(workers)} job workers'))
+        signal.signal(signal.SIGTERM, lambda *args: stop.set())
+        try:
+            for worker in workers:
+                worker.join()
+        except KeyboardInterrupt:
+            stop.set()
+            for worker in workers:
+                worker.join()
+
+
+def work(stop, batch_size, poll_interval):
+    # The parent handles Ctrl-C and tells the workers to finish their batch
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, lambda *args: stop.set())
+    jobs.work(batch_size, poll_interval, should_stop=stop.is_set)
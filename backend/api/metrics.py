@@ -0,0 +1,161 @@
+"""
+Per-request timings and in-process latency histograms.
+
+``PerformanceMiddleware`` (api/middleware.py) opens a ``RequestTimings`` for
+every request. A database execute wrapper adds each query's count and time to
+it, and ``BaseSerializer.data`` is wrapped to add the time spent serializing,
+not counting the queries run meanwhile. When the response goes out the
+timings are sent as a ``Server-Timing`` header and observed into histograms
+labelled with the view, which ``render()`` writes in the Prometheus text
+format for ``/metrics``.
+
+The histograms live in the process that served the request, so with several
+worker processes each one reports its own.
+"""
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+
+from rest_framework.serializers import BaseSerializer
+
+SECONDS_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 250)
+
+# name -> (help, buckets)
+HISTOGRAMS = {
+    'http_request_duration_seconds': ('Time to produce a response, by view.', SECONDS_BUCKETS),
+    'http_request_sql_duration_seconds': ('Time spent in SQL queries per request, by view.', SECONDS_BUCKETS),
+    'http_request_serializer_duration_seconds': ('Time spent serializing per request, by view.', SECONDS_BUCKETS),
+    'http_request_sql_queries': ('SQL queries run per request, by view.', QUERY_BUCKETS),
+}
+REQUESTS_TOTAL = 'http_requests_total'
+
+_current = ContextVar('request_timings', default=None)
+_lock = threading.Lock()
+# (name, labels) -> [bucket counts..., +Inf count, sum]
+_histograms = {}
+# labels -> count
+_requests = {}
+
+
+class RequestTimings:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.sql = 0.0
+        self.serializer = 0.0
+        self.serializing = False
+
+    def __call__(self, execute, sql, params, many, context):
+        # Database execute wrapper
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.sql += time.perf_counter() - started
+
+    def server_timing(self, total):
+        return (
+            f'sql;dur={self.sql * 1000:.3f};desc="{self.queries} queries", '
+            f'serialize;dur={self.serializer * 1000:.3f}, '
+            f'total;dur={total * 1000:.3f}'
+        )
+
+
+def start():
+    timings = RequestTimings()
+    return timings, _current.set(timings)
+
+
+def finish(token):
+    _current.reset(token)
+
+
+def timed_data(data):
+    """Wrap the ``BaseSerializer.data`` property to add its time, less SQL, to the current request."""
+    def wrapper(serializer):
+        timings = _current.get()
+        if timings is None or timings.serializing:
+            return data.fget(serializer)
+        timings.serializing = True
+        started, sql = time.perf_counter(), timings.sql
+        try:
+            return data.fget(serializer)
+        finally:
+            timings.serializing = False
+            timings.serializer += time.perf_counter() - started - (timings.sql - sql)
+    wrapper.timed = True
+    return property(wrapper)
+
+
+def instrument_serializers():
+    if not getattr(BaseSerializer.data.fget, 'timed', False):
+        BaseSerializer.data = timed_data(BaseSerializer.data)
+
+
+def observe(name, labels, value):
+    buckets = HISTOGRAMS[name][1]
+    key = (name, labels)
+    with _lock:
+        series = _histograms.get(key)
+        if series is None:
+            series = _histograms[key] = [0] * (len(buckets) + 2)
+        series[bisect_left(buckets, value)] += 1
+        series[-1] += value
+
+
+def record(view, method, status, timings, total):
+    labels = (('view', view), ('method', method))
+    observe('http_request_duration_seconds', labels, total)
+    observe('http_request_sql_duration_seconds', labels, timings.sql)
+    observe('http_request_serializer_duration_seconds', labels, timings.serializer)
+    observe('http_request_sql_queries', labels, timings.queries)
+    key = labels + (('status', str(status)),)
+    with _lock:
+        _requests[key] = _requests.get(key, 0) + 1
+
+
+def reset():
+    with _lock:
+        _histograms.clear()
+        _requests.clear()
+
+
+def escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def format_labels(labels, **extra):
+    pairs = list(labels) + list(extra.items())
+    return '{' + ','.join(f'{name}="{escape(value)}"' for name, value in pairs) + '}'
+
+
+def format_number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render():
+    """All metrics in the Prometheus text exposition format."""
+    with _lock:
+        histograms = {key: list(series) for key, series in _histograms.items()}
+        requests = dict(_requests)
+
+    lines = [f'# HELP {REQUESTS_TOTAL} Requests served, by view and status.', f'# TYPE {REQUESTS_TOTAL} counter']
+    for labels, count in sorted(requests.items()):
+        lines.append(f'{REQUESTS_TOTAL}{format_labels(labels)} {count}')
+    for name, (help_text, buckets) in HISTOGRAMS.items():
+        lines += [f'# HELP {name} {help_text}', f'# TYPE {name} histogram']
+        for (series_name, labels), series in sorted(histograms.items()):
+            if series_name != name:
+                continue
+            cumulative = 0
+            for bound, count in zip(buckets, series):
+                cumulative += count
+                lines.append(f'{name}_bucket{format_labels(labels, le=format_number(bound))} {cumulative}')
+            cumulative += series[len(buckets)]
+            lines.append(f'{name}_bucket{format_labels(labels, le="+Inf")} {cumulative}')
+            lines.append(f'{name}_sum{format_labels(labels)} {format_number(series[-1])}')
+            lines.append(f'{name}_count{format_labels(labels)} {cumulative}')
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,78 @@
+import time
+from contextlib import ExitStack
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+from . import metrics
+
+
+def view_name(view_func):
+    """``ProjectViewSet.list`` for a viewset action, the class name for other DRF views."""
+    view_class = getattr(view_func, 'cls', None)
+    if view_class is None:
+        return getattr(view_func, '__name__', 'unknown')
+    return view_class.__name__
+
+
+class PerformanceMiddleware:
+    """
+    Times each request's SQL, serialization and total time, sends them as a
+    Server-Timing header and records them per view for /metrics. Works in
+    both the sync and the async (ASGI) middleware chain.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'PERFORMANCE_METRICS', True):
+            raise MiddlewareNotUsed()
+        metrics.instrument_serializers()
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        timings, token = metrics.start()
+        try:
+            with self.wrap_queries(timings):
+                response = self.get_response(request)
+        finally:
+            metrics.finish(token)
+        return self.finish(request, response, timings)
+
+    async def __acall__(self, request):
+        timings, token = metrics.start()
+        # Queries run in the request's sync_to_async thread, whose connections
+        # are the ones to wrap
+        stack = await sync_to_async(self.wrap_queries)(timings)
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(stack.close)()
+            metrics.finish(token)
+        return self.finish(request, response, timings)
+
+    def wrap_queries(self, timings):
+        stack = ExitStack()
+        for alias in connections:
+            stack.enter_context(connections[alias].execute_wrapper(timings))
+        return stack
+
+    def finish(self, request, response, timings):
+        total = time.perf_counter() - timings.started
+        response['Server-Timing'] = timings.server_timing(total)
+        view = getattr(request, 'metrics_view', 'unmatched')
+        metrics.record(view, request.method, response.status_code, timings, total)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        name = view_name(view_func)
+        actions = getattr(view_func, 'actions', None)
+        if actions and request.method.lower() in actions:
+            name = f'{name}.{actions[request.method.lower()]}'
+        request.metrics_view = name
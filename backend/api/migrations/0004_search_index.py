@@ -0,0 +1,37 @@
+# Generated by Django 4.2.19 on 2026-10-18 12:28
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def build_search_index(apps, schema_editor):
+    from api.search import rebuild_index
+    rebuild_index(apps.get_model('api', 'Project'), apps.get_model('api', 'SearchTerm'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0003_project_created_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchTerm',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(max_length=64)),
+                ('category', models.CharField(max_length=20)),
+                ('weight', models.FloatField()),
+                ('project', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_terms', to='api.project')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['category', 'term'], name='search_term_category_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='searchterm',
+            constraint=models.UniqueConstraint(fields=('term', 'project'), name='unique_search_term'),
+        ),
+        migrations.RunPython(build_search_index, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 4.2.19 on 2026-10-18 12:30
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def build_rating_stats(apps, schema_editor):
+    Rating = apps.get_model('api', 'Rating')
+    ProjectRatingStats = apps.get_model('api', 'ProjectRatingStats')
+    totals = {'count': models.Count('id')}
+    for criterion in ('creativity', 'technical_skills', 'impact', 'presentation'):
+        totals[f'{criterion}_sum'] = models.Sum(criterion)
+        totals[f'{criterion}_sumsq'] = models.Sum(models.F(criterion) * models.F(criterion))
+    rows = Rating.objects.order_by().values('project_id').annotate(**totals)
+    ProjectRatingStats.objects.bulk_create([ProjectRatingStats(**row) for row in rows])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0004_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProjectRatingStats',
+            fields=[
+                ('project', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='rating_stats', serialize=False, to='api.project')),
+                ('count', models.IntegerField(default=0)),
+                ('creativity_sum', models.IntegerField(default=0)),
+                ('creativity_sumsq', models.IntegerField(default=0)),
+                ('technical_skills_sum', models.IntegerField(default=0)),
+                ('technical_skills_sumsq', models.IntegerField(default=0)),
+                ('impact_sum', models.IntegerField(default=0)),
+                ('impact_sumsq', models.IntegerField(default=0)),
+                ('presentation_sum', models.IntegerField(default=0)),
+                ('presentation_sumsq', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.RunPython(build_rating_stats, migrations.RunPython.noop),
+    ]
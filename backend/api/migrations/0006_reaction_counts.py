@@ -0,0 +1,55 @@
+# Generated by Django 4.2.19 on 2026-10-18 12:33
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def remove_duplicate_reactions(apps, schema_editor):
+    Reaction = apps.get_model('api', 'Reaction')
+    keep = (
+        Reaction.objects.order_by()
+        .values('project_id', 'user_id', 'reaction_type')
+        .annotate(keep_id=models.Min('id'))
+        .values('keep_id')
+    )
+    Reaction.objects.exclude(id__in=keep).delete()
+
+
+def build_reaction_counts(apps, schema_editor):
+    Reaction = apps.get_model('api', 'Reaction')
+    ReactionCount = apps.get_model('api', 'ReactionCount')
+    rows = Reaction.objects.order_by().values('project_id', 'reaction_type').annotate(count=models.Count('id'))
+    ReactionCount.objects.bulk_create([ReactionCount(**row) for row in rows])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0005_project_rating_stats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReactionCount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('reaction_type', models.CharField(choices=[('Like', 'Like'), ('Love', 'Love'), ('Clap', 'Clap'), ('ThumbsUp', 'ThumbsUp'), ('Star', 'Star')], max_length=10)),
+                ('count', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(remove_duplicate_reactions, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='reaction',
+            constraint=models.UniqueConstraint(fields=('project', 'user', 'reaction_type'), name='unique_reaction'),
+        ),
+        migrations.AddField(
+            model_name='reactioncount',
+            name='project',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reaction_counts', to='api.project'),
+        ),
+        migrations.AddConstraint(
+            model_name='reactioncount',
+            constraint=models.UniqueConstraint(fields=('project', 'reaction_type'), name='unique_reaction_count'),
+        ),
+        migrations.RunPython(build_reaction_counts, migrations.RunPython.noop),
+    ]
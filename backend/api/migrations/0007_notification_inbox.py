@@ -0,0 +1,38 @@
+# Generated by Django 4.2.19 on 2026-10-18 12:34
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def build_unread_counters(apps, schema_editor):
+    Notification = apps.get_model('api', 'Notification')
+    NotificationCounter = apps.get_model('api', 'NotificationCounter')
+    rows = Notification.objects.filter(is_read=False).order_by().values('user_id').annotate(unread=models.Count('id'))
+    NotificationCounter.objects.bulk_create([NotificationCounter(**row) for row in rows])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0006_reaction_counts'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NotificationCounter',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='notification_counter', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('unread', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['user', '-created_at', '-id'], name='notification_inbox_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['user', 'is_read', '-created_at', '-id'], name='notification_unread_idx'),
+        ),
+        migrations.RunPython(build_unread_counters, migrations.RunPython.noop),
+    ]
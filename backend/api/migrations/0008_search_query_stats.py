@@ -0,0 +1,60 @@
+# Generated by Django 4.2.19 on 2026-10-18 12:36
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+def build_search_rollups(apps, schema_editor):
+    # Older logs have no result counts, so only the search totals are rolled up
+    SearchLog = apps.get_model('api', 'SearchLog')
+    SearchQueryStat = apps.get_model('api', 'SearchQueryStat')
+    totals = {}
+    for query, created_at in SearchLog.objects.values_list('query', 'created_at').iterator():
+        key = (created_at.date(), ' '.join(query.lower().split())[:255])
+        totals[key] = totals.get(key, 0) + 1
+    SearchQueryStat.objects.bulk_create([
+        SearchQueryStat(day=day, query=query, searches=searches)
+        for (day, query), searches in totals.items()
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_notification_inbox'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchQueryStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('query', models.CharField(max_length=255)),
+                ('searches', models.IntegerField(default=0)),
+                ('zero_results', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='searchlog',
+            name='result_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AlterField(
+            model_name='searchlog',
+            name='created_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AlterField(
+            model_name='searchlog',
+            name='user',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddConstraint(
+            model_name='searchquerystat',
+            constraint=models.UniqueConstraint(fields=('day', 'query'), name='unique_search_query_stat'),
+        ),
+        migrations.RunPython(build_search_rollups, migrations.RunPython.noop),
+    ]
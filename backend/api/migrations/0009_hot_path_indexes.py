@@ -0,0 +1,59 @@
+# Generated by Django 4.2.19 on 2026-10-18 12:47
+
+from django.db import migrations, models
+
+
+def remove_duplicate_ratings(apps, schema_editor):
+    # Keep each reviewer's latest rating of a project
+    Rating = apps.get_model('api', 'Rating')
+    ProjectRatingStats = apps.get_model('api', 'ProjectRatingStats')
+    keep = (
+        Rating.objects.order_by()
+        .values('project_id', 'user_id')
+        .annotate(keep_id=models.Max('id'))
+        .values('keep_id')
+    )
+    duplicates = Rating.objects.exclude(id__in=keep)
+    project_ids = set(duplicates.values_list('project_id', flat=True))
+    if not project_ids:
+        return
+    duplicates.delete()
+
+    totals = {'count': models.Count('id')}
+    for criterion in ('creativity', 'technical_skills', 'impact', 'presentation'):
+        totals[f'{criterion}_sum'] = models.Sum(criterion)
+        totals[f'{criterion}_sumsq'] = models.Sum(models.F(criterion) * models.F(criterion))
+    rows = Rating.objects.filter(project_id__in=project_ids).order_by().values('project_id').annotate(**totals)
+    ProjectRatingStats.objects.filter(project_id__in=project_ids).delete()
+    ProjectRatingStats.objects.bulk_create([ProjectRatingStats(**row) for row in rows])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0008_search_query_stats'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='feedback',
+            index=models.Index(fields=['project', 'created_at', 'id'], name='feedback_project_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='rating',
+            index=models.Index(fields=['created_at'], name='rating_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='reaction',
+            index=models.Index(fields=['project', 'reaction_type'], name='reaction_project_type_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='report',
+            index=models.Index(fields=['status', '-created_at', '-id'], name='report_status_idx'),
+        ),
+        migrations.RunPython(remove_duplicate_ratings, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='rating',
+            constraint=models.UniqueConstraint(fields=('project', 'user'), name='unique_rating'),
+        ),
+    ]
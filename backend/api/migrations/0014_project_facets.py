@@ -0,0 +1,78 @@
+# Generated by Django 4.2.19 on 2026-10-18 13:32
+
+from collections import Counter
+
+from django.db import migrations, models
+from django.db.models.functions import Cast
+
+
+def backfill_facets(apps, schema_editor):
+    Project = apps.get_model('api', 'Project')
+    User = apps.get_model('api', 'User')
+    ProjectRatingStats = apps.get_model('api', 'ProjectRatingStats')
+    ProjectFacetCount = apps.get_model('api', 'ProjectFacetCount')
+
+    institution = User.objects.filter(pk=models.OuterRef('user_id')).values('institution')[:1]
+    Project.objects.update(institution=models.Subquery(institution))
+
+    criteria = ('creativity', 'technical_skills', 'impact', 'presentation')
+    total = sum((models.F(f'{criterion}_sum') for criterion in criteria[1:]), models.F(f'{criteria[0]}_sum'))
+    ProjectRatingStats.objects.filter(count__gt=0).update(
+        overall_average=Cast(total, models.FloatField()) / (models.F('count') * len(criteria))
+    )
+
+    counts = Counter()
+    rows = (
+        Project.objects.order_by()
+        .values_list('category', 'institution', 'rating_stats__overall_average')
+        .annotate(count=models.Count('pk'))
+    )
+    for category, institution, rating, count in rows:
+        counts[category, institution or '', -1.0 if rating is None else rating] += count
+    ProjectFacetCount.objects.bulk_create([
+        ProjectFacetCount(category=category, institution=institution, rating=rating, count=count)
+        for (category, institution, rating), count in counts.items()
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0013_jobs'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProjectFacetCount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('category', models.CharField(choices=[('Hackathon', 'Hackathon'), ('Class Project', 'Class Project'), ('Research', 'Research')], max_length=20)),
+                ('institution', models.CharField(blank=True, default='', max_length=255)),
+                ('rating', models.FloatField(default=-1.0)),
+                ('count', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='project',
+            name='institution',
+            field=models.CharField(blank=True, editable=False, max_length=255, null=True),
+        ),
+        migrations.AddField(
+            model_name='projectratingstats',
+            name='overall_average',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='project',
+            index=models.Index(fields=['institution', '-created_at', '-id'], name='project_institution_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='projectratingstats',
+            index=models.Index(fields=['overall_average'], name='rating_stats_overall_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='projectfacetcount',
+            constraint=models.UniqueConstraint(fields=('category', 'institution', 'rating'), name='unique_project_facet'),
+        ),
+        migrations.RunPython(backfill_facets, migrations.RunPython.noop),
+    ]
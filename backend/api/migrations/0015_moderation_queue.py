@@ -0,0 +1,31 @@
+# Generated by Django 4.2.19 on 2026-10-18 14:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0014_project_facets'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='feedback',
+            name='is_hidden',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AlterField(
+            model_name='report',
+            name='status',
+            field=models.CharField(choices=[('Pending', 'Pending'), ('Reviewed', 'Reviewed'), ('Resolved', 'Resolved'), ('Dismissed', 'Dismissed')], default='Pending', max_length=10),
+        ),
+        migrations.AddIndex(
+            model_name='report',
+            index=models.Index(fields=['status', 'project', 'created_at'], name='report_status_project_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='report',
+            index=models.Index(fields=['status', 'feedback', 'created_at'], name='report_status_feedback_idx'),
+        ),
+    ]
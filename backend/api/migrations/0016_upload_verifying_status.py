@@ -0,0 +1,18 @@
+# Generated by Django 4.2.19 on 2026-10-18 14:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0015_moderation_queue'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='uploadsession',
+            name='status',
+            field=models.CharField(choices=[('Active', 'Active'), ('Verifying', 'Verifying'), ('Complete', 'Complete')], default='Active', max_length=10),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 4.2.19 on 2026-10-18 16:05
+
+from django.db import migrations
+
+
+def queue_unfinished_variants(apps, schema_editor):
+    # Variants used to be generated by an in-process thread pool; images it
+    # never finished, or failed on, go to the job queue instead
+    ImageAsset = apps.get_model('api', 'ImageAsset')
+    Job = apps.get_model('api', 'Job')
+    unfinished = ImageAsset.objects.filter(status__in=['Pending', 'Failed'])
+    Job.objects.bulk_create([
+        Job(name='generate_image_variants', payload={'asset': asset_id})
+        for asset_id in unfinished.values_list('id', flat=True)
+    ], batch_size=1000)
+    unfinished.update(status='Pending')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0016_upload_verifying_status'),
+    ]
+
+    operations = [
+        migrations.RunPython(queue_unfinished_variants, migrations.RunPython.noop),
+    ]
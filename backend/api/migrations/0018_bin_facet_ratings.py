@@ -0,0 +1,36 @@
+# Generated by Django 4.2.19 on 2026-10-18 18:40
+
+import math
+from collections import Counter
+
+from django.db import migrations
+
+UNRATED = -1.0
+
+
+def bin_ratings(apps, schema_editor):
+    # The counts were kept per exact average; merge them into half-star bins
+    ProjectFacetCount = apps.get_model('api', 'ProjectFacetCount')
+    counts = Counter()
+    for category, institution, rating, count in ProjectFacetCount.objects.values_list(
+        'category', 'institution', 'rating', 'count'
+    ):
+        if rating != UNRATED:
+            rating = math.floor(rating * 2) / 2
+        counts[category, institution, rating] += count
+    ProjectFacetCount.objects.all().delete()
+    ProjectFacetCount.objects.bulk_create([
+        ProjectFacetCount(category=category, institution=institution, rating=rating, count=count)
+        for (category, institution, rating), count in counts.items()
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0017_queue_image_variants'),
+    ]
+
+    operations = [
+        migrations.RunPython(bin_ratings, migrations.RunPython.noop),
+    ]
@@ -1,5 +1,9 @@
-from django.db import models
+import uuid
+
+from django.db import models, transaction
 from django.contrib.auth.models import AbstractUser
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
 
 # Custom User Model
 class User(AbstractUser):
@@ -11,6 +15,7 @@ class User(AbstractUser):
     email = models.EmailField(unique=True)
     role = models.CharField(max_length=10, choices=ROLE_CHOICES)
     profile_picture = models.ImageField(upload_to='profile_pics/', blank=True, null=True)
+    avatar = models.ForeignKey('ImageAsset', on_delete=models.SET_NULL, blank=True, null=True, related_name='+')
     institution = models.CharField(max_length=255, blank=True, null=True)
 
     def __str__(self):
@@ -30,9 +35,19 @@ class Project(models.Model):
     upload_path = models.FileField(upload_to='projects/', blank=True, null=True)
     video_url = models.URLField(blank=True, null=True)
     thumbnail = models.URLField(blank=True, null=True)
+    thumbnail_image = models.ForeignKey('ImageAsset', on_delete=models.SET_NULL, blank=True, null=True, related_name='+')
+    # Copy of the author's institution for filtering and facet counts; see api/facets.py
+    institution = models.CharField(max_length=255, blank=True, null=True, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            # Keyset pagination seeks on (created_at, id)
+            models.Index(fields=['-created_at', '-id'], name='project_created_idx'),
+            models.Index(fields=['institution', '-created_at', '-id'], name='project_institution_idx'),
+        ]
+
     def __str__(self):
         return self.title
 
@@ -42,12 +57,22 @@ class Feedback(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     comment = models.TextField()
     created_at = models.DateTimeField(auto_now_add=True)
+    # Set by moderators (api/moderation.py); hidden comments are left out of public listings
+    is_hidden = models.BooleanField(default=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['project', 'created_at', 'id'], name='feedback_project_idx'),
+        ]
 
     def __str__(self):
         return f"Feedback by {self.user.username} on {self.project.title}"
 
 # Rating Model
 class Rating(models.Model):
+    CRITERIA = ('creativity', 'technical_skills', 'impact', 'presentation')
+    SCORE_FIELDS = ('project_id', *CRITERIA)
+
     project = models.ForeignKey(Project, on_delete=models.CASCADE)
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     creativity = models.IntegerField(choices=[(i, i) for i in range(1, 6)])
@@ -56,6 +81,73 @@ class Rating(models.Model):
     presentation = models.IntegerField(choices=[(i, i) for i in range(1, 6)])
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        constraints = [
+            # One rating per reviewer and project; also serves lookups by project
+            models.UniqueConstraint(fields=['project', 'user'], name='unique_rating'),
+        ]
+        indexes = [
+            # Time-windowed leaderboards
+            models.Index(fields=['created_at'], name='rating_created_idx'),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the stored scores so the aggregates can be adjusted on update.
+        # Reading a deferred score would load it, and with it this hook, again.
+        stored = instance.__dict__
+        if all(name in stored for name in cls.SCORE_FIELDS):
+            instance._loaded_scores = {name: stored[name] for name in cls.SCORE_FIELDS}
+        return instance
+
+    def get_scores(self):
+        return {'project_id': self.project_id, **{name: getattr(self, name) for name in self.CRITERIA}}
+
+    def save(self, *args, **kwargs):
+        # The aggregate update in the post_save handler commits with the row
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
+# Rating Aggregate Model
+class ProjectRatingStats(models.Model):
+    project = models.OneToOneField(Project, on_delete=models.CASCADE, primary_key=True, related_name='rating_stats')
+    count = models.IntegerField(default=0)
+    creativity_sum = models.IntegerField(default=0)
+    creativity_sumsq = models.IntegerField(default=0)
+    technical_skills_sum = models.IntegerField(default=0)
+    technical_skills_sumsq = models.IntegerField(default=0)
+    impact_sum = models.IntegerField(default=0)
+    impact_sumsq = models.IntegerField(default=0)
+    presentation_sum = models.IntegerField(default=0)
+    presentation_sumsq = models.IntegerField(default=0)
+    # overall() stored for the rating range filter, None without ratings
+    overall_average = models.FloatField(blank=True, null=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['overall_average'], name='rating_stats_overall_idx'),
+        ]
+
+    def average(self, criterion):
+        if not self.count:
+            return None
+        return getattr(self, f'{criterion}_sum') / self.count
+
+    def variance(self, criterion):
+        if not self.count:
+            return None
+        mean = self.average(criterion)
+        return max(getattr(self, f'{criterion}_sumsq') / self.count - mean * mean, 0.0)
+
+    def overall(self):
+        # Divided once, the way ratings.overall_expression() computes the stored value
+        if not self.count:
+            return None
+        total = sum(getattr(self, f'{criterion}_sum') for criterion in Rating.CRITERIA)
+        return total / (self.count * len(Rating.CRITERIA))
+
 # Reaction Model
 class Reaction(models.Model):
     REACTION_CHOICES = [
@@ -70,6 +162,45 @@ class Reaction(models.Model):
     reaction_type = models.CharField(max_length=10, choices=REACTION_CHOICES)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['project', 'user', 'reaction_type'], name='unique_reaction'),
+        ]
+        indexes = [
+            models.Index(fields=['project', 'reaction_type'], name='reaction_project_type_idx'),
+        ]
+
+# Reaction Counter Model
+class ReactionCount(models.Model):
+    project = models.ForeignKey(Project, on_delete=models.CASCADE, related_name='reaction_counts')
+    reaction_type = models.CharField(max_length=10, choices=Reaction.REACTION_CHOICES)
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['project', 'reaction_type'], name='unique_reaction_count'),
+        ]
+
+# Project Facet Counter Model
+class ProjectFacetCount(models.Model):
+    """
+    How many projects share a category, author institution and half-star bin
+    of the overall average rating (``rating`` is the bin's lower edge; see
+    api/facets.py). Projects without an institution are counted under '' and
+    unrated ones under UNRATED, so every combination has exactly one row.
+    """
+    UNRATED = -1.0
+
+    category = models.CharField(max_length=20, choices=Project.CATEGORY_CHOICES)
+    institution = models.CharField(max_length=255, blank=True, default='')
+    rating = models.FloatField(default=UNRATED)
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['category', 'institution', 'rating'], name='unique_project_facet'),
+        ]
+
 # Collaboration Model
 class Collaboration(models.Model):
     STATUS_CHOICES = [
@@ -89,11 +220,48 @@ class Notification(models.Model):
     is_read = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', '-created_at', '-id'], name='notification_inbox_idx'),
+            models.Index(fields=['user', 'is_read', '-created_at', '-id'], name='notification_unread_idx'),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the stored state so the unread counter can be adjusted on update
+        instance._loaded_is_read = instance.__dict__.get('is_read')
+        return instance
+
+    def save(self, *args, **kwargs):
+        # The counter update in the post_save handler commits with the row
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
+# Unread Notification Counter Model
+class NotificationCounter(models.Model):
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='notification_counter')
+    unread = models.IntegerField(default=0)
+
 # Search Log Model
 class SearchLog(models.Model):
-    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True)
     query = models.CharField(max_length=255)
-    created_at = models.DateTimeField(auto_now_add=True)
+    result_count = models.IntegerField(default=0)
+    # Set when the search ran, not when the buffered row was written
+    created_at = models.DateTimeField(default=timezone.now)
+
+# Search Query Rollup Model
+class SearchQueryStat(models.Model):
+    day = models.DateField()
+    query = models.CharField(max_length=255)
+    searches = models.IntegerField(default=0)
+    zero_results = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['day', 'query'], name='unique_search_query_stat'),
+        ]
 
 # Report Model
 class Report(models.Model):
@@ -101,6 +269,7 @@ class Report(models.Model):
         ('Pending', 'Pending'),
         ('Reviewed', 'Reviewed'),
         ('Resolved', 'Resolved'),
+        ('Dismissed', 'Dismissed'),
     ]
     reported_by = models.ForeignKey(User, on_delete=models.CASCADE)
     project = models.ForeignKey(Project, on_delete=models.CASCADE)
@@ -108,3 +277,122 @@ class Report(models.Model):
     reason = models.TextField()
     status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='Pending')
     created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', '-created_at', '-id'], name='report_status_idx'),
+            # The moderation queue counts pending reports per project or per comment
+            models.Index(fields=['status', 'project', 'created_at'], name='report_status_project_idx'),
+            models.Index(fields=['status', 'feedback', 'created_at'], name='report_status_feedback_idx'),
+        ]
+
+# Search Index Model
+class SearchTerm(models.Model):
+    term = models.CharField(max_length=64)
+    project = models.ForeignKey(Project, on_delete=models.CASCADE, related_name='search_terms')
+    category = models.CharField(max_length=20)
+    weight = models.FloatField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['term', 'project'], name='unique_search_term'),
+        ]
+        indexes = [
+            models.Index(fields=['category', 'term'], name='search_term_category_idx'),
+        ]
+
+# Idempotency Key Model
+class IdempotencyKey(models.Model):
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    key = models.CharField(max_length=255)
+    # Hash of the request the key was first used with
+    fingerprint = models.CharField(max_length=64)
+    status_code = models.IntegerField()
+    response = models.JSONField(encoder=DjangoJSONEncoder)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'key'], name='unique_idempotency_key'),
+        ]
+        indexes = [
+            models.Index(fields=['created_at'], name='idempotency_created_idx'),
+        ]
+
+def image_path(instance, filename):
+    # Content-addressed: the same bytes always land at the same path
+    return f'images/{instance.digest[:2]}/{instance.digest}/{filename}'
+
+# Image Asset Model
+class ImageAsset(models.Model):
+    STATUS_CHOICES = [
+        ('Pending', 'Pending'),
+        ('Ready', 'Ready'),
+        ('Failed', 'Failed'),
+    ]
+    digest = models.CharField(max_length=64, unique=True)
+    original = models.FileField(upload_to=image_path)
+    width = models.IntegerField(default=0)
+    height = models.IntegerField(default=0)
+    # {variant: {format: storage path}}, filled in by the job workers
+    variants = models.JSONField(default=dict)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='Pending')
+    uploaded_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+def stored_file_path(instance, filename):
+    return f'files/{instance.digest[:2]}/{instance.digest}/{filename}'
+
+# Stored File Model
+class StoredFile(models.Model):
+    # Identical uploads share one file
+    digest = models.CharField(max_length=64, unique=True)
+    file = models.FileField(upload_to=stored_file_path, max_length=255)
+    size = models.BigIntegerField()
+    content_type = models.CharField(max_length=100, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+# Resumable Upload Session Model
+class UploadSession(models.Model):
+    STATUS_CHOICES = [
+        ('Active', 'Active'),
+        # Every byte received; the file is being hashed and stored
+        ('Verifying', 'Verifying'),
+        ('Complete', 'Complete'),
+    ]
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    project = models.ForeignKey(Project, on_delete=models.CASCADE)
+    filename = models.CharField(max_length=100)
+    content_type = models.CharField(max_length=100, blank=True)
+    size = models.BigIntegerField()
+    offset = models.BigIntegerField(default=0)
+    # SHA-256 the client expects the whole file to have, if it sent one
+    sha256 = models.CharField(max_length=64, blank=True)
+    stored_file = models.ForeignKey(StoredFile, on_delete=models.SET_NULL, null=True, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='Active')
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+# Background Job Model
+class Job(models.Model):
+    STATUS_CHOICES = [
+        ('Queued', 'Queued'),
+        ('Running', 'Running'),
+        ('Failed', 'Failed'),
+    ]
+    name = models.CharField(max_length=100)
+    payload = models.JSONField(default=dict)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='Queued')
+    attempts = models.IntegerField(default=0)
+    # Not picked up before this time; pushed back after a failed attempt
+    run_at = models.DateTimeField(default=timezone.now)
+    locked_by = models.CharField(max_length=100, blank=True)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'run_at', 'id'], name='job_ready_idx'),
+        ]
@@ -0,0 +1,98 @@
+"""
+The moderation queue over Report.
+
+Moderators page through pending reports oldest first, or see them grouped by
+the project or comment they point at, largest group first, so a spam wave
+shows up as one row. Transitions resolve or dismiss many reports at once with
+a single UPDATE, and resolving can hide the reported comments in the same
+transaction.
+"""
+from django.db import transaction
+from django.db.models import Count, Max, Min
+
+from . import caching, events
+from .models import Feedback, Project, Report
+
+# Reports a transition still applies to
+OPEN_STATUSES = ('Pending', 'Reviewed')
+TRANSITIONS = {'resolve': 'Resolved', 'dismiss': 'Dismissed'}
+GROUPS = ('project', 'feedback')
+
+
+def queue():
+    """Pending reports, with the reporter's name, the project title and the comment."""
+    return Report.objects.filter(status='Pending').select_related('reported_by', 'project', 'feedback').only(
+        'id', 'reason', 'status', 'created_at', 'reported_by_id', 'reported_by__username',
+        'project_id', 'project__title', 'feedback_id', 'feedback__comment', 'feedback__is_hidden',
+    )
+
+
+def groups(group):
+    """Pending reports counted per project or per comment, as dicts."""
+    reports = Report.objects.filter(status='Pending')
+    if group == 'feedback':
+        reports = reports.filter(feedback__isnull=False)
+    return reports.order_by().values(group).annotate(
+        count=Count('id'), first_reported=Min('created_at'), last_reported=Max('created_at'),
+    )
+
+
+def describe(rows, group):
+    """Add what each group points at to a page of groups(), with one query."""
+    ids = [row[group] for row in rows]
+    if group == 'project':
+        titles = dict(Project.objects.filter(pk__in=ids).values_list('id', 'title'))
+        return [{**row, 'title': titles.get(row['project'])} for row in rows]
+    comments = {
+        feedback['id']: feedback
+        for feedback in Feedback.objects.filter(pk__in=ids).values('id', 'project_id', 'comment', 'is_hidden')
+    }
+    return [
+        {
+            **row,
+            'project': comments.get(row['feedback'], {}).get('project_id'),
+            'comment': comments.get(row['feedback'], {}).get('comment'),
+            'is_hidden': comments.get(row['feedback'], {}).get('is_hidden'),
+        }
+        for row in rows
+    ]
+
+
+def select(ids=None, project=None, feedback=None):
+    """The reports a transition names: by id, or all of one project's or one comment's."""
+    if ids is not None:
+        return Report.objects.filter(pk__in=ids)
+    if project is not None:
+        return Report.objects.filter(project_id=project)
+    return Report.objects.filter(feedback_id=feedback)
+
+
+def transition(reports, status, hide_feedback=False):
+    """
+    Move the open reports among ``reports`` to ``status`` in one UPDATE, and
+    with ``hide_feedback`` hide the comments they report in another. Closed
+    reports are left alone, so repeating a transition changes nothing.
+    Returns (reports updated, comments hidden).
+    """
+    reports = reports.filter(status__in=OPEN_STATUSES)
+    with transaction.atomic():
+        hidden = []
+        if hide_feedback:
+            hidden = list(
+                Feedback.objects.filter(pk__in=reports.values('feedback_id'), is_hidden=False)
+                .values_list('id', 'project_id')
+            )
+            Feedback.objects.filter(pk__in=[feedback_id for feedback_id, project_id in hidden]).update(is_hidden=True)
+        updated = reports.update(status=status)
+
+        if hidden:
+            project_ids = {project_id for feedback_id, project_id in hidden}
+            caching.bump(
+                'feedbacks', 'projects',
+                *(f'feedback:{feedback_id}' for feedback_id, project_id in hidden),
+                *(f'project:{project_id}' for project_id in project_ids),
+            )
+            for feedback_id, project_id in hidden:
+                # Live viewers drop the comment as if it had been deleted
+                events.publish(project_id, 'feedback_deleted', lambda feedback_id=feedback_id: {'id': feedback_id})
+    return updated, len(hidden)
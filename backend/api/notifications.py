@@ -0,0 +1,132 @@
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Count, F
+
+from . import jobs
+from .models import Collaboration, Notification, NotificationCounter, Project, User
+
+PROJECT_EVENT = 'notify_project_event'
+MESSAGES = {
+    'feedback': '{actor} left feedback on "{title}"',
+    'rating': '{actor} rated "{title}"',
+    'collaboration_request': '{actor} asked to collaborate on "{title}"',
+    'collaboration_status': '{actor} {status} your request to collaborate on "{title}"',
+}
+
+
+def adjust_unread(deltas):
+    """
+    Apply {user_id: change} to the unread counters, one UPDATE per distinct
+    change. Only increments create missing counters: a decrement for a user
+    whose counter is gone, as when the user is being deleted, matches nothing.
+    """
+    deltas = {user_id: delta for user_id, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    by_delta = defaultdict(list)
+    for user_id, delta in deltas.items():
+        by_delta[delta].append(user_id)
+    with transaction.atomic():
+        NotificationCounter.objects.bulk_create(
+            [NotificationCounter(user_id=user_id) for user_id, delta in deltas.items() if delta > 0],
+            ignore_conflicts=True,
+        )
+        for delta, user_ids in by_delta.items():
+            NotificationCounter.objects.filter(user_id__in=user_ids).update(unread=F('unread') + delta)
+
+
+def unread_count(user_id):
+    counter = NotificationCounter.objects.filter(user_id=user_id).values_list('unread', flat=True).first()
+    return max(counter or 0, 0)
+
+
+def mark_read(user_id, ids=None):
+    """Mark a user's notifications (all, or the given ids) as read in one UPDATE."""
+    with transaction.atomic():
+        unread = Notification.objects.filter(user_id=user_id, is_read=False)
+        if ids is not None:
+            unread = unread.filter(id__in=ids)
+        updated = unread.update(is_read=True)
+        adjust_unread({user_id: -updated})
+    return updated
+
+
+def notify(user_ids, message):
+    """Create one unread notification per user with a single INSERT."""
+    return notify_many((user_id, message) for user_id in dict.fromkeys(user_ids))
+
+
+def notify_many(messages, batch_size=1000):
+    """Create unread notifications from (user_id, message) pairs in bulk."""
+    rows = [Notification(user_id=user_id, message=message) for user_id, message in messages]
+    unread = defaultdict(int)
+    for row in rows:
+        unread[row.user_id] += 1
+    with transaction.atomic():
+        created = Notification.objects.bulk_create(rows, batch_size=batch_size)
+        adjust_unread(unread)
+    return created
+
+
+def queue_project_event(event, project_id, actor_id, **details):
+    """
+    Queue notifications about a project for a background worker. The audience
+    is resolved there, so the caller pays for one INSERT however large it is.
+    """
+    return jobs.enqueue(PROJECT_EVENT, {'event': event, 'project': project_id, 'actor': actor_id, **details})
+
+
+@jobs.task(PROJECT_EVENT)
+def fan_out_project_events(events):
+    """
+    Turn a batch of project events into notifications with a fixed number of
+    queries. Feedback and ratings go to the owner and accepted collaborators,
+    collaboration requests to the owner and their answers to the requester.
+    """
+    project_ids = {event['project'] for event in events}
+    projects = {
+        project_id: (owner_id, title)
+        for project_id, owner_id, title in Project.objects.filter(id__in=project_ids).values_list('id', 'user_id', 'title')
+    }
+    collaborators = defaultdict(set)
+    accepted = Collaboration.objects.filter(project_id__in=project_ids, status='Accepted')
+    for project_id, user_id in accepted.values_list('project_id', 'user_id'):
+        collaborators[project_id].add(user_id)
+    actors = dict(User.objects.filter(id__in={event['actor'] for event in events}).values_list('id', 'username'))
+
+    messages = []
+    for event in events:
+        if event['project'] not in projects or event['actor'] not in actors:
+            # Deleted since the event was queued
+            continue
+        owner_id, title = projects[event['project']]
+        if event['event'] == 'collaboration_status':
+            audience = {event['recipient']}
+        elif event['event'] == 'collaboration_request':
+            audience = {owner_id}
+        else:
+            audience = {owner_id} | collaborators[event['project']]
+        audience.discard(event['actor'])
+        message = MESSAGES[event['event']].format(
+            actor=actors[event['actor']], title=title, status=event.get('status', '').lower()
+        )
+        messages.extend((user_id, message) for user_id in sorted(audience))
+    notify_many(messages)
+
+
+def rebuild_unread_counts(user_ids=None):
+    """Recount unread notifications for every user or only the given ones."""
+    unread = Notification.objects.filter(is_read=False)
+    counters = NotificationCounter.objects.all()
+    if user_ids is not None:
+        unread = unread.filter(user_id__in=user_ids)
+        counters = counters.filter(user_id__in=user_ids)
+    rows = [
+        NotificationCounter(**row)
+        for row in unread.order_by().values('user_id').annotate(unread=Count('id'))
+    ]
+    with transaction.atomic():
+        counters.delete()
+        NotificationCounter.objects.bulk_create(rows)
+    return len(rows)
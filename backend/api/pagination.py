@@ -0,0 +1,154 @@
+import base64
+import json
+
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Cursor pagination that seeks on the ordering columns instead of using OFFSET.
+
+    The cursor is the ordering values of the last row on the page, so fetching
+    page N costs the same as fetching page 1 as long as the ordering is indexed.
+    The last ordering field must be unique (usually `id`) to break ties.
+    """
+    page_size = 20
+    max_page_size = 100
+    page_size_query_param = 'page_size'
+    cursor_query_param = 'cursor'
+    ordering = ('-created_at', '-id')
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        return self.get_page(list(self.seek(queryset, request)))
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """paginate_queryset() for async views, through the async ORM."""
+        return self.get_page([row async for row in self.seek(queryset, request)])
+
+    def seek(self, queryset, request):
+        """The rows of the requested page, plus one to tell whether there is another."""
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.next_values = None
+
+        queryset = queryset.order_by(*self.ordering)
+        values = self.decode_cursor(request, queryset.model)
+        if values is not None:
+            queryset = queryset.filter(self.seek_filter(values))
+        return queryset[:self.page_size + 1]
+
+    def get_page(self, rows):
+        page = rows[:self.page_size]
+        if len(rows) > self.page_size:
+            self.next_values = [self.get_value(page[-1], field) for field in self.ordering]
+        return page
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        if page_size <= 0:
+            return self.page_size
+        return min(page_size, self.max_page_size)
+
+    def get_next_link(self):
+        if self.next_values is None:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(self.next_values))
+
+    def get_first_link(self):
+        url = self.request.build_absolute_uri()
+        return remove_query_param(url, self.cursor_query_param)
+
+    # Cursor helpers
+
+    def get_value(self, obj, field):
+        name = field.lstrip('-')
+        value = obj[name] if isinstance(obj, dict) else getattr(obj, name)
+        if hasattr(value, 'isoformat'):
+            return value.isoformat()
+        return value
+
+    def encode_cursor(self, values):
+        raw = json.dumps(values, separators=(',', ':')).encode('utf-8')
+        return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+    def decode_cursor(self, request, model):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            padded = encoded + '=' * (-len(encoded) % 4)
+            values = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+            if not isinstance(values, list) or len(values) != len(self.ordering):
+                raise ValueError
+            return [
+                self.cursor_value(model, field.lstrip('-'), value)
+                for field, value in zip(self.ordering, values)
+            ]
+        except Exception:
+            raise NotFound(self.invalid_cursor_message)
+
+    def cursor_value(self, model, name, value):
+        return model._meta.get_field(name).to_python(value)
+
+    def seek_filter(self, values):
+        # (a, b) < (x, y)  ==>  a < x OR (a = x AND b < y), per-field direction
+        condition = Q()
+        equal = {}
+        for field, value in zip(self.ordering, values):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            condition |= Q(**equal, **{f'{name}__{lookup}': value})
+            equal[name] = value
+        return condition
+
+
+class FeedbackThreadPagination(KeysetPagination):
+    """Oldest first, so a thread reads top to bottom and new comments land on the last page."""
+    ordering = ('created_at', 'id')
+
+
+class ModerationQueuePagination(KeysetPagination):
+    """Oldest first, so reports are handled in the order they came in."""
+    ordering = ('created_at', 'id')
+
+
+class ReportGroupPagination(KeysetPagination):
+    """
+    Groups of pending reports from moderation.groups(), largest first. The
+    rows are dicts and ``count`` is an aggregate, so the seek is a HAVING
+    clause over every pending report; the (status, project) and (status,
+    feedback) indexes keep that to an index scan.
+    """
+
+    def __init__(self, group):
+        self.ordering = ('-count', group)
+
+    def cursor_value(self, model, name, value):
+        if name == 'count':
+            return int(value)
+        return super().cursor_value(model, name, value)
@@ -0,0 +1,108 @@
+from django.db import transaction
+from django.db.models import Case, Count, F, FloatField, Sum, When
+from django.db.models.functions import Cast
+
+from . import caching, events, facets, leaderboard
+from .models import Project, ProjectRatingStats, Rating
+
+
+def overall_expression():
+    """ProjectRatingStats.overall() in SQL, for the stored overall_average."""
+    total = sum((F(f'{criterion}_sum') for criterion in Rating.CRITERIA[1:]), F(f'{Rating.CRITERIA[0]}_sum'))
+    average = Cast(total, FloatField()) / (F('count') * len(Rating.CRITERIA))
+    return Case(When(count__gt=0, then=average), default=None, output_field=FloatField())
+
+
+def apply_scores(scores, sign):
+    """Add (sign=1) or remove (sign=-1) one rating's scores from its project's aggregates."""
+    project_id = scores['project_id']
+    changes = {'count': F('count') + sign}
+    for criterion in Rating.CRITERIA:
+        value = scores[criterion]
+        changes[f'{criterion}_sum'] = F(f'{criterion}_sum') + sign * value
+        changes[f'{criterion}_sumsq'] = F(f'{criterion}_sumsq') + sign * value * value
+    with facets.track(Project.objects.filter(pk=project_id)):
+        if sign > 0:
+            ProjectRatingStats.objects.get_or_create(project_id=project_id)
+        ProjectRatingStats.objects.filter(project_id=project_id).update(**changes)
+        ProjectRatingStats.objects.filter(project_id=project_id).update(overall_average=overall_expression())
+
+
+def rebuild_stats(project_ids=None, batch_size=1000):
+    """
+    Recompute the aggregates from the rating table, for every project or only
+    the given ones. Returns the number of aggregate rows written.
+    """
+    totals = {'count': Count('id')}
+    for criterion in Rating.CRITERIA:
+        totals[f'{criterion}_sum'] = Sum(criterion)
+        totals[f'{criterion}_sumsq'] = Sum(F(criterion) * F(criterion))
+
+    ratings = Rating.objects.all()
+    stats = ProjectRatingStats.objects.all()
+    if project_ids is not None:
+        ratings = ratings.filter(project_id__in=project_ids)
+        stats = stats.filter(project_id__in=project_ids)
+
+    rows = [
+        ProjectRatingStats(**row)
+        for row in ratings.order_by().values('project_id').annotate(**totals)
+    ]
+    for row in rows:
+        row.overall_average = row.overall()
+    if project_ids is None:
+        with transaction.atomic():
+            stats.delete()
+            ProjectRatingStats.objects.bulk_create(rows, batch_size=batch_size)
+            facets.rebuild_counts(batch_size=batch_size)
+        caching.bump_all()
+    else:
+        with facets.track(Project.objects.filter(pk__in=project_ids)):
+            stats.delete()
+            ProjectRatingStats.objects.bulk_create(rows, batch_size=batch_size)
+        caching.bump('projects', *(f'project:{project_id}' for project_id in project_ids))
+    return len(rows)
+
+
+def submit_batch(user_id, items):
+    """
+    Create or replace one reviewer's ratings of many projects in a single
+    upsert on (project, user). The aggregates of the touched projects are
+    recomputed once for the whole batch. Returns {project_id: created}.
+    """
+    project_ids = [item['project'] for item in items]
+    rows = [
+        Rating(project_id=item['project'], user_id=user_id, **{criterion: item[criterion] for criterion in Rating.CRITERIA})
+        for item in items
+    ]
+    with transaction.atomic():
+        existing = set(
+            Rating.objects.filter(user_id=user_id, project_id__in=project_ids).values_list('project_id', flat=True)
+        )
+        # The upsert skips the per-row signals, so the derived data is refreshed below
+        Rating.objects.bulk_create(
+            rows, update_conflicts=True, unique_fields=['project', 'user'], update_fields=list(Rating.CRITERIA)
+        )
+        rebuild_stats(project_ids)
+        # Updated rows keep their original time, so every window is refreshed
+        transaction.on_commit(lambda: leaderboard.refresh_projects(project_ids))
+        publish_summaries(project_ids)
+    return {project_id: project_id not in existing for project_id in project_ids}
+
+
+def summarize(stats):
+    """Averages for the API, from a ProjectRatingStats row or None."""
+    if stats is None or not stats.count:
+        return {'count': 0, 'overall': None, **{criterion: None for criterion in Rating.CRITERIA}}
+    summary = {'count': stats.count, 'overall': round(stats.overall(), 2)}
+    for criterion in Rating.CRITERIA:
+        summary[criterion] = round(stats.average(criterion), 2)
+    return summary
+
+
+def publish_summaries(project_ids):
+    """Send the projects' rating summaries to their live listeners (api/events.py)."""
+    def build(project_id):
+        return lambda: summarize(ProjectRatingStats.objects.filter(project_id=project_id).first())
+    for project_id in set(project_ids):
+        events.publish(project_id, 'ratings', build(project_id))
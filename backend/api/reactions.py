@@ -0,0 +1,134 @@
+"""
+Buffered reaction toggles.
+
+A toggle is kept in a write-behind buffer and written with the next batch.
+Each buffered item records the user's new state and the state stored in the
+table before it, so counts() can add the difference to the stored counters
+until the batch is written. A toggle made while an earlier one is being
+flushed is rebased on the state that flush wrote, so the counts are right
+again as soon as it finishes.
+
+The buffer belongs to one process. With several workers, a toggle without
+``active`` flips the state this worker knows, which may lag behind a toggle
+still buffered in another worker for up to WRITE_BEHIND_MAX_AGE, and counts
+differ between workers by their buffered toggles for that long. Clients that
+know the state they want should pass ``active``, which is idempotent. The
+table and the counters are always written from the final states, so workers
+agree once their buffers are flushed.
+"""
+from functools import reduce
+from operator import or_
+
+from django.db import transaction
+from django.db.models import Count, Q
+
+from . import events
+from .buffers import WriteBehindBuffer
+from .models import Project, Reaction, ReactionCount, User
+
+DELETE_CHUNK_SIZE = 200
+
+
+def flush_reactions(items):
+    """Apply a batch of buffered toggles and refresh the counters they touch."""
+    project_ids = {item['project_id'] for item in items}
+    live_projects = set(Project.objects.filter(id__in=project_ids).values_list('id', flat=True))
+    live_users = set(
+        User.objects.filter(id__in={item['user_id'] for item in items}).values_list('id', flat=True)
+    )
+    # Toggles on projects or users deleted since they were buffered are dropped
+    items = [item for item in items if item['project_id'] in live_projects and item['user_id'] in live_users]
+
+    with transaction.atomic():
+        Reaction.objects.bulk_create(
+            [
+                Reaction(project_id=item['project_id'], user_id=item['user_id'], reaction_type=item['reaction_type'])
+                for item in items if item['active']
+            ],
+            ignore_conflicts=True,
+        )
+        removed = [item for item in items if not item['active']]
+        for start in range(0, len(removed), DELETE_CHUNK_SIZE):
+            chunk = removed[start:start + DELETE_CHUNK_SIZE]
+            Reaction.objects.filter(reduce(or_, [
+                Q(project_id=item['project_id'], user_id=item['user_id'], reaction_type=item['reaction_type'])
+                for item in chunk
+            ])).delete()
+        recount(live_projects)
+
+
+def rebase_toggle(item, flushed):
+    return {**item, 'stored': flushed['active']}
+
+
+buffer = WriteBehindBuffer('reactions', flush_reactions, rebase=rebase_toggle)
+
+
+def recount(project_ids):
+    """Rewrite the counters of the given projects from the reaction table."""
+    counts = {
+        (project_id, reaction_type): 0
+        for project_id in project_ids
+        for reaction_type, label in Reaction.REACTION_CHOICES
+    }
+    rows = (
+        Reaction.objects.filter(project_id__in=project_ids)
+        .order_by()
+        .values_list('project_id', 'reaction_type')
+        .annotate(count=Count('id'))
+    )
+    for project_id, reaction_type, count in rows:
+        counts[project_id, reaction_type] = count
+    ReactionCount.objects.bulk_create(
+        [
+            ReactionCount(project_id=project_id, reaction_type=reaction_type, count=count)
+            for (project_id, reaction_type), count in counts.items()
+        ],
+        update_conflicts=True,
+        unique_fields=['project', 'reaction_type'],
+        update_fields=['count'],
+    )
+
+
+def toggle(project_id, user_id, reaction_type, active=None):
+    """
+    Turn a user's reaction on or off and return the new state. Without
+    ``active`` the current state is flipped; with it the call is idempotent.
+    The change is buffered and written with the next batch.
+    """
+    key = (project_id, user_id, reaction_type)
+    pending = buffer.get(key)
+    if pending is not None:
+        current, stored = pending['active'], pending['stored']
+    else:
+        current = stored = Reaction.objects.filter(
+            project_id=project_id, user_id=user_id, reaction_type=reaction_type
+        ).exists()
+    if active is None:
+        active = not current
+    if active != current:
+        buffer.add({
+            'project_id': project_id,
+            'user_id': user_id,
+            'reaction_type': reaction_type,
+            'active': active,
+            # What the table held before buffering, to adjust counts until the flush
+            'stored': stored,
+        }, key=key)
+        publish_counts(project_id)
+    return active
+
+
+def counts(project_id):
+    """Reaction counts for a project, including toggles not yet flushed."""
+    totals = {reaction_type: 0 for reaction_type, label in Reaction.REACTION_CHOICES}
+    totals.update(ReactionCount.objects.filter(project_id=project_id).values_list('reaction_type', 'count'))
+    for item in buffer.pending():
+        if item['project_id'] == project_id:
+            totals[item['reaction_type']] += int(item['active']) - int(item['stored'])
+    return totals
+
+
+def publish_counts(project_id):
+    """Send a project's reaction counts to its live listeners (api/events.py)."""
+    events.publish(project_id, 'reactions', lambda: counts(project_id))
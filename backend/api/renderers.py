@@ -0,0 +1,88 @@
+"""
+A drop-in JSONRenderer that encodes with orjson when it is installed.
+
+The bytes are the same as DRF's compact, non-ASCII-escaping output, including
+the escaped U+2028/U+2029. Anything orjson cannot encode the same way, such as
+indented output, integers wider than 64 bits, non-string keys or floats that
+Python writes in exponent notation, is handed to the stock renderer. The one
+difference left is NaN and infinity: the stock renderer refuses them and
+orjson writes null.
+"""
+from rest_framework.renderers import JSONRenderer
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Floats orjson writes differently from Python: 1e16 vs 1e+16, 1e-7 vs 1e-07 and
+# 0.00001 vs 1e-05. Exponents of at least 16 start with 1, 2 or 3.
+EXPONENT_MARKERS = (b'e-', b'e1', b'e2', b'e3')
+SMALL_FLOAT_MARKER = b'0.0000'
+DIGITS = b'0123456789'
+VALUE_STARTS = b':,['
+# With every nonzero digit and minus sign read as 1, two searches find all candidates
+CANDIDATES = bytes.maketrans(b'23456789-', b'111111111')
+CANDIDATE_MARKERS = (b'1e1', b'0.00001')
+
+
+def starts_value(body, position, allowed=DIGITS + b'.-'):
+    """Whether the ``allowed`` bytes before ``position`` run back to the start of a JSON value."""
+    while position > 0 and body[position - 1] in allowed:
+        position -= 1
+    return position == 0 or body[position - 1] in VALUE_STARTS
+
+
+def find_all(body, marker):
+    position = body.find(marker)
+    while position != -1:
+        yield position
+        position = body.find(marker, position + 1)
+
+
+def has_different_floats(body):
+    # bytes.find() is far cheaper than a regex over the whole body. Outside
+    # numbers the markers only show up in strings now and then (hex digests, mostly)
+    candidates = body.translate(CANDIDATES)
+    if not any(marker in candidates for marker in CANDIDATE_MARKERS):
+        return False
+    for marker in EXPONENT_MARKERS:
+        for position in find_all(body, marker):
+            if position > 0 and body[position - 1] in DIGITS and starts_value(body, position):
+                return True
+    return any(starts_value(body, position, b'-') for position in find_all(body, SMALL_FLOAT_MARKER))
+
+
+class FastJSONRenderer(JSONRenderer):
+    options = 0
+    if orjson is not None:
+        options = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        if orjson is None or self.ensure_ascii or not self.compact:
+            return super().render(data, accepted_media_type, renderer_context)
+        if self.get_indent(accepted_media_type, renderer_context or {}) is not None:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        try:
+            # Types orjson leaves alone go through DRF's own encoder
+            ret = orjson.dumps(data, default=self.encoder_class().default, option=self.options)
+        except (TypeError, ValueError):
+            return super().render(data, accepted_media_type, renderer_context)
+        if has_different_floats(ret):
+            return super().render(data, accepted_media_type, renderer_context)
+        if b'\xe2' in ret:
+            # The lead byte of U+2028 and U+2029 in UTF-8
+            ret = ret.replace('\u2028'.encode(), b'\\u2028').replace('\u2029'.encode(), b'\\u2029')
+        return ret
+
+
+class EventStreamRenderer(FastJSONRenderer):
+    """
+    Lets views answer ``Accept: text/event-stream`` (EventSource). The stream
+    itself is a StreamingHttpResponse; this only renders errors, as JSON.
+    """
+    media_type = 'text/event-stream'
+    format = 'event-stream'
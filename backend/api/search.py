@@ -0,0 +1,165 @@
+import math
+import re
+from collections import Counter
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Case, Count, F, FloatField, IntegerField, Q, Sum, Value, When
+
+from .models import Project, SearchTerm
+
+TOKEN_RE = re.compile(r'\w+')
+STOP_WORDS = {
+    'a', 'an', 'and', 'are', 'as', 'at', 'be', 'by', 'for', 'from', 'in', 'is',
+    'it', 'of', 'on', 'or', 'that', 'the', 'this', 'to', 'with',
+}
+MAX_TERM_LENGTH = 64
+MAX_PREFIX_EXPANSIONS = 50
+# Highest code point, used as the exclusive upper bound of a prefix range scan
+PREFIX_UPPER_BOUND = chr(0x10FFFF)
+
+TITLE_WEIGHT = 3.0
+DESCRIPTION_WEIGHT = 1.0
+# BM25-style term frequency saturation
+K1 = 1.2
+# Number of indexed projects, for the IDF term. Dropped whenever a project is
+# added or removed and recounted by the next search; the timeout only bounds
+# how long a missed change could skew the scores.
+DOCUMENT_COUNT_KEY = 'search:documents'
+DOCUMENT_COUNT_TIMEOUT = 60 * 60
+
+
+def tokenize(text):
+    """Split text into lowercase index terms, dropping stop words."""
+    return [
+        token[:MAX_TERM_LENGTH]
+        for token in TOKEN_RE.findall((text or '').lower())
+        if token not in STOP_WORDS
+    ]
+
+
+def term_weights(title, description):
+    """Return {term: weight} for a project, favouring matches in the title."""
+    frequencies = Counter()
+    for term in tokenize(title):
+        frequencies[term] += TITLE_WEIGHT
+    for term in tokenize(description):
+        frequencies[term] += DESCRIPTION_WEIGHT
+    return {term: tf * (K1 + 1) / (tf + K1) for term, tf in frequencies.items()}
+
+
+def build_terms(project, term_model=SearchTerm):
+    return [
+        term_model(term=term, project_id=project.pk, category=project.category, weight=weight)
+        for term, weight in term_weights(project.title, project.description).items()
+    ]
+
+
+def document_count():
+    return cache.get_or_set(DOCUMENT_COUNT_KEY, Project.objects.count, DOCUMENT_COUNT_TIMEOUT)
+
+
+def forget_document_count():
+    # Again after the commit, or a search in between would cache the old count
+    cache.delete(DOCUMENT_COUNT_KEY)
+    transaction.on_commit(lambda: cache.delete(DOCUMENT_COUNT_KEY))
+
+
+def index_project(project, created=False):
+    """Replace the postings of a single project."""
+    with transaction.atomic():
+        SearchTerm.objects.filter(project_id=project.pk).delete()
+        SearchTerm.objects.bulk_create(build_terms(project))
+    if created:
+        forget_document_count()
+
+
+def rebuild_index(project_model=Project, term_model=SearchTerm, batch_size=1000):
+    """Rebuild the whole index from the project table. Returns the number of projects indexed."""
+    indexed = 0
+    with transaction.atomic():
+        term_model.objects.all().delete()
+        projects = project_model.objects.only('id', 'title', 'description', 'category').order_by('id')
+        pending = []
+        for project in projects.iterator(chunk_size=batch_size):
+            pending.extend(build_terms(project, term_model))
+            indexed += 1
+            if len(pending) >= batch_size:
+                term_model.objects.bulk_create(pending)
+                pending = []
+        term_model.objects.bulk_create(pending)
+    forget_document_count()
+    return indexed
+
+
+def parse_query(query):
+    """
+    Split a query into exact terms and an optional trailing prefix.
+
+    The last word is matched as a prefix unless the query ends in whitespace,
+    so results update sensibly while the user is still typing it.
+    """
+    terms = tokenize(query)
+    if not terms:
+        return [], None
+    if query[-1:].isspace():
+        return terms, None
+    return terms[:-1], terms[-1]
+
+
+def search(query, categories=None, offset=0, limit=20):
+    """
+    Return a list of (project_id, score) for the projects matching every query
+    term, best first. Only the postings of the query terms are read, so the cost
+    depends on how common the terms are rather than on the size of the catalog.
+    """
+    exact, prefix = parse_query(query)
+    groups = [[term] for term in dict.fromkeys(exact)]
+
+    postings = SearchTerm.objects.all()
+    if categories:
+        postings = postings.filter(category__in=categories)
+
+    # Document frequencies of the query terms, including prefix expansions
+    term_filter = Q(term__in=exact)
+    if prefix:
+        term_filter |= Q(term__gte=prefix, term__lt=prefix + PREFIX_UPPER_BOUND)
+    frequencies = dict(
+        postings.filter(term_filter).values('term').annotate(df=Count('id')).values_list('term', 'df')
+    )
+    if prefix:
+        expansions = sorted(
+            (term for term in frequencies if term.startswith(prefix)),
+            key=lambda term: (term != prefix, -frequencies[term]),
+        )[:MAX_PREFIX_EXPANSIONS]
+        groups.append(expansions)
+
+    if not groups or any(not any(term in frequencies for term in group) for group in groups):
+        return []
+
+    total = document_count() or 1
+    matched_terms = [term for group in groups for term in group if term in frequencies]
+    idf = {
+        term: math.log(1 + (total - frequencies[term] + 0.5) / (frequencies[term] + 0.5))
+        for term in matched_terms
+    }
+    group_of = Case(
+        *[When(term__in=group, then=Value(index)) for index, group in enumerate(groups)],
+        output_field=IntegerField(),
+    )
+    score = Sum(
+        Case(
+            *[When(term=term, then=F('weight') * Value(weight)) for term, weight in idf.items()],
+            default=Value(0.0),
+            output_field=FloatField(),
+        )
+    )
+    ranked = (
+        postings.filter(term__in=matched_terms)
+        .values('project_id')
+        .annotate(matched=Count(group_of, distinct=True), score=score)
+        .filter(matched=len(groups))
+        .order_by('-score', '-project_id')
+        .values_list('project_id', 'score')
+    )
+    return list(ranked[offset:offset + limit])
@@ -0,0 +1,88 @@
+from collections import Counter, defaultdict
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import F, Sum
+from django.utils import timezone
+
+from .buffers import WriteBehindBuffer
+from .models import SearchLog, SearchQueryStat, User
+
+
+def normalize(query):
+    return ' '.join(query.lower().split())[:255]
+
+
+def flush_search_logs(items):
+    """Write a batch of searches and add them to the daily per-query rollups."""
+    live_users = set(
+        User.objects.filter(id__in={item['user_id'] for item in items if item['user_id']}).values_list('id', flat=True)
+    )
+    searches = Counter()
+    zero_results = Counter()
+    for item in items:
+        key = (timezone.localdate(item['created_at']), item['query'])
+        searches[key] += 1
+        zero_results[key] += int(item['result_count'] == 0)
+
+    with transaction.atomic():
+        SearchLog.objects.bulk_create([
+            SearchLog(
+                user_id=item['user_id'] if item['user_id'] in live_users else None,
+                query=item['query'],
+                result_count=item['result_count'],
+                created_at=item['created_at'],
+            )
+            for item in items
+        ])
+        # Increments rather than absolute values, so flushes from several
+        # workers add up instead of overwriting each other
+        SearchQueryStat.objects.bulk_create(
+            [SearchQueryStat(day=day, query=query) for day, query in searches],
+            ignore_conflicts=True,
+        )
+        by_change = defaultdict(list)
+        for day, query in searches:
+            by_change[day, searches[day, query], zero_results[day, query]].append(query)
+        for (day, count, zero_count), queries in by_change.items():
+            SearchQueryStat.objects.filter(day=day, query__in=queries).update(
+                searches=F('searches') + count, zero_results=F('zero_results') + zero_count
+            )
+
+
+buffer = WriteBehindBuffer('search logs', flush_search_logs)
+
+
+def record(user_id, query, result_count):
+    """Queue a search for logging; nothing is written on the request path."""
+    query = normalize(query)
+    if query:
+        buffer.add({
+            'user_id': user_id,
+            'query': query,
+            'result_count': result_count,
+            'created_at': timezone.now(),
+        })
+
+
+def analytics(days=7, limit=10):
+    """Top and zero-result queries over the last ``days`` days, from the rollups."""
+    since = timezone.localdate() - timedelta(days=days - 1)
+    stats = (
+        SearchQueryStat.objects.filter(day__gte=since)
+        .values('query')
+        .annotate(total_searches=Sum('searches'), total_zero_results=Sum('zero_results'))
+    )
+    top_queries = stats.order_by('-total_searches', 'query')[:limit]
+    zero_result_queries = stats.filter(total_zero_results__gt=0).order_by('-total_zero_results', 'query')[:limit]
+    return {
+        'since': since,
+        'top_queries': [
+            {'query': row['query'], 'searches': row['total_searches'], 'zero_results': row['total_zero_results']}
+            for row in top_queries
+        ],
+        'zero_result_queries': [
+            {'query': row['query'], 'searches': row['total_searches'], 'zero_results': row['total_zero_results']}
+            for row in zero_result_queries
+        ],
+    }
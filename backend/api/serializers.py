@@ -1,5 +1,11 @@
+from django.core.exceptions import ObjectDoesNotExist
+from django.db.models import Prefetch
 from rest_framework import serializers
 from .models import *
+from .fast_serializers import CompiledListSerializer
+from .fieldsets import select
+from .images import urls as image_urls
+from .ratings import summarize
 
 class UserSerializer(serializers.ModelSerializer):
     
@@ -11,12 +17,50 @@ class FeedbackSerializer(serializers.ModelSerializer):
     
     class Meta:
         model = Feedback
-        fields = '__all__'
+        # Only moderators hide comments, through the report queue
+        exclude = ['is_hidden']
+        list_serializer_class = CompiledListSerializer
+
+class FeedbackThreadSerializer(serializers.ModelSerializer):
+    # Author details come from a join, so clients need no request per commenter
+    username = serializers.CharField(source='user.username', read_only=True)
+    profile_picture = serializers.ImageField(source='user.profile_picture', read_only=True)
+    avatar = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Feedback
+        fields = ['id', 'project', 'user', 'username', 'profile_picture', 'avatar', 'comment', 'created_at']
+        list_serializer_class = CompiledListSerializer
+
+    def get_avatar(self, obj):
+        return image_urls(obj.user.avatar, self.context.get('request'))
 
 class RatingSerializer(serializers.ModelSerializer):
     class Meta:
         model = Rating
-        fields = ['creativity', 'technical_skills', 'impact', 'presentation', 'user']
+        fields = ['project', 'creativity', 'technical_skills', 'impact', 'presentation', 'user']
+
+class RatingScoresSerializer(serializers.Serializer):
+    project = serializers.IntegerField(min_value=1)
+    creativity = serializers.IntegerField(min_value=1, max_value=5)
+    technical_skills = serializers.IntegerField(min_value=1, max_value=5)
+    impact = serializers.IntegerField(min_value=1, max_value=5)
+    presentation = serializers.IntegerField(min_value=1, max_value=5)
+
+class RatingBatchSerializer(serializers.Serializer):
+    MAX_RATINGS = 200
+
+    ratings = RatingScoresSerializer(many=True, allow_empty=False, max_length=MAX_RATINGS)
+
+    def validate_ratings(self, value):
+        project_ids = [item['project'] for item in value]
+        if len(set(project_ids)) != len(project_ids):
+            raise serializers.ValidationError('Each project can only be rated once per batch.')
+        # One query for the whole batch instead of a lookup per item
+        missing = set(project_ids) - set(Project.objects.filter(id__in=project_ids).values_list('id', flat=True))
+        if missing:
+            raise serializers.ValidationError(f'Unknown projects: {sorted(missing)}')
+        return value
 
 class ReactionSerializer(serializers.ModelSerializer):
     
@@ -24,6 +68,11 @@ class ReactionSerializer(serializers.ModelSerializer):
         model = Reaction
         fields = '__all__'
 
+class ReactionToggleSerializer(serializers.Serializer):
+    project = serializers.PrimaryKeyRelatedField(queryset=Project.objects.all())
+    reaction_type = serializers.ChoiceField(choices=Reaction.REACTION_CHOICES)
+    active = serializers.BooleanField(required=False, allow_null=True, default=None)
+
 class CollaborationSerializer(serializers.ModelSerializer):
     
     class Meta:
@@ -36,6 +85,9 @@ class NotificationSerializer(serializers.ModelSerializer):
         model = Notification
         fields = '__all__'
 
+class NotificationMarkReadSerializer(serializers.Serializer):
+    ids = serializers.ListField(child=serializers.IntegerField(), required=False, max_length=1000)
+
 class SearchLogSerializer(serializers.ModelSerializer):
     
     class Meta:
@@ -48,15 +100,114 @@ class ReportSerializer(serializers.ModelSerializer):
         model = Report
         fields = '__all__'
 
+class ModerationReportSerializer(serializers.ModelSerializer):
+    # Joined in by moderation.queue(), so a page is one query
+    reporter = serializers.CharField(source='reported_by.username', read_only=True)
+    project_title = serializers.CharField(source='project.title', read_only=True)
+    comment = serializers.CharField(source='feedback.comment', read_only=True, default=None)
+    comment_hidden = serializers.BooleanField(source='feedback.is_hidden', read_only=True, default=None)
+
+    class Meta:
+        model = Report
+        fields = [
+            'id', 'reported_by', 'reporter', 'project', 'project_title', 'feedback', 'comment', 'comment_hidden',
+            'reason', 'status', 'created_at',
+        ]
+
+class ReportTransitionSerializer(serializers.Serializer):
+    MAX_IDS = 1000
+
+    action = serializers.ChoiceField(choices=['resolve', 'dismiss'])
+    ids = serializers.ListField(child=serializers.IntegerField(min_value=1), allow_empty=False, max_length=MAX_IDS, required=False)
+    project = serializers.IntegerField(min_value=1, required=False)
+    feedback = serializers.IntegerField(min_value=1, required=False)
+    hide_feedback = serializers.BooleanField(default=False)
+
+    def validate(self, data):
+        selectors = [name for name in ('ids', 'project', 'feedback') if name in data]
+        if len(selectors) != 1:
+            raise serializers.ValidationError('Give exactly one of ids, project or feedback.')
+        if data['hide_feedback'] and data['action'] != 'resolve':
+            raise serializers.ValidationError({'hide_feedback': 'Only resolving a report can hide its comment.'})
+        return data
+
+class ImageAssetSerializer(serializers.ModelSerializer):
+    urls = serializers.SerializerMethodField()
+
+    class Meta:
+        model = ImageAsset
+        fields = ['id', 'digest', 'status', 'width', 'height', 'urls']
+
+    def get_urls(self, obj):
+        return image_urls(obj, self.context.get('request'))
+
+class ImageUploadSerializer(serializers.Serializer):
+    # Decoded and validated by api.images.store
+    image = serializers.FileField()
+
+class UploadSessionSerializer(serializers.ModelSerializer):
+    sha256 = serializers.RegexField(r'^[0-9a-fA-F]{64}$', required=False, allow_blank=True)
+    file = serializers.FileField(source='stored_file.file', read_only=True)
+
+    class Meta:
+        model = UploadSession
+        fields = ['id', 'project', 'filename', 'content_type', 'size', 'sha256', 'offset', 'status', 'file', 'created_at']
+        read_only_fields = ['offset', 'status']
+        extra_kwargs = {'size': {'min_value': 0}}
+
+    def validate_project(self, project):
+        if project.user_id != self.context['request'].user.id:
+            raise serializers.ValidationError('You can only upload files to your own projects.')
+        return project
+
 class ProjectSerializer(serializers.ModelSerializer):
     username = serializers.CharField(source='user.username', read_only=True)
     feedbacks = FeedbackSerializer(many=True, read_only=True, source='feedback_set')
+    ratings_summary = serializers.SerializerMethodField()
+    thumbnail_urls = serializers.SerializerMethodField()
+
+    # Left out unless asked for with ?expand=; see api/fieldsets.py
+    expandable_fields = ['feedbacks', 'ratings_summary']
+    field_sources = {
+        'username': ['user__username'],
+        'thumbnail_urls': [
+            'thumbnail_image__original', 'thumbnail_image__width', 'thumbnail_image__height',
+            'thumbnail_image__status', 'thumbnail_image__variants',
+        ],
+        'feedbacks': [],
+        'ratings_summary': ['rating_stats__count', *(f'rating_stats__{criterion}_sum' for criterion in Rating.CRITERIA)],
+    }
+    prefetch_fields = {'feedbacks': Prefetch('feedback_set', queryset=Feedback.objects.filter(is_hidden=False))}
 
     class Meta:
         model = Project
-        fields = ['id', 'title', 'description', 'thumbnail', 'category', 'video_url', 'user', 'username', 'feedbacks']
+        fields = [
+            'id', 'title', 'description', 'thumbnail', 'thumbnail_image', 'thumbnail_urls', 'category',
+            'video_url', 'user', 'username', 'feedbacks', 'ratings_summary',
+        ]
+        list_serializer_class = CompiledListSerializer
+
+    def __init__(self, *args, fields=None, **kwargs):
+        # ``fields`` is the selection from fieldsets.from_request(); all the
+        # non-expandable fields by default
+        super().__init__(*args, **kwargs)
+        selected = set(fields if fields is not None else select(type(self)))
+        for name in [name for name in self.fields if name not in selected]:
+            self.fields.pop(name)
+
+    def get_thumbnail_urls(self, obj):
+        return image_urls(obj.thumbnail_image, self.context.get('request'))
+
+    def get_ratings_summary(self, obj):
+        # Served from the denormalized aggregates, select_related by the views
+        try:
+            stats = obj.rating_stats
+        except ObjectDoesNotExist:
+            stats = None
+        return summarize(stats)
 
 from rest_framework import serializers
+from .images import set_avatar
 from .models import User
 
 class UserRegistrationSerializer(serializers.ModelSerializer):
@@ -83,4 +234,7 @@ class UserRegistrationSerializer(serializers.ModelSerializer):
             profile_picture=validated_data.get('profile_picture'),
             institution=validated_data.get('institution')
         )
+        if user.profile_picture:
+            # Also store it content-addressed so resized variants get generated
+            set_avatar(user, validated_data['profile_picture'])
         return user
\ No newline at end of file
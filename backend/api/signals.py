@@ -0,0 +1,190 @@
+from django.conf import settings
+from django.core.signals import request_finished, request_started
+from django.db import transaction
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from . import authentication, buffers, caching, events, facets, leaderboard, notifications, ratings, search
+from .models import Feedback, Notification, Project, Rating, User
+from .serializers import FeedbackThreadSerializer
+from config import routers
+
+
+@receiver(pre_save, sender=Project)
+def copy_author_institution(sender, instance, raw=False, **kwargs):
+    # Later changes reach the project through copy_user_institution below
+    if instance._state.adding and not raw:
+        instance.institution = instance.user.institution
+
+
+@receiver(pre_save, sender=Project)
+def remember_facet_cells(sender, instance, raw=False, **kwargs):
+    if not instance._state.adding and not raw:
+        instance._facet_cells = facets.project_cells(Project.objects.filter(pk=instance.pk))
+
+
+@receiver(post_save, sender=Project)
+def count_project_facets(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    cells = facets.project_cells(Project.objects.filter(pk=instance.pk))
+    cells.subtract(getattr(instance, '_facet_cells', {}))
+    facets.adjust(cells)
+
+
+@receiver(pre_delete, sender=Project)
+def uncount_project_facets(sender, instance, **kwargs):
+    # The cascade deletes the rating aggregates before the ratings, so the
+    # rating signals find the project unrated and leave the counts alone
+    cells = facets.project_cells(Project.objects.filter(pk=instance.pk))
+    facets.adjust({key: -count for key, count in cells.items()})
+
+
+@receiver(post_save, sender=Project)
+def index_project(sender, instance, created=False, raw=False, **kwargs):
+    if not raw:
+        search.index_project(instance, created)
+
+
+@receiver(post_delete, sender=Project)
+def unindex_project(sender, instance, **kwargs):
+    # Postings are removed with the project through the cascade
+    search.forget_document_count()
+
+
+@receiver(post_save, sender=Project)
+@receiver(post_delete, sender=Project)
+def bump_project_versions(sender, instance, raw=False, **kwargs):
+    if not raw:
+        caching.bump('projects', f'project:{instance.pk}')
+
+
+@receiver(post_save, sender=Feedback)
+@receiver(post_delete, sender=Feedback)
+def bump_feedback_versions(sender, instance, raw=False, **kwargs):
+    if not raw:
+        caching.bump('feedbacks', f'feedback:{instance.pk}', 'projects', f'project:{instance.project_id}')
+
+
+@receiver(post_save, sender=Feedback)
+def publish_feedback(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    if instance.is_hidden:
+        data = {'id': instance.pk}
+        events.publish(instance.project_id, 'feedback_deleted', lambda: data)
+    else:
+        events.publish(instance.project_id, 'feedback', lambda: FeedbackThreadSerializer(instance).data)
+
+
+@receiver(post_delete, sender=Feedback)
+def publish_feedback_deleted(sender, instance, **kwargs):
+    # The instance's pk is cleared once the delete finishes
+    data = {'id': instance.pk}
+    events.publish(instance.project_id, 'feedback_deleted', lambda: data)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def bump_user_versions(sender, instance, raw=False, **kwargs):
+    # Project payloads embed the author's username, and the user: stamp
+    # invalidates the principal cached by CachedJWTAuthentication
+    if not raw:
+        caching.bump('users', authentication.resource(instance.pk))
+
+
+@receiver(post_save, sender=User)
+def copy_user_institution(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    if created or raw or (update_fields is not None and 'institution' not in update_fields):
+        return
+    if facets.copy_institution(instance.pk, instance.institution):
+        caching.bump('projects')
+
+
+@receiver(post_save, sender=Project)
+@receiver(post_delete, sender=Project)
+def drop_stale_leaderboards(sender, instance, created=False, raw=False, **kwargs):
+    if not created and not raw:
+        transaction.on_commit(lambda: leaderboard.forget_project(instance.pk))
+
+
+@receiver(post_save, sender=Rating)
+def add_rating_to_stats(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    project_ids = {instance.project_id}
+    if created:
+        ratings.apply_scores(instance.get_scores(), 1)
+    elif hasattr(instance, '_loaded_scores'):
+        ratings.apply_scores(instance._loaded_scores, -1)
+        ratings.apply_scores(instance.get_scores(), 1)
+        project_ids.add(instance._loaded_scores['project_id'])
+    else:
+        # Saved over an existing row without loading it first
+        ratings.rebuild_stats([instance.project_id])
+    instance._loaded_scores = instance.get_scores()
+    refresh_leaderboards(project_ids, instance.created_at)
+    caching.bump('projects', *(f'project:{project_id}' for project_id in project_ids))
+    ratings.publish_summaries(project_ids)
+
+
+@receiver(pre_delete, sender=Rating)
+def load_rating_scores(sender, instance, **kwargs):
+    # Loaded with deferred scores; read them while the row is still there
+    if not hasattr(instance, '_loaded_scores'):
+        instance._loaded_scores = instance.get_scores()
+
+
+@receiver(post_delete, sender=Rating)
+def remove_rating_from_stats(sender, instance, **kwargs):
+    scores = getattr(instance, '_loaded_scores', instance.get_scores())
+    ratings.apply_scores(scores, -1)
+    refresh_leaderboards({scores['project_id']}, instance.created_at)
+    caching.bump('projects', f"project:{scores['project_id']}")
+    ratings.publish_summaries([scores['project_id']])
+
+
+def refresh_leaderboards(project_ids, rated_at):
+    transaction.on_commit(lambda: leaderboard.refresh_projects(project_ids, rated_at))
+
+
+@receiver(post_save, sender=Notification)
+def count_unread_on_save(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if created or hasattr(instance, '_loaded_is_read'):
+        was_unread = not created and not instance._loaded_is_read
+        notifications.adjust_unread({instance.user_id: int(not instance.is_read) - int(was_unread)})
+    else:
+        # Saved over an existing row without loading it first
+        notifications.rebuild_unread_counts([instance.user_id])
+    instance._loaded_is_read = instance.is_read
+
+
+@receiver(post_delete, sender=Notification)
+def count_unread_on_delete(sender, instance, **kwargs):
+    if not getattr(instance, '_loaded_is_read', instance.is_read):
+        notifications.adjust_unread({instance.user_id: -1})
+
+
+@receiver(request_finished)
+def flush_write_behind_buffers(sender, **kwargs):
+    buffers.flush_due()
+
+
+@receiver(request_started)
+def reset_read_routing(sender, **kwargs):
+    routers.unpin()
+
+
+@receiver(connection_created)
+def apply_sqlite_pragmas(sender, connection, **kwargs):
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        for pragma, value in getattr(settings, 'SQLITE_PRAGMAS', {}).items():
+            if pragma == 'journal_mode' and 'mode=ro' in str(connection.settings_dict['NAME']):
+                # Read-only connections cannot change the journal mode
+                continue
+            cursor.execute(f'PRAGMA {pragma} = {value}')
@@ -1,12 +1,41 @@
-from django.test import TestCase
+import base64
+import hashlib
+import json
+import os
+import shutil
+import socket
+import tempfile
+from datetime import timedelta
+from decimal import Decimal
+from io import BytesIO, StringIO
+from unittest import mock
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import IntegrityError, connection
+from django.db.models import Count, Sum
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
 from rest_framework.test import APIClient
 from rest_framework import status
 from .models import *
+from .renderers import FastJSONRenderer
+from .serializers import FeedbackSerializer, FeedbackThreadSerializer, ProjectSerializer
+from PIL import Image
+from . import authentication, benchmarks, checks, events, facets, fast_serializers, images, jobs, leaderboard, metrics, notifications, ratings, reactions, search, search_logs, uploads, views
+from config import routers
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
 from rest_framework.test import APIRequestFactory
+from rest_framework_simplejwt.tokens import AccessToken
 from rest_framework_simplejwt.views import TokenObtainPairView
 
 class BaseTestCase(TestCase):
     def setUp(self):
+        cache.clear()
         self.user = User.objects.create_user(
             username='testuser',
             email='testuser@example.com',
@@ -313,10 +342,58 @@ class ProjectSearchTestCase(BaseTestCase):
         print("Testing search project...")
         response = self.client.get('/api/projects/search/?q=Hackathon')
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data), 1)
-        self.assertEqual(response.data[0]['title'], 'Hackathon Project')
+        self.assertEqual(len(response.data['results']), 1)
+        self.assertEqual(response.data['results'][0]['title'], 'Hackathon Project')
         print("Search project test passed!")
 
+    def test_search_ranks_title_matches_first(self):
+        response = self.client.get('/api/projects/search/?q=project%20artificial')
+        self.assertEqual([p['title'] for p in response.data['results']], ['AI Research'])
+
+        response = self.client.get('/api/projects/search/?q=proj')
+        self.assertEqual(len(response.data['results']), 3)
+        self.assertEqual(response.data['results'][0]['title'], 'Hackathon Project')
+
+    def test_search_category_filter_and_pagination(self):
+        response = self.client.get('/api/projects/search/?q=project&category=Research,Development')
+        self.assertEqual({p['title'] for p in response.data['results']}, {'AI Research', 'Web Development'})
+
+        response = self.client.get('/api/projects/search/?q=project&page_size=2')
+        self.assertEqual(len(response.data['results']), 2)
+        response = self.client.get(response.data['next'])
+        self.assertEqual(len(response.data['results']), 1)
+        self.assertIsNone(response.data['next'])
+
+    def test_search_index_follows_saves_and_deletes(self):
+        self.project2.title = 'Quantum Computing'
+        self.project2.save()
+        response = self.client.get('/api/projects/search/?q=quantum ')
+        self.assertEqual([p['id'] for p in response.data['results']], [self.project2.id])
+
+        self.project2.delete()
+        response = self.client.get('/api/projects/search/?q=quantum ')
+        self.assertEqual(response.data['results'], [])
+        self.assertFalse(SearchTerm.objects.filter(term='quantum').exists())
+
+    def test_document_count_is_cached_between_changes(self):
+        def counts_projects(queries):
+            return any(query['sql'].startswith('SELECT COUNT(*)') and '"api_project"' in query['sql'] for query in queries)
+
+        search.search('project')
+        with CaptureQueriesContext(connection) as queries:
+            search.search('project')
+        self.assertFalse(counts_projects(queries))
+        self.assertEqual(search.document_count(), 3)
+
+        self.project3.delete()
+        self.assertEqual(search.document_count(), 2)
+        Project.objects.create(user=self.user, title='Robotics', description='', category='Research')
+        self.assertEqual(search.document_count(), 3)
+        self.project1.save()
+        with CaptureQueriesContext(connection) as queries:
+            search.search('project')
+        self.assertFalse(counts_projects(queries))
+
 class UploadProjectTestCase(BaseTestCase):
     def setUp(self):
         # Create a test user
@@ -440,4 +517,1926 @@ class UserSignUpTestCase(TestCase):
         }
         response = self.client.post('/api/auth/signup/', data)
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
-        self.assertIn("Passwords do not match.", str(response.data))
\ No newline at end of file
+        self.assertIn("Passwords do not match.", str(response.data))
+
+
+class ProjectListPaginationTestCase(BaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.other_user = User.objects.create_user(
+            username='otheruser',
+            email='otheruser@example.com',
+            password='password123',
+            role='Reviewer'
+        )
+        for i in range(12):
+            project = Project.objects.create(
+                user=self.user if i % 2 else self.other_user,
+                title=f'Project {i}',
+                description='Paginated project',
+                category='Hackathon'
+            )
+            Feedback.objects.create(project=project, user=self.other_user, comment=f'Feedback {i}')
+            Feedback.objects.create(project=project, user=self.user, comment=f'More feedback {i}')
+        self.client = APIClient()
+
+    def test_pages_cover_every_project_once(self):
+        seen = []
+        url = '/api/projects/?page_size=5'
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            seen.extend(project['id'] for project in response.data['results'])
+            url = response.data['next']
+        expected = list(Project.objects.order_by('-created_at', '-id').values_list('id', flat=True))
+        self.assertEqual(seen, expected)
+
+    def test_list_query_count_is_constant(self):
+        # One query for the page (author joined) and one to prefetch feedback
+        for page_size in (1, 5, 12, 50):
+            with self.assertNumQueries(2):
+                response = self.client.get(f'/api/projects/?page_size={page_size}&expand=feedbacks')
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(len(response.data['results']), min(page_size, 12))
+            self.assertEqual(len(response.data['results'][0]['feedbacks']), 2)
+
+    def test_invalid_cursor(self):
+        response = self.client.get('/api/projects/?cursor=not-a-cursor')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class RatingStatsTestCase(BaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.project = Project.objects.create(
+            user=self.user,
+            title='Rated Project',
+            description='A project with ratings',
+            category='Research'
+        )
+        self.reviewer = User.objects.create_user(
+            username='reviewer',
+            email='reviewer@example.com',
+            password='password123',
+            role='Reviewer'
+        )
+
+    def rate(self, user, creativity, technical_skills, impact, presentation):
+        return Rating.objects.create(
+            project=self.project,
+            user=user,
+            creativity=creativity,
+            technical_skills=technical_skills,
+            impact=impact,
+            presentation=presentation
+        )
+
+    def assertStatsMatchRatings(self):
+        stats = ProjectRatingStats.objects.get(project=self.project)
+        ratings = list(Rating.objects.filter(project=self.project))
+        self.assertEqual(stats.count, len(ratings))
+        for criterion in Rating.CRITERIA:
+            values = [getattr(rating, criterion) for rating in ratings]
+            self.assertEqual(getattr(stats, f'{criterion}_sum'), sum(values))
+            self.assertEqual(getattr(stats, f'{criterion}_sumsq'), sum(v * v for v in values))
+        return stats
+
+    def test_stats_follow_create_update_and_delete(self):
+        first = self.rate(self.user, 5, 4, 3, 2)
+        second = self.rate(self.reviewer, 1, 2, 3, 4)
+        stats = self.assertStatsMatchRatings()
+        self.assertEqual(stats.average('creativity'), 3)
+        self.assertEqual(stats.variance('creativity'), 4)
+
+        second = Rating.objects.get(pk=second.pk)
+        second.creativity = 5
+        second.save()
+        self.assertStatsMatchRatings()
+
+        first.delete()
+        stats = self.assertStatsMatchRatings()
+        self.assertEqual(stats.count, 1)
+        self.assertEqual(stats.overall(), 3.5)
+
+    def test_stats_follow_ratings_loaded_with_deferred_scores(self):
+        first = self.rate(self.user, 5, 4, 3, 2)
+        second = self.rate(self.reviewer, 1, 2, 3, 4)
+
+        loaded = Rating.objects.only('id').get(pk=second.pk)
+        self.assertFalse(hasattr(loaded, '_loaded_scores'))
+        self.assertEqual(loaded.creativity, 1)
+        loaded.creativity = 5
+        loaded.save()
+        self.assertStatsMatchRatings()
+
+        Rating.objects.defer('impact').get(pk=first.pk).delete()
+        stats = self.assertStatsMatchRatings()
+        self.assertEqual(stats.count, 1)
+
+    def test_rebuild_stats(self):
+        self.rate(self.user, 5, 4, 3, 2)
+        self.rate(self.reviewer, 3, 3, 3, 3)
+        ProjectRatingStats.objects.all().delete()
+        call_command('rebuild_rating_stats', stdout=StringIO())
+        self.assertStatsMatchRatings()
+
+    def test_project_detail_includes_averages(self):
+        self.rate(self.user, 5, 4, 3, 2)
+        self.rate(self.reviewer, 3, 4, 5, 2)
+        response = APIClient().get(f'/api/projects/{self.project.id}/?expand=ratings_summary')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['ratings_summary'], {
+            'count': 2,
+            'overall': 3.5,
+            'creativity': 4.0,
+            'technical_skills': 4.0,
+            'impact': 4.0,
+            'presentation': 2.0,
+        })
+
+
+class LeaderboardTestCase(BaseTestCase):
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.client = APIClient()
+        self.reviewers = [
+            User.objects.create_user(
+                username=f'judge{i}',
+                email=f'judge{i}@example.com',
+                password='password123',
+                role='Reviewer'
+            )
+            for i in range(3)
+        ]
+        self.projects = [
+            Project.objects.create(
+                user=self.user,
+                title=f'Project {i}',
+                description='Ranked project',
+                category='Hackathon' if i % 2 else 'Research'
+            )
+            for i in range(8)
+        ]
+        for i, project in enumerate(self.projects):
+            self.rate(project, self.reviewers[0], 1 + i % 5, 1 + (i * 2) % 5)
+
+    def rate(self, project, user, score, creativity=None):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Rating.objects.create(
+                project=project,
+                user=user,
+                creativity=creativity or score,
+                technical_skills=score,
+                impact=score,
+                presentation=score
+            )
+
+    def fresh_ranking(self, query):
+        cache.clear()
+        return self.client.get(f'/api/leaderboard/{query}').data['results']
+
+    def test_leaderboard_is_served_from_cache(self):
+        response = self.client.get('/api/leaderboard/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        scores = [entry['score'] for entry in response.data['results']]
+        self.assertEqual(scores, sorted(scores, reverse=True))
+        self.assertEqual(response.data['results'][0]['rank'], 1)
+        with self.assertNumQueries(0):
+            self.client.get('/api/leaderboard/')
+
+    def test_ratings_update_cached_boards_incrementally(self):
+        queries = ['?', '?metric=creativity', '?category=Research', '?window=week']
+        for query in queries:
+            self.client.get(f'/api/leaderboard/{query}')
+
+        self.rate(self.projects[0], self.reviewers[1], 5)
+        self.rate(self.projects[4], self.reviewers[1], 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            Rating.objects.filter(project=self.projects[3]).first().delete()
+
+        for query in queries:
+            with self.assertNumQueries(0):
+                cached = self.client.get(f'/api/leaderboard/{query}').data['results']
+            self.assertEqual(cached, self.fresh_ranking(query))
+            for other in queries:
+                self.client.get(f'/api/leaderboard/{other}')
+
+    def test_small_boards_stay_correct_as_scores_drop(self):
+        with mock.patch.object(leaderboard, 'BOARD_SIZE', 2), mock.patch.object(leaderboard, 'CANDIDATES', 4):
+            self.client.get('/api/leaderboard/')
+            for reviewer in self.reviewers[1:]:
+                for project in self.projects:
+                    self.rate(project, reviewer, 1 + (project.id * 7 + reviewer.id) % 5)
+                    cached = self.client.get('/api/leaderboard/').data['results']
+                    self.assertEqual(cached, self.fresh_ranking('?'))
+                    self.client.get('/api/leaderboard/')
+
+    def test_event_window_and_validation(self):
+        today = timezone.now().date().isoformat()
+        with override_settings(LEADERBOARD_EVENTS={'showcase': (today, today), 'old': ('2020-01-01', '2020-01-02')}):
+            response = self.client.get('/api/leaderboard/?window=event&event=showcase&limit=3')
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual((response.data['event'], len(response.data['results'])), ('showcase', 3))
+
+            self.rate(self.projects[1], self.reviewers[1], 5)
+            with self.assertNumQueries(0):
+                cached = self.client.get('/api/leaderboard/?window=event&event=showcase').data['results']
+            self.assertEqual(cached, self.fresh_ranking('?window=event&event=showcase'))
+
+            response = self.client.get('/api/leaderboard/?window=event&event=old')
+            self.assertEqual(response.data['results'], [])
+            self.assertEqual(
+                self.client.get('/api/leaderboard/?window=event&event=nope').status_code, status.HTTP_400_BAD_REQUEST
+            )
+
+        self.assertEqual(self.client.get('/api/leaderboard/?window=event').status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.client.get('/api/leaderboard/?metric=nope').status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.client.get('/api/leaderboard/?category=nope').status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_custom_windows_are_admin_only_and_uncached(self):
+        today = timezone.now().date().isoformat()
+        url = f'/api/leaderboard/?window=event&start={today}&end={today}&limit=3'
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_403_FORBIDDEN)
+
+        self.client.force_authenticate(user=User.objects.create_user(
+            username='admin', email='admin@example.com', password='password123', role='Admin'
+        ))
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['results']), 3)
+        self.assertFalse(cache.get(leaderboard.board_key(leaderboard.board_params('overall', 'event', start=today, end=today))))
+
+    def test_every_board_expires(self):
+        self.client.get('/api/leaderboard/')
+        self.client.get('/api/leaderboard/?window=week')
+        with mock.patch.object(leaderboard.clock, 'time', return_value=leaderboard.clock.time() + leaderboard.BOARD_TTL + 1):
+            self.assertEqual(cache.get_many(leaderboard.cached_board_keys()), {})
+
+
+class ReactionToggleTestCase(BaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.project = Project.objects.create(
+            user=self.user,
+            title='Demo Project',
+            description='A project on stage',
+            category='Hackathon'
+        )
+        self.fan = User.objects.create_user(
+            username='fan',
+            email='fan@example.com',
+            password='password123',
+            role='Reviewer'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.fan)
+        reactions.buffer.flush()
+
+    def tearDown(self):
+        reactions.buffer.flush()
+
+    def toggle(self, reaction_type='Like', **extra):
+        return self.client.post(
+            '/api/reactions/toggle/',
+            {'project': self.project.id, 'reaction_type': reaction_type, **extra},
+            format='json'
+        )
+
+    def test_toggle_is_buffered_and_counted(self):
+        response = self.toggle()
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.data['active'])
+        self.assertEqual(response.data['counts']['Like'], 1)
+        self.assertFalse(Reaction.objects.exists())
+
+        reactions.buffer.flush()
+        self.assertEqual(Reaction.objects.filter(project=self.project, user=self.fan).count(), 1)
+        self.assertEqual(ReactionCount.objects.get(project=self.project, reaction_type='Like').count, 1)
+
+        response = self.toggle()
+        self.assertFalse(response.data['active'])
+        self.assertEqual(response.data['counts']['Like'], 0)
+        reactions.buffer.flush()
+        self.assertFalse(Reaction.objects.exists())
+        self.assertEqual(ReactionCount.objects.get(project=self.project, reaction_type='Like').count, 0)
+
+    def test_explicit_state_is_idempotent(self):
+        for _ in range(3):
+            response = self.toggle('Clap', active=True)
+            self.assertTrue(response.data['active'])
+        reactions.buffer.flush()
+        self.toggle('Clap', active=True)
+        reactions.buffer.flush()
+        self.assertEqual(Reaction.objects.filter(reaction_type='Clap').count(), 1)
+
+        response = APIClient().get(f'/api/reactions/counts/?project={self.project.id}')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['counts']['Clap'], 1)
+
+    def test_counts_are_served_from_counters(self):
+        Reaction.objects.create(project=self.project, user=self.user, reaction_type='Star')
+        reactions.recount([self.project.id])
+        self.toggle('Star')
+        with self.assertNumQueries(1):
+            counts = reactions.counts(self.project.id)
+        self.assertEqual(counts['Star'], 2)
+
+    def test_flush_drops_toggles_for_deleted_projects(self):
+        self.toggle('Love')
+        self.project.delete()
+        reactions.buffer.flush()
+        self.assertEqual(len(reactions.buffer), 0)
+        self.assertFalse(Reaction.objects.exists())
+
+    def test_toggle_during_flush_is_rebased_on_the_flushed_state(self):
+        flush_reactions = reactions.buffer.flush_fn
+
+        def flush_then_toggle(items):
+            flush_reactions(items)
+            self.assertFalse(self.toggle().data['active'])
+
+        self.toggle()
+        with mock.patch.object(reactions.buffer, 'flush_fn', flush_then_toggle):
+            reactions.buffer.flush()
+        self.assertEqual(Reaction.objects.count(), 1)
+        self.assertEqual(reactions.counts(self.project.id)['Like'], 0)
+
+        reactions.buffer.flush()
+        self.assertFalse(Reaction.objects.exists())
+        self.assertEqual(reactions.counts(self.project.id)['Like'], 0)
+
+
+class NotificationInboxTestCase(BaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.other_user = User.objects.create_user(
+            username='otheruser',
+            email='otheruser@example.com',
+            password='password123',
+            role='Reviewer'
+        )
+        self.mine = [
+            Notification.objects.create(user=self.user, message=f'Message {i}', is_read=i < 2)
+            for i in range(7)
+        ]
+        Notification.objects.create(user=self.other_user, message='Not yours')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def test_inbox_only_lists_own_notifications(self):
+        response = self.client.get('/api/notifications/?page_size=4')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([n['id'] for n in response.data['results']], [n.id for n in reversed(self.mine)][:4])
+        response = self.client.get(response.data['next'])
+        self.assertEqual(len(response.data['results']), 3)
+        self.assertIsNone(response.data['next'])
+
+        response = self.client.get('/api/notifications/?unread=true&page_size=50')
+        self.assertEqual(len(response.data['results']), 5)
+
+    def test_unread_count_is_a_single_lookup(self):
+        with self.assertNumQueries(1):
+            count = notifications.unread_count(self.user.id)
+        self.assertEqual(count, 5)
+        response = self.client.get('/api/notifications/unread_count/')
+        self.assertEqual(response.data, {'unread': 5})
+
+    def test_counter_follows_saves_and_deletes(self):
+        notification = Notification.objects.get(pk=self.mine[-1].pk)
+        notification.is_read = True
+        notification.save()
+        self.assertEqual(notifications.unread_count(self.user.id), 4)
+        Notification.objects.get(pk=self.mine[-2].pk).delete()
+        self.assertEqual(notifications.unread_count(self.user.id), 3)
+        notifications.notify([self.user.id, self.other_user.id], 'Hello')
+        self.assertEqual(notifications.unread_count(self.user.id), 4)
+        self.assertEqual(notifications.unread_count(self.other_user.id), 2)
+
+    def test_bulk_mark_read(self):
+        ids = [self.mine[2].id, self.mine[3].id, self.mine[0].id]
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post('/api/notifications/mark_read/', {'ids': ids}, format='json')
+        self.assertEqual(response.data, {'updated': 2, 'unread': 3})
+        statements = [query['sql'] for query in queries.captured_queries]
+        self.assertEqual(sum(sql.startswith('UPDATE "api_notification"') for sql in statements), 1)
+        self.assertFalse(any(sql.startswith('SELECT "api_notification".') for sql in statements))
+
+        response = self.client.post('/api/notifications/mark_read/', {}, format='json')
+        self.assertEqual(response.data, {'updated': 3, 'unread': 0})
+        self.assertEqual(Notification.objects.filter(user=self.other_user, is_read=False).count(), 1)
+        self.assertEqual(notifications.unread_count(self.other_user.id), 1)
+
+    def test_delete_user_with_unread_notifications(self):
+        user_id = self.user.id
+        self.user.delete()
+        # The cascade must not leave a counter behind for the deleted user
+        connection.check_constraints()
+        self.assertFalse(NotificationCounter.objects.filter(user_id=user_id).exists())
+        self.assertEqual(notifications.unread_count(self.other_user.id), 1)
+
+
+class SearchLoggingTestCase(BaseTestCase):
+    def setUp(self):
+        super().setUp()
+        Project.objects.create(
+            user=self.user,
+            title='Robot Arm',
+            description='A robotics project',
+            category='Research'
+        )
+        self.admin = User.objects.create_user(
+            username='moderator',
+            email='moderator@example.com',
+            password='password123',
+            role='Admin'
+        )
+        self.client = APIClient()
+        search_logs.buffer.flush()
+
+    def tearDown(self):
+        search_logs.buffer.flush()
+
+    def test_searches_are_logged_in_batches(self):
+        self.client.get('/api/projects/search/?q=Robot')
+        self.client.get('/api/projects/search/?q=robot ')
+        self.client.get('/api/projects/search/?q=  ')
+        self.client.get('/api/projects/search/?q=Robot&page=2')
+        self.assertFalse(SearchLog.objects.exists())
+        self.assertEqual(len(search_logs.buffer), 2)
+
+        search_logs.buffer.flush()
+        self.assertEqual(SearchLog.objects.filter(query='robot', result_count=1, user=None).count(), 2)
+        stat = SearchQueryStat.objects.get(query='robot')
+        self.assertEqual((stat.searches, stat.zero_results), (2, 0))
+
+    def test_rollups_are_incremented_without_reading_them(self):
+        now = timezone.now()
+        search_logs.flush_search_logs([{'user_id': None, 'query': 'robot', 'result_count': 1, 'created_at': now}])
+        batch = [
+            {'user_id': None, 'query': query, 'result_count': count, 'created_at': now}
+            for query, count in (('robot', 0), ('robot', 2), ('drone', 0))
+        ]
+        with CaptureQueriesContext(connection) as queries:
+            search_logs.flush_search_logs(batch)
+        # Another worker's flush may land between a read and a write, so there is no read
+        self.assertFalse(any(
+            query['sql'].startswith('SELECT') and 'api_searchquerystat' in query['sql'] for query in queries
+        ))
+        self.assertEqual(
+            sorted(SearchQueryStat.objects.values_list('query', 'searches', 'zero_results')),
+            [('drone', 1, 1), ('robot', 3, 1)]
+        )
+
+    def test_buffer_flushes_at_size_threshold(self):
+        with mock.patch.object(search_logs.buffer, 'max_size', 3):
+            for query in ('drone', 'drone', 'robot'):
+                self.client.get(f'/api/projects/search/?q={query}')
+        self.assertEqual(SearchLog.objects.count(), 3)
+        self.assertEqual(len(search_logs.buffer), 0)
+
+    def test_analytics_from_rollups(self):
+        for query in ('robot', 'robot', 'robot', 'drone', 'drone', 'laser'):
+            self.client.get(f'/api/projects/search/?q={query}')
+        search_logs.buffer.flush()
+        self.client.get('/api/projects/search/?q=drone')
+        search_logs.buffer.flush()
+
+        self.client.force_authenticate(user=self.user)
+        self.assertEqual(self.client.get('/api/searchlogs/analytics/').status_code, status.HTTP_403_FORBIDDEN)
+
+        self.client.force_authenticate(user=self.admin)
+        response = self.client.get('/api/searchlogs/analytics/?days=1')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [(row['query'], row['searches']) for row in response.data['top_queries']],
+            [('drone', 3), ('robot', 3), ('laser', 1)]
+        )
+        self.assertEqual(
+            [(row['query'], row['zero_results']) for row in response.data['zero_result_queries']],
+            [('drone', 3), ('laser', 1)]
+        )
+
+
+class PopulateDbTestCase(TestCase):
+    def populate(self, seed):
+        call_command(
+            'populate_db', users=20, projects=30, feedback_per_project=5, ratings_per_project=4,
+            reactions_per_project=3, zipf=1.2, seed=seed, batch_size=7, stdout=StringIO()
+        )
+        return [
+            sorted(Project.objects.values_list('title', 'category')),
+            sorted(Rating.objects.values_list('project__title', 'creativity', 'impact')),
+            sorted(Feedback.objects.values_list('project__title', 'comment')),
+        ]
+
+    def test_generated_data_is_seeded_and_consistent(self):
+        first = self.populate(seed=42)
+        self.assertEqual(User.objects.count(), 20)
+        self.assertEqual(Project.objects.count(), 30)
+        self.assertFalse(
+            Rating.objects.values('project', 'user').annotate(n=Count('id')).filter(n__gt=1).exists()
+        )
+        self.assertTrue(User.objects.first().check_password('password'))
+        self.assertEqual(
+            ProjectRatingStats.objects.aggregate(total=Sum('count'))['total'], Rating.objects.count()
+        )
+        self.assertEqual(
+            ReactionCount.objects.aggregate(total=Sum('count'))['total'], Reaction.objects.count()
+        )
+        self.assertTrue(SearchTerm.objects.exists())
+
+        Project.objects.all().delete()
+        User.objects.all().delete()
+        self.assertEqual(self.populate(seed=42), first)
+
+
+class BenchmarkHelpersTestCase(TransactionTestCase):
+    # Client threads use their own connections, so the data has to be committed
+    def test_drive_reports_latency_and_queries(self):
+        user = User.objects.create_user(username='benchmarker', email='benchmarker@example.com', password='password123')
+        Project.objects.create(user=user, title='Benchmarked', description='Fast', category='Research')
+        result = benchmarks.drive('/api/projects/', requests=6, concurrency=1, warmup=1)
+        self.assertEqual(result['requests'], 6)
+        self.assertEqual(result['errors'], 0)
+        # Every request misses the response cache and runs the view's queries
+        self.assertGreater(result['queries_per_request'], 0)
+        self.assertLessEqual(result['p50_ms'], result['p95_ms'])
+        self.assertLessEqual(result['p95_ms'], result['p99_ms'])
+        self.assertGreater(result['peak_memory_kb'], 0)
+
+        cached = benchmarks.drive('/api/projects/', requests=6, concurrency=1, warmup=1, bust_cache=False)
+        self.assertEqual(cached['queries_per_request'], 0.0)
+
+    def test_leaderboard_is_rebuilt_for_every_request(self):
+        user = User.objects.create_user(username='benchmarker', email='benchmarker@example.com', password='password123')
+        project = Project.objects.create(user=user, title='Benchmarked', description='Fast', category='Research')
+        Rating.objects.create(project=project, user=user, creativity=4, technical_skills=4, impact=4, presentation=4)
+        result = benchmarks.drive('/api/leaderboard/', requests=4, concurrency=1, warmup=1)
+        self.assertEqual(result['errors'], 0)
+        self.assertGreater(result['queries_per_request'], 0)
+
+    def test_percentile_is_nearest_rank(self):
+        values = list(range(1, 101))
+        self.assertEqual(
+            [benchmarks.percentile(values, fraction) for fraction in (0, 0.5, 0.95, 0.99, 1)],
+            [1, 50, 95, 99, 100],
+        )
+        self.assertEqual(benchmarks.percentile(list(range(1, 31)), 0.1), 3)
+        self.assertEqual(benchmarks.percentile([7, 9], 0.5), 7)
+        self.assertEqual(benchmarks.percentile([], 0.95), 0.0)
+
+    def test_compare_flags_regressions(self):
+        baseline = {'project_list': {'p95_ms': 10.0, 'throughput_rps': 100.0, 'queries_per_request': 2.0}}
+        current = {'project_list': {
+            'p50_ms': 5.0, 'p95_ms': 11.0, 'p99_ms': 20.0, 'throughput_rps': 90.0,
+            'queries_per_request': 2.0, 'peak_memory_kb': 100.0,
+        }}
+        self.assertEqual(benchmarks.compare(current, baseline, tolerance=0.2), [])
+        current['project_list'].update(p95_ms=13.0, queries_per_request=3.0, throughput_rps=70.0)
+        self.assertEqual(len(benchmarks.compare(current, baseline, tolerance=0.2)), 3)
+
+
+class ConditionalGetTestCase(BaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.project = Project.objects.create(
+            user=self.user,
+            title='Cached Project',
+            description='Served from cache',
+            category='Research'
+        )
+        self.feedback = Feedback.objects.create(project=self.project, user=self.user, comment='First')
+        self.client = APIClient()
+
+    def test_matching_etag_returns_304_without_queries(self):
+        for url in ['/api/projects/', f'/api/projects/{self.project.id}/',
+                    f'/api/projects/{self.project.id}/feedback/', '/api/feedbacks/']:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertIn('Last-Modified', response)
+            with self.assertNumQueries(0):
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+            self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+            with self.assertNumQueries(0):
+                cached = self.client.get(url)
+            self.assertEqual(cached.status_code, status.HTTP_200_OK)
+
+    def test_writes_invalidate_cached_bodies(self):
+        url = f'/api/projects/{self.project.id}/?expand=feedbacks,ratings_summary'
+        first = self.client.get(url)
+        other = self.client.get('/api/projects/')
+
+        Feedback.objects.create(project=self.project, user=self.user, comment='Second')
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['feedbacks']), 2)
+        self.assertNotEqual(response['ETag'], first['ETag'])
+
+        self.user.username = 'renamed'
+        self.user.save()
+        response = self.client.get('/api/projects/', HTTP_IF_NONE_MATCH=other['ETag'])
+        self.assertEqual(response.data['results'][0]['username'], 'renamed')
+
+        Rating.objects.create(
+            project=self.project, user=self.user, creativity=5, technical_skills=5, impact=5, presentation=5
+        )
+        self.assertEqual(self.client.get(url).data['ratings_summary']['count'], 1)
+
+    def test_if_modified_since(self):
+        response = self.client.get('/api/feedbacks/')
+        response = self.client.get('/api/feedbacks/', HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_wildcard_etag_only_matches_existing_resources(self):
+        for prefix in ('/api/', '/api/async/'):
+            url = f'{prefix}projects/{self.project.id}/'
+            response = self.client.get(url, HTTP_IF_NONE_MATCH='*')
+            self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+            response = self.client.get(f'{prefix}projects/99999/', HTTP_IF_NONE_MATCH='*')
+            self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class DatabaseRoutingTestCase(BaseTestCase):
+    def setUp(self):
+        super().setUp()
+        routers.unpin()
+        self.addCleanup(routers.unpin)
+        self.router = routers.PrimaryReplicaRouter()
+
+    def test_reads_use_default_without_replicas(self):
+        with override_settings(DATABASE_REPLICAS=[]):
+            self.assertEqual(self.router.db_for_read(Project), 'default')
+
+    @override_settings(DATABASE_REPLICAS=['replica1', 'replica2'])
+    def test_reads_go_to_replicas_until_a_write(self):
+        self.assertIn(self.router.db_for_read(Project), {'replica1', 'replica2'})
+        self.assertEqual(self.router.db_for_write(Project), 'default')
+        self.assertEqual(self.router.db_for_read(Project), 'default')
+
+        routers.unpin()
+        self.assertIn(self.router.db_for_read(Project), {'replica1', 'replica2'})
+        self.assertFalse(self.router.allow_migrate('replica1', 'api'))
+        self.assertTrue(self.router.allow_migrate('default', 'api'))
+
+    def test_sqlite_pragmas_applied(self):
+        if connection.vendor != 'sqlite':
+            self.skipTest('SQLite only')
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA synchronous')
+            self.assertEqual(cursor.fetchone()[0], 1)
+            cursor.execute('PRAGMA busy_timeout')
+            self.assertEqual(cursor.fetchone()[0], 20000)
+            cursor.execute('PRAGMA temp_store')
+            self.assertEqual(cursor.fetchone()[0], 2)
+
+
+class QueryPlanTestCase(BaseTestCase):
+    """The hot lookups must be answered from an index, never a table scan."""
+
+    def setUp(self):
+        super().setUp()
+        if connection.vendor != 'sqlite':
+            self.skipTest('EXPLAIN QUERY PLAN is SQLite specific')
+
+    def assertUsesIndex(self, queryset, index=None):
+        sql, params = queryset.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+            plan = [row[-1] for row in cursor.fetchall()]
+        for step in plan:
+            self.assertFalse(step.startswith('SCAN'), f'table scan in {plan}')
+            self.assertNotIn('TEMP B-TREE', step, f'sort without an index in {plan}')
+        if index:
+            self.assertTrue(any(index in step for step in plan), f'{index} not used in {plan}')
+
+    def test_feedback_by_project_in_time_order(self):
+        self.assertUsesIndex(
+            Feedback.objects.filter(project_id=1).order_by('created_at', 'id'), 'feedback_project_idx'
+        )
+
+    def test_ratings_by_project_and_reviewer(self):
+        self.assertUsesIndex(Rating.objects.filter(project_id=1))
+        self.assertUsesIndex(Rating.objects.filter(project_id=1, user_id=2))
+        self.assertUsesIndex(Rating.objects.filter(created_at__gte=timezone.now()), 'rating_created_idx')
+
+    def test_reactions_by_project_and_type(self):
+        self.assertUsesIndex(
+            Reaction.objects.filter(project_id=1, reaction_type='Like'), 'reaction_project_type_idx'
+        )
+
+    def test_unread_notifications(self):
+        self.assertUsesIndex(
+            Notification.objects.filter(user_id=1, is_read=False).order_by('-created_at', '-id')
+        )
+
+    def test_reports_by_status(self):
+        self.assertUsesIndex(
+            Report.objects.filter(status='Pending').order_by('-created_at', '-id'), 'report_status_idx'
+        )
+
+    def test_pending_reports_per_project_and_comment(self):
+        self.assertUsesIndex(
+            Report.objects.filter(status='Pending').order_by().values('project').annotate(count=Count('id')),
+            'report_status_project_idx'
+        )
+        self.assertUsesIndex(
+            Report.objects.filter(status='Pending', feedback_id=1).order_by('created_at'), 'report_status_feedback_idx'
+        )
+
+    def test_rating_per_reviewer_is_unique(self):
+        project = Project.objects.create(user=self.user, title='Unique', description='d', category='Research')
+        scores = {'creativity': 3, 'technical_skills': 3, 'impact': 3, 'presentation': 3}
+        Rating.objects.create(project=project, user=self.user, **scores)
+        with self.assertRaises(IntegrityError):
+            Rating.objects.create(project=project, user=self.user, **scores)
+
+
+class RatingBatchTestCase(BaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.projects = [
+            Project.objects.create(user=self.user, title=f'Judged {i}', description='d', category='Hackathon')
+            for i in range(3)
+        ]
+
+    def scores(self, project, score):
+        return {
+            'project': project.id, 'creativity': score, 'technical_skills': score,
+            'impact': score, 'presentation': score,
+        }
+
+    def post(self, ratings, key=None):
+        headers = {'HTTP_IDEMPOTENCY_KEY': key} if key else {}
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post('/api/ratings/batch/', {'ratings': ratings}, format='json', **headers)
+
+    def test_batch_creates_and_updates_in_one_upsert(self):
+        Rating.objects.create(project=self.projects[0], user=self.user, **{c: 1 for c in Rating.CRITERIA})
+        with CaptureQueriesContext(connection) as queries:
+            response = self.post([self.scores(project, 4) for project in self.projects])
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual((response.data['created'], response.data['updated']), (2, 1))
+        inserts = [q for q in queries.captured_queries if q['sql'].startswith('INSERT INTO "api_rating"')]
+        self.assertEqual(len(inserts), 1)
+
+        self.assertEqual(Rating.objects.filter(user=self.user).count(), 3)
+        for project in self.projects:
+            stats = ProjectRatingStats.objects.get(project=project)
+            self.assertEqual((stats.count, stats.creativity_sum), (1, 4))
+
+    def test_retry_with_same_key_is_replayed(self):
+        batch = [self.scores(project, 5) for project in self.projects]
+        first = self.post(batch, key='judge-1')
+        self.assertEqual(first.status_code, status.HTTP_201_CREATED)
+
+        retry = self.post(batch, key='judge-1')
+        self.assertEqual(retry.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(retry.data, first.data)
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.assertEqual(Rating.objects.count(), 3)
+
+        reused = self.post([self.scores(self.projects[0], 1)], key='judge-1')
+        self.assertEqual(reused.status_code, 422)
+        self.assertEqual(Rating.objects.get(project=self.projects[0]).creativity, 5)
+
+    def test_invalid_batches_are_rejected_and_not_stored(self):
+        response = self.post([self.scores(self.projects[0], 3), self.scores(self.projects[0], 4)], key='bad')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.post([{**self.scores(self.projects[1], 3), 'project': 99999}], key='bad')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(IdempotencyKey.objects.exists())
+
+        response = self.post([self.scores(self.projects[1], 3)], key='bad')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+    def test_expired_keys_are_purged(self):
+        self.post([self.scores(self.projects[0], 2)], key='old')
+        IdempotencyKey.objects.update(created_at=timezone.now() - timedelta(days=2))
+        call_command('purge_idempotency_keys', stdout=StringIO())
+        self.assertFalse(IdempotencyKey.objects.exists())
+
+
+class FeedbackThreadTestCase(BaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.project = Project.objects.create(user=self.user, title='Thread', description='d', category='Research')
+        self.commenters = [
+            User.objects.create_user(
+                username=f'commenter{i}', email=f'commenter{i}@example.com', password='password123', role='Reviewer'
+            )
+            for i in range(3)
+        ]
+        Feedback.objects.bulk_create([
+            Feedback(project=self.project, user=self.commenters[i % 3], comment=f'Comment {i}')
+            for i in range(25)
+        ])
+
+    def test_pages_in_time_order_with_authors(self):
+        url = f'/api/projects/{self.project.id}/feedback/?page_size=10'
+        comments = []
+        with self.assertNumQueries(1):
+            response = self.client.get(url)
+        while True:
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            comments.extend(response.data['results'])
+            if not response.data['next']:
+                break
+            response = self.client.get(response.data['next'])
+
+        self.assertEqual([c['comment'] for c in comments], [f'Comment {i}' for i in range(25)])
+        self.assertEqual(comments[1]['username'], 'commenter1')
+        self.assertIn('profile_picture', comments[1])
+
+    def test_ndjson_export_streams_every_comment(self):
+        with mock.patch.object(views.ProjectFeedbackView, 'EXPORT_CHUNK_SIZE', 10):
+            response = self.client.get(f'/api/projects/{self.project.id}/feedback/?export=ndjson')
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertTrue(response.streaming)
+            self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+            lines = b''.join(response.streaming_content).decode('utf-8').splitlines()
+        self.assertEqual(len(lines), 25)
+        first = json.loads(lines[0])
+        self.assertEqual((first['comment'], first['username']), ('Comment 0', 'commenter0'))
+
+    async def test_ndjson_export_streams_under_asgi(self):
+        with mock.patch.object(views.ProjectFeedbackView, 'EXPORT_CHUNK_SIZE', 10):
+            response = await self.async_client.get(f'/api/projects/{self.project.id}/feedback/?export=ndjson')
+            self.assertTrue(response.is_async)
+            chunks = [chunk async for chunk in response.streaming_content]
+        self.assertEqual(len(chunks), 3)
+        lines = b''.join(chunks).decode('utf-8').splitlines()
+        self.assertEqual([json.loads(line)['comment'] for line in lines], [f'Comment {i}' for i in range(25)])
+
+
+class ImagePipelineTestCase(BaseTestCase):
+    def setUp(self):
+        super().setUp()
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        settings_override = override_settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def png(self, size=(800, 600), color=(200, 30, 30)):
+        output = BytesIO()
+        Image.new('RGB', size, color).save(output, 'PNG')
+        return SimpleUploadedFile('photo.png', output.getvalue(), content_type='image/png')
+
+    def upload(self, upload):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/api/images/', {'image': upload}, format='multipart')
+        jobs.run_pending()
+        return response
+
+    def test_upload_is_content_addressed_with_variants(self):
+        response = self.upload(self.png())
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        asset = ImageAsset.objects.get(pk=response.data['id'])
+        self.assertEqual(asset.status, 'Ready')
+        self.assertIn(asset.digest, asset.original.name)
+        self.assertEqual((asset.width, asset.height), (800, 600))
+        with default_storage.open(asset.variants['small']['webp']) as handle:
+            variant = Image.open(handle)
+            self.assertEqual((variant.format, max(variant.size)), ('WEBP', 160))
+        # The response goes out before the variants exist
+        self.assertEqual(response.data['status'], 'Pending')
+
+        again = self.upload(self.png())
+        self.assertEqual(again.status_code, status.HTTP_200_OK)
+        self.assertEqual(again.data['id'], asset.id)
+        self.assertEqual(ImageAsset.objects.count(), 1)
+
+    def test_rejects_files_that_are_not_images(self):
+        response = self.upload(SimpleUploadedFile('notes.png', b'not an image', content_type='image/png'))
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(ImageAsset.objects.exists())
+
+    def test_rejects_images_over_the_size_limit(self):
+        with override_settings(IMAGE_UPLOAD_MAX_SIZE=100):
+            response = self.upload(self.png())
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(ImageAsset.objects.exists())
+
+    def test_losing_a_concurrent_upload_leaves_no_file_behind(self):
+        asset = ImageAsset.objects.get(pk=self.upload(self.png()).data['id'])
+        directory = os.path.dirname(asset.original.name)
+        files = sorted(default_storage.listdir(directory)[1])
+
+        # The identical upload only finds the winner's row when its insert fails
+        with mock.patch('django.db.models.query.QuerySet.first', return_value=None):
+            self.assertEqual(images.store(self.png()), (asset, False))
+        self.assertEqual(sorted(default_storage.listdir(directory)[1]), files)
+
+    def test_project_list_exposes_variant_urls(self):
+        asset_id = self.upload(self.png()).data['id']
+        Project.objects.create(
+            user=self.user, title='Pictured', description='d', category='Research', thumbnail_image_id=asset_id
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post('/api/user/avatar/', {'image': self.png(color=(0, 0, 255))}, format='multipart')
+        jobs.run_pending()
+
+        project = self.client.get('/api/projects/').data['results'][0]
+        urls = project['thumbnail_urls']
+        self.assertEqual(urls['status'], 'Ready')
+        self.assertTrue(urls['variants']['small']['webp'].endswith('/small.webp'))
+        self.assertTrue(urls['variants']['large']['jpeg'].startswith('http://testserver/media/images/'))
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.avatar.status, 'Ready')
+
+    def test_media_is_served_with_immutable_cache_headers(self):
+        self.upload(self.png())
+        path = ImageAsset.objects.get().variants['medium']['jpeg']
+        response = views.serve_media(APIRequestFactory().get(f'/media/{path}'), path)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Cache-Control'], 'public, max-age=31536000, immutable')
+
+    def test_variants_are_generated_by_the_job_workers(self):
+        response = self.client.post('/api/images/', {'image': self.png()}, format='multipart')
+        self.assertEqual(ImageAsset.objects.get().status, 'Pending')
+        self.assertEqual(list(Job.objects.values_list('name', 'payload')), [
+            (images.GENERATE_VARIANTS, {'asset': response.data['id']})
+        ])
+        self.assertEqual(jobs.run_pending(), (1, 0))
+        self.assertEqual(ImageAsset.objects.get().status, 'Ready')
+
+    def test_failed_variants_are_retried(self):
+        with mock.patch.object(images, 'render', side_effect=OSError('disk full')), self.assertLogs('api', 'ERROR'):
+            response = self.upload(self.png())
+        self.assertEqual(ImageAsset.objects.get().status, 'Failed')
+        job = Job.objects.get()
+        self.assertEqual((job.status, job.attempts), ('Queued', 1))
+
+        # The queue's retry succeeds once the fault is gone
+        Job.objects.update(run_at=timezone.now())
+        self.assertEqual(jobs.run_pending(), (1, 0))
+        self.assertEqual(ImageAsset.objects.get().status, 'Ready')
+
+        # A re-upload of an image whose variants gave up queues them again
+        ImageAsset.objects.update(status='Failed', variants={})
+        again = self.client.post('/api/images/', {'image': self.png()}, format='multipart')
+        self.assertEqual((again.data['id'], again.data['status']), (response.data['id'], 'Pending'))
+        self.assertEqual(jobs.run_pending(), (1, 0))
+        self.assertEqual(ImageAsset.objects.get().status, 'Ready')
+
+
+class ResumableUploadTestCase(BaseTestCase):
+    def setUp(self):
+        super().setUp()
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        settings_override = override_settings(
+            MEDIA_ROOT=media_root, RESUMABLE_UPLOAD_DIR=os.path.join(media_root, 'partial'),
+            RESUMABLE_UPLOAD_CHUNK_SIZE=1024,
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.project = Project.objects.create(user=self.user, title='Slides', description='d', category='Research')
+        self.content = os.urandom(2500)
+        self.digest = hashlib.sha256(self.content).hexdigest()
+
+    def start(self, **extra):
+        data = {'project': self.project.id, 'filename': 'talk.pdf', 'size': len(self.content), **extra}
+        return self.client.post('/api/uploads/', data, format='json')
+
+    def send(self, session_id, offset, chunk, checksum=None):
+        headers = {'HTTP_UPLOAD_OFFSET': str(offset)}
+        if checksum:
+            headers['HTTP_UPLOAD_CHECKSUM'] = checksum
+        return self.client.patch(
+            f'/api/uploads/{session_id}/', chunk, content_type='application/offset+octet-stream', **headers
+        )
+
+    def upload(self, session_id, chunk_size=1000):
+        response = None
+        for offset in range(0, len(self.content), chunk_size):
+            response = self.send(session_id, offset, self.content[offset:offset + chunk_size])
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response
+
+    def test_chunked_upload_attaches_file_to_project(self):
+        response = self.start(sha256=self.digest)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response['Upload-Offset'], '0')
+        response = self.upload(response.data['id'])
+
+        self.assertEqual(response.data['status'], 'Complete')
+        self.project.refresh_from_db()
+        with self.project.upload_path.open('rb') as handle:
+            self.assertEqual(handle.read(), self.content)
+        self.assertIn(self.digest, self.project.upload_path.name)
+
+    def test_resumes_from_the_reported_offset(self):
+        session_id = self.start().data['id']
+        self.send(session_id, 0, self.content[:1000])
+        self.assertEqual(self.send(session_id, 0, self.content[:1000]).status_code, status.HTTP_409_CONFLICT)
+
+        head = self.client.head(f'/api/uploads/{session_id}/')
+        offset = int(head['Upload-Offset'])
+        self.assertEqual(offset, 1000)
+        self.send(session_id, offset, self.content[offset:2000])
+        response = self.send(session_id, 2000, self.content[2000:])
+        self.assertEqual((response.data['status'], response.data['offset']), ('Complete', 2500))
+
+    def test_duplicate_chunk_at_the_same_offset_is_written_once(self):
+        session_id = self.start().data['id']
+        chunk = self.content[:1000]
+
+        class RetriedWhileReceiving(BytesIO):
+            # The client retries the chunk while the original is still arriving
+            def read(stream, size=-1):
+                if stream.tell() == 0:
+                    uploads.append(session_id, 0, BytesIO(chunk), len(chunk))
+                return super().read(size)
+
+        with self.assertRaises(uploads.OffsetMismatch):
+            uploads.append(session_id, 0, RetriedWhileReceiving(chunk), len(chunk))
+        session = UploadSession.objects.get(pk=session_id)
+        self.assertEqual(session.offset, 1000)
+        with open(uploads.partial_path(session), 'rb') as handle:
+            self.assertEqual(handle.read(), chunk)
+
+        self.send(session_id, 1000, self.content[1000:2000])
+        self.assertEqual(self.send(session_id, 2000, self.content[2000:]).data['status'], 'Complete')
+        self.project.refresh_from_db()
+        with self.project.upload_path.open('rb') as handle:
+            self.assertEqual(handle.read(), self.content)
+
+    def test_chunk_checksums_are_verified(self):
+        session_id = self.start().data['id']
+        chunk = self.content[:1000]
+        wrong = base64.b64encode(hashlib.sha256(b'other').digest()).decode()
+        self.assertEqual(self.send(session_id, 0, chunk, f'sha256 {wrong}').status_code, 460)
+        self.assertEqual(UploadSession.objects.get(pk=session_id).offset, 0)
+
+        right = base64.b64encode(hashlib.sha256(chunk).digest()).decode()
+        self.assertEqual(self.send(session_id, 0, chunk, f'sha256 {right}').data['offset'], 1000)
+        self.assertEqual(self.send(session_id, 1000, os.urandom(2000)).status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_declared_digest_mismatch_restarts_upload(self):
+        session_id = self.start(sha256='0' * 64).data['id']
+        for offset in range(0, 2500, 1000):
+            response = self.send(session_id, offset, self.content[offset:offset + 1000])
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(UploadSession.objects.get(pk=session_id).offset, 0)
+        self.assertFalse(StoredFile.objects.exists())
+
+    def test_identical_files_are_stored_once(self):
+        self.upload(self.start().data['id'])
+        other = Project.objects.create(user=self.user, title='Again', description='d', category='Research')
+        response = self.start(project=other.id, sha256=self.digest)
+        self.assertEqual(response.data['status'], 'Complete')
+        other.refresh_from_db()
+        self.assertEqual(other.upload_path.name, Project.objects.get(pk=self.project.pk).upload_path.name)
+        self.assertEqual(StoredFile.objects.count(), 1)
+
+    def test_a_digest_alone_does_not_share_another_users_file(self):
+        self.upload(self.start().data['id'])
+        stranger = User.objects.create_user(
+            username='stranger', email='stranger@example.com', password='password123', role='Presenter'
+        )
+        theirs = Project.objects.create(user=stranger, title='Theirs', description='d', category='Research')
+        self.client.force_authenticate(user=stranger)
+        response = self.start(project=theirs.id, sha256=self.digest)
+        self.assertEqual((response.data['status'], response.data['offset']), ('Active', 0))
+        theirs.refresh_from_db()
+        self.assertFalse(theirs.upload_path)
+
+        # Once the bytes have arrived the stored copy is shared
+        self.project = theirs
+        self.assertEqual(self.upload(response.data['id']).data['status'], 'Complete')
+        self.assertEqual(StoredFile.objects.count(), 1)
+
+    def test_file_is_verified_after_the_last_chunk_commits(self):
+        session_id = self.start().data['id']
+        outside = len(connection.atomic_blocks)
+        depths = []
+
+        def digest(path):
+            depths.append(len(connection.atomic_blocks))
+            self.assertEqual(UploadSession.objects.get(pk=session_id).status, 'Verifying')
+            return file_digest(path)
+
+        file_digest = uploads.file_digest
+        with mock.patch.object(uploads, 'file_digest', side_effect=digest):
+            self.assertEqual(self.upload(session_id).data['status'], 'Complete')
+        self.assertEqual(depths, [outside])
+
+    def test_only_owner_can_upload_and_stale_sessions_are_purged(self):
+        stranger = User.objects.create_user(
+            username='stranger', email='stranger@example.com', password='password123', role='Presenter'
+        )
+        self.client.force_authenticate(user=stranger)
+        self.assertEqual(self.start().status_code, status.HTTP_400_BAD_REQUEST)
+
+        self.client.force_authenticate(user=self.user)
+        session_id = self.start().data['id']
+        UploadSession.objects.update(updated_at=timezone.now() - timedelta(days=2))
+        call_command('purge_stale_uploads', stdout=StringIO())
+        self.assertFalse(UploadSession.objects.filter(pk=session_id).exists())
+
+
+class JobQueueTestCase(BaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.reviewer = User.objects.create_user(
+            username='reviewer', email='reviewer@example.com', password='password123', role='Reviewer'
+        )
+        self.project = Project.objects.create(user=self.user, title='Queued', description='d', category='Research')
+
+    def add_collaborators(self, count):
+        users = User.objects.bulk_create([
+            User(username=f'collab{i}', email=f'collab{i}@example.com', role='Presenter') for i in range(count)
+        ])
+        Collaboration.objects.bulk_create([
+            Collaboration(project=self.project, user=user, status='Accepted') for user in users
+        ])
+        return users
+
+    def post_feedback(self):
+        self.client.force_authenticate(user=self.reviewer)
+        return self.client.post(
+            '/api/feedbacks/', {'project': self.project.id, 'user': self.reviewer.id, 'comment': 'Nice'}, format='json'
+        )
+
+    def test_feedback_fans_out_through_the_queue(self):
+        collaborators = self.add_collaborators(3)
+        response = self.post_feedback()
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertFalse(Notification.objects.exists())
+        self.assertEqual(Job.objects.get().payload['event'], 'feedback')
+
+        self.assertEqual(jobs.run_pending(), (1, 0))
+        recipients = set(Notification.objects.values_list('user_id', flat=True))
+        self.assertEqual(recipients, {self.user.id, *(user.id for user in collaborators)})
+        self.assertEqual(Notification.objects.first().message, 'reviewer left feedback on "Queued"')
+        self.assertEqual(notifications.unread_count(self.user.id), 1)
+        self.assertFalse(Job.objects.exists())
+
+    def test_write_cost_does_not_depend_on_audience(self):
+        with CaptureQueriesContext(connection) as few:
+            self.post_feedback()
+        self.add_collaborators(40)
+        with CaptureQueriesContext(connection) as many:
+            self.post_feedback()
+        self.assertEqual(len(few.captured_queries), len(many.captured_queries))
+
+        with CaptureQueriesContext(connection) as fan_out:
+            jobs.run_pending()
+        inserts = [q for q in fan_out.captured_queries if q['sql'].startswith('INSERT INTO "api_notification"')]
+        self.assertEqual(len(inserts), 1)
+        # Both feedbacks reach the owner and the 40 collaborators
+        self.assertEqual(Notification.objects.count(), 2 * 41)
+
+    def test_ratings_and_collaborations_notify(self):
+        self.client.force_authenticate(user=self.reviewer)
+        scores = {'creativity': 4, 'technical_skills': 4, 'impact': 4, 'presentation': 4}
+        self.client.post('/api/ratings/', {'project': self.project.id, 'user': self.reviewer.id, **scores}, format='json')
+        response = self.client.post(
+            '/api/collaborations/', {'project': self.project.id, 'user': self.reviewer.id}, format='json'
+        )
+        self.client.force_authenticate(user=self.user)
+        self.client.patch(f"/api/collaborations/{response.data['id']}/", {'status': 'Accepted'}, format='json')
+        jobs.run_pending()
+
+        self.assertEqual(list(Notification.objects.filter(user=self.user).order_by('id').values_list('message', flat=True)), [
+            'reviewer rated "Queued"',
+            'reviewer asked to collaborate on "Queued"',
+        ])
+        self.assertEqual(
+            Notification.objects.get(user=self.reviewer).message,
+            'testuser accepted your request to collaborate on "Queued"',
+        )
+
+    def test_failing_jobs_are_retried_with_backoff(self):
+        calls = []
+
+        @jobs.task('test_flaky')
+        def flaky(payloads):
+            calls.append(payloads)
+            raise RuntimeError('boom')
+
+        self.addCleanup(jobs._tasks.pop, 'test_flaky')
+        jobs.enqueue_many('test_flaky', [{'n': 1}, {'n': 2}])
+        with self.assertLogs('api.jobs', 'ERROR'):
+            self.assertEqual(jobs.run_pending(), (0, 2))
+        self.assertEqual(calls, [[{'n': 1}, {'n': 2}]])
+        job = Job.objects.first()
+        self.assertEqual((job.status, job.attempts), ('Queued', 1))
+        self.assertGreater(job.run_at, timezone.now())
+        self.assertIn('boom', job.last_error)
+
+        with override_settings(JOB_MAX_ATTEMPTS=2), self.assertLogs('api.jobs', 'ERROR'):
+            Job.objects.update(run_at=timezone.now())
+            jobs.run_pending()
+        self.assertEqual(set(Job.objects.values_list('status', flat=True)), {'Failed'})
+        self.assertEqual(jobs.retry_failed(), 2)
+
+    def test_abandoned_jobs_are_reclaimed(self):
+        job = notifications.queue_project_event('feedback', self.project.id, self.reviewer.id)
+        self.assertEqual([claimed.id for claimed in jobs.claim('worker-a', 10)], [job.id])
+        self.assertEqual(jobs.claim('worker-b', 10), [])
+        Job.objects.update(locked_at=timezone.now() - timedelta(hours=1))
+        self.assertEqual([claimed.id for claimed in jobs.claim('worker-b', 10)], [job.id])
+
+
+class CachedAuthenticationTestCase(BaseTestCase):
+    def setUp(self):
+        super().setUp()
+        authentication.forget()
+        self.addCleanup(authentication.forget)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.user)}')
+        self.url = '/api/notifications/unread_count/'
+
+    def authenticate(self):
+        request = APIRequestFactory().get('/api/', HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.user)}')
+        return authentication.CachedJWTAuthentication().authenticate(Request(request))[0]
+
+    def test_principal_is_reused_without_queries(self):
+        self.authenticate()
+        with self.assertNumQueries(0):
+            user = self.authenticate()
+            self.assertEqual((user.pk, user.username, user.role), (self.user.pk, 'testuser', 'Presenter'))
+            self.assertTrue(user.is_authenticated)
+        # Fields outside the principal are loaded on demand
+        with self.assertNumQueries(1):
+            self.assertEqual(user.email, 'testuser@example.com')
+
+    def test_changes_to_the_user_invalidate_the_principal(self):
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_200_OK)
+        self.user.role = 'Reviewer'
+        self.user.save()
+        self.assertEqual(self.authenticate().role, 'Reviewer')
+
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_deleted_user_is_rejected(self):
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_200_OK)
+        self.user.delete()
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_bulk_updates_apply_once_the_ttl_expires(self):
+        self.authenticate()
+        User.objects.filter(pk=self.user.pk).update(role='Admin')
+        self.assertEqual(self.authenticate().role, 'Presenter')
+        later = authentication.time.monotonic() + authentication.ttl() + 1
+        with mock.patch.object(authentication.time, 'monotonic', return_value=later):
+            self.assertEqual(self.authenticate().role, 'Admin')
+
+    @override_settings(AUTH_PRINCIPAL_CACHE_SIZE=2)
+    def test_least_recently_used_principals_are_dropped(self):
+        others = [
+            User.objects.create_user(username=f'member{i}', email=f'member{i}@example.com', password='password123')
+            for i in range(2)
+        ]
+        authentication.principal(self.user.pk)
+        authentication.principal(others[0].pk)
+        authentication.principal(self.user.pk)
+        authentication.principal(others[1].pk)
+        self.assertEqual(list(authentication._principals), [self.user.pk, others[1].pk])
+        with self.assertNumQueries(0):
+            authentication.principal(self.user.pk)
+
+    def test_benchmark_compares_authentication_classes(self):
+        results = {name: benchmarks.drive_auth(cls, requests=20) for name, cls in benchmarks.auth_scenarios().items()}
+        self.assertEqual(results['auth_jwt']['queries_per_request'], 1.0)
+        self.assertEqual(results['auth_cached_jwt']['queries_per_request'], 0.0)
+        self.assertEqual(results['auth_cached_jwt']['errors'], 0)
+
+
+class FastSerializationTestCase(BaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.reviewer = User.objects.create_user(username='reviewer', email='reviewer@example.com', password='pw', role='Reviewer')
+        asset = ImageAsset.objects.create(
+            digest='3e1f' * 16, original='images/3e/3e1f/original.png', width=10, height=10,
+            variants={'small': {'webp': 'images/3e/3e1f/small.webp'}}, status='Ready',
+        )
+        self.reviewer.avatar = asset
+        self.reviewer.save()
+        with_image = Project.objects.create(
+            user=self.user, title='Caf\u00e9 \u2028 line', description='Emoji \U0001F600', category='Research', thumbnail_image=asset,
+        )
+        Project.objects.create(user=self.user, title='Plain', description='No image', category='Hackathon', video_url='https://example.com/v')
+        Feedback.objects.create(project=with_image, user=self.reviewer, comment='Line\u2029separator "quoted"')
+        Feedback.objects.create(project=with_image, user=self.user, comment='Second')
+        Rating.objects.create(project=with_image, user=self.reviewer, creativity=5, technical_skills=4, impact=3, presentation=2)
+        self.request = Request(APIRequestFactory().get('/api/'))
+
+    def render(self, serializer_class, queryset, fast):
+        with override_settings(FAST_LIST_SERIALIZERS=fast):
+            data = serializer_class(list(queryset), many=True, context={'request': self.request}).data
+        renderer = FastJSONRenderer() if fast else JSONRenderer()
+        return data, renderer.render(data)
+
+    def test_compiled_list_serializers_match_drf(self):
+        pages = [
+            (ProjectSerializer, Project.objects.select_related('user', 'rating_stats', 'thumbnail_image').prefetch_related('feedback_set')),
+            (FeedbackSerializer, Feedback.objects.all()),
+            (FeedbackThreadSerializer, Feedback.objects.select_related('user__avatar')),
+        ]
+        for serializer_class, queryset in pages:
+            with self.subTest(serializer_class.__name__):
+                expected, expected_body = self.render(serializer_class, queryset, fast=False)
+                actual, actual_body = self.render(serializer_class, queryset, fast=True)
+                self.assertEqual(actual, expected)
+                self.assertEqual(actual_body, expected_body)
+                self.assertIn(b'\\u2028' if serializer_class is ProjectSerializer else b'\\u2029', actual_body)
+
+    def test_compiled_plan_skips_per_field_lookups(self):
+        serializer = FeedbackSerializer(Feedback.objects.all(), many=True)
+        getters = {name: getter for name, getter, convert in serializer.get_plan()}
+        self.assertIsInstance(getters['user'], fast_serializers.attrgetter)
+        self.assertIsInstance(getters['created_at'], fast_serializers.attrgetter)
+        self.assertEqual(getters['user'](Feedback.objects.first()), self.reviewer.id)
+
+    def test_renderer_matches_json_renderer(self):
+        payloads = [
+            {'big': 1e16, 'small': -1e-05, 'tiny': 1e-07, 'fine': 0.0001, 'avg': 3.67, 'zero': -0.0},
+            [2 ** 70, 5e-324, 1.5e300],
+            {'when': timezone.now(), 'day': timezone.now().date(), 'price': Decimal('1.10')},
+            {'text': 'e-commerce 3e1f 0.00001 \u2028\u2029 \u2014 \x01', 1: 'non-string key'},
+            'plain',
+        ]
+        for payload in payloads:
+            with self.subTest(payload=payload):
+                self.assertEqual(FastJSONRenderer().render(payload), JSONRenderer().render(payload))
+        self.assertEqual(
+            FastJSONRenderer().render({'a': 1}, 'application/json; indent=2'),
+            JSONRenderer().render({'a': 1}, 'application/json; indent=2'),
+        )
+        self.assertEqual(FastJSONRenderer().render(None), b'')
+
+    def test_list_endpoint_bodies_are_unchanged(self):
+        response = self.client.get('/api/projects/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.content, JSONRenderer().render(response.data))
+
+    def test_benchmark_reports_identical_output(self):
+        for name, (serializer_class, instances) in benchmarks.serialization_pages(100).items():
+            result = benchmarks.serialization_throughput(serializer_class, instances, repeat=1)
+            self.assertTrue(result['identical'], name)
+            self.assertGreater(result['fast']['total_rows_per_s'], 0)
+
+
+class ProjectFieldsetTestCase(BaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.project = Project.objects.create(user=self.user, title='Grid card', description='Long text', category='Research')
+        Feedback.objects.create(project=self.project, user=self.user, comment='Nice')
+        Rating.objects.create(project=self.project, user=self.user, creativity=4, technical_skills=4, impact=4, presentation=4)
+        self.client = APIClient()
+        self.addCleanup(search_logs.buffer.flush)
+
+    def test_nested_data_is_opt_in(self):
+        project = self.client.get('/api/projects/').data['results'][0]
+        self.assertNotIn('feedbacks', project)
+        self.assertNotIn('ratings_summary', project)
+        self.assertIn('description', project)
+
+        project = self.client.get('/api/projects/?expand=feedbacks,ratings_summary').data['results'][0]
+        self.assertEqual([feedback['comment'] for feedback in project['feedbacks']], ['Nice'])
+        self.assertEqual(project['ratings_summary']['count'], 1)
+
+    def test_fields_select_columns_and_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/projects/?fields=id,title,username,thumbnail_urls')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(list(response.data['results'][0]), ['id', 'title', 'thumbnail_urls', 'username'])
+        self.assertEqual(response.data['results'][0]['username'], 'testuser')
+        self.assertEqual(len(queries), 1)
+        self.assertNotIn('description', queries[0]['sql'])
+        self.assertNotIn('api_feedback', queries[0]['sql'])
+
+        # An expanded field is added to the selected ones
+        response = self.client.get(f'/api/projects/{self.project.id}/?fields=title&expand=ratings_summary')
+        self.assertEqual(list(response.data), ['title', 'ratings_summary'])
+
+    def test_fieldsets_apply_to_search_and_own_projects(self):
+        response = self.client.get('/api/projects/search/?fields=title&expand=feedbacks')
+        self.assertEqual(list(response.data['results'][0]), ['title', 'feedbacks'])
+        self.client.force_authenticate(user=self.user)
+        response = self.client.get('/api/user/projects/?fields=id')
+        self.assertEqual(response.data, [{'id': self.project.id}])
+
+    def test_unknown_names_are_rejected(self):
+        response = self.client.get('/api/projects/?fields=title,secret&expand=user')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('fields', response.data)
+        self.assertIn('expand', response.data)
+
+    def test_paging_with_sparse_fields(self):
+        Project.objects.create(user=self.user, title='Second', description='', category='Research')
+        first = self.client.get('/api/projects/?fields=title&page_size=1')
+        with self.assertNumQueries(1):
+            second = self.client.get(first.data['next'])
+        self.assertEqual([first.data['results'][0]['title'], second.data['results'][0]['title']], ['Second', 'Grid card'])
+
+
+class PerformanceMetricsTestCase(BaseTestCase):
+    def setUp(self):
+        super().setUp()
+        metrics.reset()
+        self.addCleanup(metrics.reset)
+        self.addCleanup(search_logs.buffer.flush)
+        Project.objects.create(user=self.user, title='Measured', description='', category='Research')
+        self.client = APIClient()
+
+    def sample(self, body, name, **labels):
+        for line in body.splitlines():
+            if line.startswith(name + '{') and all(f'{key}="{value}"' in line for key, value in labels.items()):
+                return float(line.rsplit(' ', 1)[1])
+        return None
+
+    def test_server_timing_header(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/projects/search/?q=measured')
+        timing = response['Server-Timing']
+        self.assertIn(f'desc="{len(queries)} queries"', timing)
+        for metric in ('sql;dur=', 'serialize;dur=', 'total;dur='):
+            self.assertIn(metric, timing)
+
+    def test_metrics_are_labelled_by_view_and_action(self):
+        for _ in range(3):
+            self.client.get('/api/projects/')
+        self.client.get('/api/projects/search/?q=measured')
+        self.client.get('/api/does-not-exist/')
+
+        response = self.client.get('/metrics')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+        body = response.content.decode()
+        self.assertIn('# TYPE http_request_duration_seconds histogram', body)
+        list_labels = {'view': 'ProjectViewSet.list', 'method': 'GET'}
+        self.assertEqual(self.sample(body, 'http_request_duration_seconds_count', **list_labels), 3)
+        self.assertEqual(self.sample(body, 'http_request_duration_seconds_bucket', le='+Inf', **list_labels), 3)
+        self.assertEqual(self.sample(body, 'http_requests_total', status=200, **list_labels), 3)
+        self.assertEqual(self.sample(body, 'http_request_sql_queries_count', view='ProjectSearchView'), 1)
+        self.assertGreater(self.sample(body, 'http_request_serializer_duration_seconds_sum', view='ProjectSearchView'), 0)
+        self.assertEqual(self.sample(body, 'http_requests_total', view='unmatched', status=404), 1)
+
+    def test_histogram_buckets_are_cumulative(self):
+        labels = (('view', 'Example'), ('method', 'GET'))
+        for queries in (0, 2, 2, 400):
+            timings = metrics.RequestTimings()
+            timings.queries = queries
+            metrics.record('Example', 'GET', 200, timings, 0.003)
+        body = metrics.render()
+        self.assertEqual(self.sample(body, 'http_request_sql_queries_bucket', view='Example', le='0'), 1)
+        self.assertEqual(self.sample(body, 'http_request_sql_queries_bucket', view='Example', le='2'), 3)
+        self.assertEqual(self.sample(body, 'http_request_sql_queries_bucket', view='Example', le='250'), 3)
+        self.assertEqual(self.sample(body, 'http_request_sql_queries_bucket', view='Example', le='+Inf'), 4)
+        self.assertEqual(self.sample(body, 'http_request_sql_queries_sum', view='Example'), 404)
+        self.assertEqual(self.sample(body, 'http_request_duration_seconds_bucket', view='Example', le='0.0025'), 0)
+        self.assertEqual(self.sample(body, 'http_request_duration_seconds_bucket', view='Example', le='0.005'), 4)
+        self.assertIn(labels, {key[1] for key in metrics._histograms})
+
+    @override_settings(METRICS_TOKEN='scrape-secret')
+    def test_metrics_token(self):
+        self.assertEqual(self.client.get('/metrics').status_code, status.HTTP_401_UNAUTHORIZED)
+        response = self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer scrape-secret')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+
+class ProjectFacetTestCase(BaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user.institution = 'MIT'
+        self.user.save()
+        self.other = User.objects.create_user(username='other', email='other@example.com', password='password123', institution='CMU')
+        self.reviewer = User.objects.create_user(
+            username='reviewer', email='reviewer@example.com', password='password123', role='Reviewer'
+        )
+        self.robot = Project.objects.create(user=self.user, title='Robot', description='', category='Hackathon')
+        self.paper = Project.objects.create(user=self.user, title='Paper', description='', category='Research')
+        self.app = Project.objects.create(user=self.other, title='App', description='', category='Hackathon')
+        self.rate(self.robot, 5)
+        self.rate(self.app, 2)
+        self.client = APIClient()
+        self.addCleanup(search_logs.buffer.flush)
+
+    def rate(self, project, score):
+        return Rating.objects.create(
+            project=project, user=self.reviewer, creativity=score, technical_skills=score, impact=score, presentation=score
+        )
+
+    def titles(self, query):
+        response = self.client.get(f'/api/projects/?fields=title&{query}')
+        self.assertEqual(response.status_code, status.HTTP_200_OK, response.data)
+        return [project['title'] for project in response.data['results']]
+
+    def assertCountsRebuilt(self):
+        """The maintained counts match a rebuild from the project table."""
+        def counts():
+            return set(ProjectFacetCount.objects.filter(count__gt=0).values_list('category', 'institution', 'rating', 'count'))
+        maintained = counts()
+        facets.rebuild_counts()
+        self.assertEqual(maintained, counts())
+
+    def test_filters(self):
+        self.assertEqual(self.titles('category=Hackathon'), ['App', 'Robot'])
+        self.assertEqual(self.titles('institution=MIT'), ['Paper', 'Robot'])
+        self.assertEqual(self.titles('author=other'), ['App'])
+        self.assertEqual(self.titles('rating_min=4'), ['Robot'])
+        self.assertEqual(self.titles('rating_max=4'), ['App'])
+        self.assertEqual(self.titles('category=Hackathon,Research&institution=MIT&rating_min=1'), ['Robot'])
+
+        # Wide ranges walk the list instead of the rating index, with the same result
+        filters = {'category': [], 'institution': [], 'author': [], 'rating_min': 1, 'rating_max': None}
+        self.assertFalse(facets.use_rating_index(filters, page_size=1))
+        walked = facets.filter_queryset(Project.objects.all(), filters, rating_index=False)
+        self.assertEqual(set(walked.values_list('title', flat=True)), {'Robot', 'App'})
+
+    def test_facets_leave_out_their_own_filter(self):
+        response = self.client.get('/api/projects/?category=Hackathon&institution=CMU&facets=category,institution')
+        self.assertEqual([project['title'] for project in response.data['results']], ['App'])
+        self.assertEqual(response.data['facets'], {
+            'category': [{'value': 'Hackathon', 'count': 1}],
+            'institution': [{'value': 'CMU', 'count': 1}, {'value': 'MIT', 'count': 1}],
+        })
+        response = self.client.get('/api/projects/?facets=category')
+        self.assertEqual(response.data['facets'], {
+            'category': [{'value': 'Hackathon', 'count': 2}, {'value': 'Research', 'count': 1}],
+        })
+        self.assertNotIn('facets', self.client.get('/api/projects/').data)
+
+    def test_facets_under_rating_and_author_filters(self):
+        response = self.client.get('/api/projects/?rating_min=1&facets=category,institution')
+        self.assertEqual(response.data['facets'], {
+            'category': [{'value': 'Hackathon', 'count': 2}],
+            'institution': [{'value': 'CMU', 'count': 1}, {'value': 'MIT', 'count': 1}],
+        })
+        response = self.client.get('/api/projects/?author=testuser&facets=category')
+        self.assertEqual(response.data['facets'], {
+            'category': [{'value': 'Hackathon', 'count': 1}, {'value': 'Research', 'count': 1}],
+        })
+
+    def test_facet_counts_are_precomputed(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get('/api/projects/?category=Research&facets=category,institution')
+        counting = [query['sql'] for query in queries if 'COUNT' in query['sql'] or 'SUM' in query['sql']]
+        self.assertEqual(len(counting), 2)
+        self.assertTrue(all('api_projectfacetcount' in sql and 'api_project"' not in sql for sql in counting))
+
+    def test_ratings_are_counted_in_half_star_bins(self):
+        kit = Project.objects.create(user=self.user, title='Kit', description='', category='Research')
+        self.rate(kit, 4)
+        Rating.objects.create(project=self.paper, user=self.reviewer, creativity=5, technical_skills=4, impact=4, presentation=4)
+        self.assertEqual(
+            list(ProjectFacetCount.objects.filter(category='Research', count__gt=0).values_list('rating', 'count')),
+            [(4.0, 2)],
+        )
+        self.assertCountsRebuilt()
+
+        # Bounds inside a bin count that bin's projects one by one
+        response = self.client.get('/api/projects/?fields=title&rating_min=4.1&facets=category')
+        self.assertEqual([project['title'] for project in response.data['results']], ['Paper', 'Robot'])
+        self.assertEqual(response.data['facets']['category'], [
+            {'value': 'Hackathon', 'count': 1}, {'value': 'Research', 'count': 1},
+        ])
+        response = self.client.get('/api/projects/?rating_min=2&rating_max=4.1&facets=category,institution')
+        self.assertEqual(response.data['facets'], {
+            'category': [{'value': 'Hackathon', 'count': 1}, {'value': 'Research', 'count': 1}],
+            'institution': [{'value': 'CMU', 'count': 1}, {'value': 'MIT', 'count': 1}],
+        })
+
+    def test_invalid_parameters(self):
+        response = self.client.get('/api/projects/?category=Games&rating_min=high&facets=language')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(set(response.data), {'facets'})
+        response = self.client.get('/api/projects/?category=Games&rating_min=high')
+        self.assertEqual(set(response.data), {'category', 'rating_min'})
+
+    def test_stored_average_follows_ratings(self):
+        rating = Rating.objects.get(project=self.app)
+        self.assertEqual(self.app.rating_stats.overall_average, 2.0)
+        rating.impact = 4
+        rating.save()
+        self.app.rating_stats.refresh_from_db()
+        self.assertEqual(self.app.rating_stats.overall_average, 2.5)
+        self.assertCountsRebuilt()
+        rating.delete()
+        self.app.rating_stats.refresh_from_db()
+        self.assertIsNone(self.app.rating_stats.overall_average)
+        self.assertEqual(self.titles('rating_min=0'), ['Robot'])
+        self.assertCountsRebuilt()
+
+    def test_counts_follow_project_changes(self):
+        self.app.category = 'Research'
+        self.app.save()
+        self.assertCountsRebuilt()
+        self.robot.delete()
+        self.assertCountsRebuilt()
+        self.client.force_authenticate(user=self.reviewer)
+        response = self.client.post('/api/ratings/batch/', {'ratings': [
+            {'project': self.paper.id, 'creativity': 3, 'technical_skills': 3, 'impact': 3, 'presentation': 3},
+        ]}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(self.titles('rating_min=3&rating_max=3'), ['Paper'])
+        self.assertCountsRebuilt()
+
+    def test_institution_follows_the_author(self):
+        self.assertEqual(self.titles('institution=CMU'), ['App'])
+        self.other.institution = 'MIT'
+        self.other.save()
+        self.assertEqual(self.titles('institution=CMU'), [])
+        self.assertEqual(self.titles('institution=MIT'), ['App', 'Paper', 'Robot'])
+        self.assertCountsRebuilt()
+
+        Project.objects.filter(pk=self.app.pk).update(institution=None)
+        self.assertEqual(facets.sync_institutions([self.other.pk]), 1)
+        self.assertEqual(Project.objects.get(pk=self.app.pk).institution, 'MIT')
+
+
+class AsyncReadEndpointTestCase(BaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user.institution = 'MIT'
+        self.user.save()
+        self.projects = [
+            Project.objects.create(user=self.user, title=f'Async platform {i}', description='', category='Research')
+            for i in range(3)
+        ]
+        self.project = self.projects[0]
+        Feedback.objects.create(project=self.project, user=self.user, comment='Nice')
+        Rating.objects.create(project=self.project, user=self.user, creativity=4, technical_skills=4, impact=4, presentation=4)
+        self.client = APIClient()
+        self.addCleanup(search_logs.buffer.flush)
+
+    def get_both(self, path):
+        sync = self.client.get(f'/api/{path}')
+        asynchronous = self.client.get(f'/api/async/{path}')
+        return sync, asynchronous
+
+    def test_same_json_as_sync_views(self):
+        paths = [
+            'projects/?page_size=2',
+            'projects/?fields=id,title&category=Research&rating_min=3&facets=category,institution',
+            f'projects/{self.project.id}/?expand=feedbacks,ratings_summary',
+            'projects/search/?q=platform&page_size=2',
+            'projects/search/?category=Research',
+            f'projects/{self.project.id}/feedback/',
+        ]
+        for path in paths:
+            sync, asynchronous = self.get_both(path)
+            self.assertEqual(asynchronous.status_code, status.HTTP_200_OK, path)
+            self.assertEqual(asynchronous['Content-Type'], 'application/json')
+            body = asynchronous.content.decode().replace('/api/async/', '/api/')
+            self.assertEqual(json.loads(body), sync.json(), path)
+
+    def test_errors_match_sync_views(self):
+        for path in ('projects/999999/', 'projects/?fields=nope', 'projects/?category=Nope', 'projects/?rating_min=x'):
+            sync, asynchronous = self.get_both(path)
+            self.assertEqual(asynchronous.status_code, sync.status_code, path)
+            self.assertEqual(asynchronous.json(), sync.json(), path)
+        response = self.client.post('/api/async/projects/', {})
+        self.assertEqual(response.status_code, status.HTTP_405_METHOD_NOT_ALLOWED)
+
+    def test_bad_tokens_are_rejected_like_sync_views(self):
+        self.client.credentials(HTTP_AUTHORIZATION='Bearer not-a-token')
+        for path in ('projects/', f'projects/{self.project.id}/', f'projects/{self.project.id}/feedback/'):
+            sync, asynchronous = self.get_both(path)
+            self.assertEqual(sync.status_code, status.HTTP_401_UNAUTHORIZED, path)
+            self.assertEqual(asynchronous.status_code, sync.status_code, path)
+            self.assertEqual(asynchronous.json(), sync.json(), path)
+            self.assertEqual(asynchronous['WWW-Authenticate'], sync['WWW-Authenticate'], path)
+
+    def test_conditional_requests(self):
+        path = f'/api/async/projects/{self.project.id}/feedback/'
+        etag = self.client.get(path)['ETag']
+        response = self.client.get(path, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        Feedback.objects.create(project=self.project, user=self.user, comment='Another')
+        response = self.client.get(path, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([feedback['comment'] for feedback in response.json()['results']], ['Nice', 'Another'])
+
+    async def test_served_through_asgi_handler(self):
+        response = await self.async_client.get('/api/async/projects/?fields=title')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.json()['results']), 3)
+        self.assertNotIn('desc="0 queries"', response['Server-Timing'])
+
+    async def test_search_flushes_full_log_buffer_off_the_loop(self):
+        with mock.patch.object(search_logs.buffer, 'max_size', 1), self.assertNoLogs('api.buffers', 'ERROR'):
+            response = await self.async_client.get('/api/async/projects/search/?q=platform')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(search_logs.buffer), 0)
+        self.assertTrue(await SearchLog.objects.filter(query='platform').aexists())
+
+
+@override_settings(EVENTS_HEARTBEAT=0.05, EVENTS_STREAM_TIMEOUT=5)
+class ProjectEventsTestCase(BaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.project = Project.objects.create(user=self.user, title='Live', description='', category='Research')
+        self.client = APIClient()
+        self.addCleanup(reactions.buffer.flush)
+
+    def open_stream(self, project_id=None):
+        response = self.client.get(f'/api/projects/{project_id or self.project.id}/events/', HTTP_ACCEPT='text/event-stream')
+        self.addCleanup(response.close)
+        return response
+
+    def next_event(self, chunks):
+        for chunk in chunks:
+            if chunk.startswith(b'event: '):
+                head, data = chunk.decode().strip().split('\n')
+                return head[len('event: '):], json.loads(data[len('data: '):])
+        self.fail('The stream ended without an event')
+
+    def test_stream_delivers_changes(self):
+        response = self.open_stream()
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        chunks = iter(response.streaming_content)
+        self.assertEqual(next(chunks), b'retry: 3000\n\n')
+        channel = events.channel(self.project.id)
+        self.assertTrue(events.broker().has_listeners(channel))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            feedback = Feedback.objects.create(project=self.project, user=self.user, comment='Live comment')
+        event_type, data = self.next_event(chunks)
+        self.assertEqual(event_type, 'feedback')
+        self.assertEqual((data['id'], data['username'], data['comment']), (feedback.id, 'testuser', 'Live comment'))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Rating.objects.create(project=self.project, user=self.user, creativity=4, technical_skills=4, impact=4, presentation=4)
+        self.assertEqual(self.next_event(chunks), ('ratings', ratings.summarize(self.project.rating_stats)))
+
+        self.client.force_authenticate(self.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post('/api/reactions/toggle/', {'project': self.project.id, 'reaction_type': 'Like'})
+        event_type, data = self.next_event(chunks)
+        self.assertEqual((event_type, data['Like']), ('reactions', 1))
+
+        feedback_id = feedback.id
+        with self.captureOnCommitCallbacks(execute=True):
+            feedback.delete()
+        self.assertEqual(self.next_event(chunks), ('feedback_deleted', {'id': feedback_id}))
+
+        response.close()
+        self.assertFalse(events.broker().has_listeners(channel))
+
+    def test_unwatched_projects_publish_nothing(self):
+        with mock.patch.object(events.broker(), 'publish') as publish:
+            with self.captureOnCommitCallbacks(execute=True):
+                Feedback.objects.create(project=self.project, user=self.user, comment='Nobody is watching')
+        publish.assert_not_called()
+
+    def test_unknown_project(self):
+        response = self.client.get('/api/projects/999999/events/', HTTP_ACCEPT='text/event-stream')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    @override_settings(EVENTS_STREAM_TIMEOUT=0.3)
+    async def test_async_stream_ends_after_timeout(self):
+        response = await self.async_client.get(f'/api/projects/{self.project.id}/events/')
+        chunks = aiter(response.streaming_content)
+        self.assertEqual(await anext(chunks), b'retry: 3000\n\n')
+        events.broker().publish(events.channel(self.project.id), {'type': 'reactions', 'data': {'Like': 2}})
+        self.assertEqual(await anext(chunks), b'event: reactions\ndata: {"Like":2}\n\n')
+        self.assertTrue(all([chunk == b': keepalive\n\n' async for chunk in chunks]))
+        self.assertFalse(events.broker().has_listeners(events.channel(self.project.id)))
+
+    def test_local_socket_broker_forwards_between_brokers(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, True)
+        publisher, listener = events.LocalSocketBroker(directory), events.LocalSocketBroker(directory)
+        self.addCleanup(listener.close)
+        subscription = listener.subscribe('project:1')
+        # Left behind by a worker that exited without cleaning up
+        stale = os.path.join(directory, 'stale.sock')
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        sock.bind(stale)
+        sock.close()
+
+        self.assertTrue(publisher.has_listeners('project:1'))
+        publisher.publish('project:1', {'type': 'feedback_deleted', 'data': {'id': 3}})
+        self.assertEqual(subscription.get(timeout=2), {'type': 'feedback_deleted', 'data': {'id': 3}})
+        self.assertFalse(os.path.exists(stale))
+
+
+class ModerationQueueTestCase(BaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.moderator = User.objects.create_user(
+            username='moderator', email='moderator@example.com', password='password123', role='Admin'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.moderator)
+        self.project = Project.objects.create(user=self.user, title='Reported', description='', category='Research')
+        self.other = Project.objects.create(user=self.user, title='Quiet', description='', category='Research')
+        self.spam = Feedback.objects.create(project=self.project, user=self.user, comment='Buy now')
+        self.fine = Feedback.objects.create(project=self.project, user=self.user, comment='Nice work')
+        self.reports = [
+            Report.objects.create(reported_by=self.user, project=self.project, feedback=self.spam, reason='spam')
+            for _ in range(3)
+        ] + [
+            Report.objects.create(reported_by=self.user, project=self.project, feedback=self.fine, reason='rude'),
+            Report.objects.create(reported_by=self.user, project=self.other, reason='copied'),
+        ]
+
+    def test_queue_oldest_first(self):
+        response = self.client.get('/api/reports/queue/', {'page_size': 2})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([report['id'] for report in response.data['results']], [r.id for r in self.reports[:2]])
+        first = response.data['results'][0]
+        self.assertEqual((first['reporter'], first['project_title'], first['comment']), ('testuser', 'Reported', 'Buy now'))
+
+        seen = [report['id'] for report in response.data['results']]
+        while response.data['next']:
+            response = self.client.get(response.data['next'])
+            seen += [report['id'] for report in response.data['results']]
+        self.assertEqual(seen, [report.id for report in self.reports])
+
+    def test_queue_grouped_largest_first(self):
+        response = self.client.get('/api/reports/queue/', {'group': 'feedback', 'page_size': 1})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        top = response.data['results'][0]
+        self.assertEqual((top['feedback'], top['count'], top['comment']), (self.spam.id, 3, 'Buy now'))
+        response = self.client.get(response.data['next'])
+        self.assertEqual([(group['feedback'], group['count']) for group in response.data['results']], [(self.fine.id, 1)])
+        self.assertIsNone(response.data['next'])
+
+        response = self.client.get('/api/reports/queue/', {'group': 'project'})
+        self.assertEqual(
+            [(group['project'], group['count'], group['title']) for group in response.data['results']],
+            [(self.project.id, 4, 'Reported'), (self.other.id, 1, 'Quiet')]
+        )
+
+    def test_queue_rejects_unknown_group(self):
+        response = self.client.get('/api/reports/queue/', {'group': 'user'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_moderators_only(self):
+        self.client.force_authenticate(user=self.user)
+        self.assertEqual(self.client.get('/api/reports/queue/').status_code, status.HTTP_403_FORBIDDEN)
+        response = self.client.post('/api/reports/transition/', {'action': 'dismiss', 'project': self.other.id}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_bulk_transition_is_one_update(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(
+                '/api/reports/transition/', {'action': 'resolve', 'project': self.project.id}, format='json'
+            )
+        self.assertEqual(response.data, {'updated': 4, 'hidden_feedback': 0})
+        self.assertEqual(len([query for query in queries if query['sql'].startswith('UPDATE')]), 1)
+        self.assertEqual(Report.objects.filter(status='Resolved').count(), 4)
+
+        response = self.client.post(
+            '/api/reports/transition/', {'action': 'dismiss', 'ids': [r.id for r in self.reports]}, format='json'
+        )
+        # Only the report that was still open moves
+        self.assertEqual(response.data, {'updated': 1, 'hidden_feedback': 0})
+        self.assertEqual(Report.objects.get(pk=self.reports[-1].id).status, 'Dismissed')
+        response = self.client.post('/api/reports/transition/', {'action': 'dismiss', 'project': self.other.id}, format='json')
+        self.assertEqual(response.data['updated'], 0)
+
+    def test_resolve_hides_comment(self):
+        url = f'/api/projects/{self.project.id}/feedback/'
+        self.assertEqual(len(self.client.get(url).data['results']), 2)
+        response = self.client.post(
+            '/api/reports/transition/', {'action': 'resolve', 'feedback': self.spam.id, 'hide_feedback': True}, format='json'
+        )
+        self.assertEqual(response.data, {'updated': 3, 'hidden_feedback': 1})
+        self.spam.refresh_from_db()
+        self.assertTrue(self.spam.is_hidden)
+        self.assertEqual([feedback['id'] for feedback in self.client.get(url).data['results']], [self.fine.id])
+        response = self.client.get(f'/api/projects/{self.project.id}/', {'expand': 'feedbacks'})
+        self.assertEqual([feedback['id'] for feedback in response.data['feedbacks']], [self.fine.id])
+        self.assertEqual(self.client.get(f'/api/feedbacks/{self.spam.id}/').status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_transition_validation(self):
+        for payload in (
+            {'action': 'dismiss', 'feedback': self.spam.id, 'hide_feedback': True},
+            {'action': 'resolve', 'project': self.project.id, 'feedback': self.spam.id},
+            {'action': 'resolve'},
+            {'action': 'escalate', 'project': self.project.id},
+        ):
+            response = self.client.post('/api/reports/transition/', payload, format='json')
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST, payload)
+        self.assertFalse(Report.objects.exclude(status='Pending').exists())
+
+
+class SharedCacheCheckTestCase(TestCase):
+    def test_several_workers_need_a_shared_cache(self):
+        self.assertEqual(checks.check_shared_cache(), [])
+        with mock.patch.dict(os.environ, {'WEB_CONCURRENCY': '4'}):
+            self.assertEqual([error.id for error in checks.check_shared_cache()], ['api.E001'])
+            with self.assertRaises(ImproperlyConfigured):
+                checks.require_shared_cache()
+            redis = {'default': {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': 'redis://cache:6379/0'}}
+            with override_settings(CACHES=redis):
+                self.assertEqual(checks.check_shared_cache(), [])
@@ -0,0 +1,238 @@
+"""
+Chunked, resumable uploads for project files.
+
+A client opens a session with the file's size (and optionally its SHA-256),
+then PATCHes the bytes in order, each request carrying the offset it starts at.
+Each chunk is read into a temporary file, kept in memory only up to
+FILE_UPLOAD_MAX_MEMORY_SIZE, and then copied onto the end of a partial file, so
+memory use does not depend on the chunk or file size, and an interrupted upload
+resumes from the last byte written. A chunk may carry its own checksum, which
+is verified before the offset moves. Once every byte has arrived the file's
+digest is checked and identical files are stored only once.
+
+Hashing and storing a large file takes seconds, so it happens after the last
+chunk's transaction has committed, while the session is 'Verifying'; holding
+the database's write lock for that long would block every other writer.
+"""
+import base64
+import hashlib
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files import File
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from django.utils.text import get_valid_filename
+from rest_framework.exceptions import APIException, ValidationError
+
+from .models import StoredFile, UploadSession
+
+BLOCK_SIZE = 64 * 1024
+CHECKSUM_ALGORITHMS = {'sha256': hashlib.sha256, 'md5': hashlib.md5}
+
+
+class OffsetMismatch(APIException):
+    status_code = 409
+    default_detail = 'Upload-Offset does not match the bytes received so far.'
+    default_code = 'offset_mismatch'
+
+
+class ChecksumMismatch(APIException):
+    status_code = 460
+    default_detail = 'The chunk does not match its Upload-Checksum.'
+    default_code = 'checksum_mismatch'
+
+
+def max_size():
+    return getattr(settings, 'RESUMABLE_UPLOAD_MAX_SIZE', 2 * 1024 ** 3)
+
+
+def max_chunk_size():
+    return getattr(settings, 'RESUMABLE_UPLOAD_CHUNK_SIZE', 16 * 1024 ** 2)
+
+
+def partial_path(session):
+    directory = settings.RESUMABLE_UPLOAD_DIR
+    os.makedirs(directory, exist_ok=True)
+    return os.path.join(directory, f'{session.pk}.part')
+
+
+def file_digest(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as handle:
+        for block in iter(lambda: handle.read(BLOCK_SIZE), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def parse_checksum(header):
+    """Parse an ``Upload-Checksum: <algorithm> <base64 digest>`` header into (hasher, digest)."""
+    try:
+        algorithm, encoded = header.split()
+        return CHECKSUM_ALGORITHMS[algorithm.lower()](), base64.b64decode(encoded, validate=True)
+    except (ValueError, KeyError, base64.binascii.Error):
+        raise ValidationError({'Upload-Checksum': 'Use "<sha256|md5> <base64 digest>".'})
+
+
+def check_appendable(session, offset, length):
+    if session.status == 'Verifying':
+        raise ValidationError({'detail': 'This upload is being verified.'})
+    if session.status != 'Active':
+        raise ValidationError({'detail': 'This upload is already complete.'})
+    if offset != session.offset:
+        raise OffsetMismatch()
+    if offset + length > session.size:
+        raise ValidationError({'Content-Length': 'The chunk runs past the declared upload size.'})
+
+
+def receive(stream, length, hasher=None):
+    """Read up to ``length`` bytes from ``stream`` into a temporary file; returns (file, bytes read)."""
+    chunk = tempfile.SpooledTemporaryFile(
+        max_size=settings.FILE_UPLOAD_MAX_MEMORY_SIZE, dir=settings.FILE_UPLOAD_TEMP_DIR,
+    )
+    received = 0
+    while received < length:
+        block = stream.read(min(BLOCK_SIZE, length - received))
+        if not block:
+            break
+        chunk.write(block)
+        if hasher:
+            hasher.update(block)
+        received += len(block)
+    chunk.seek(0)
+    return chunk, received
+
+
+def start(user, project, filename, size, content_type='', sha256=''):
+    """
+    Open an upload session. When the client sends the digest of a file it
+    has uploaded before, that file is attached straight away and no bytes
+    need to be sent. A digest alone proves nothing about anyone else's
+    files, so those are only shared once the bytes have been received.
+    """
+    if size > max_size():
+        raise ValidationError({'size': f'Files are at most {max_size()} bytes.'})
+    session = UploadSession.objects.create(
+        user=user, project=project, filename=get_valid_filename(filename)[:100],
+        content_type=content_type, size=size, sha256=sha256.lower(),
+    )
+    existing = None
+    if sha256:
+        existing = StoredFile.objects.filter(
+            digest=session.sha256, size=size, uploadsession__user=user, uploadsession__status='Complete',
+        ).first()
+    if existing is not None:
+        attach(session, existing)
+        return session
+    open(partial_path(session), 'wb').close()
+    if size == 0 and not finish(session):
+        raise ValidationError({'sha256': 'An empty file does not match the declared SHA-256.'})
+    return session
+
+
+def append(session_id, offset, stream, length, checksum=None):
+    """
+    Write ``length`` bytes read from ``stream`` at ``offset`` and return the
+    session. The chunk is received before any transaction opens, so a slow
+    client holds no lock. The offset is then claimed with a conditional
+    UPDATE, which only one of two requests for the same offset can win (a row
+    lock would not do: SQLite ignores select_for_update), and the winner
+    copies its chunk into the partial file before the claim commits.
+    """
+    if length > max_chunk_size():
+        raise ValidationError({'Content-Length': f'Chunks are at most {max_chunk_size()} bytes.'})
+    hasher, expected = parse_checksum(checksum) if checksum else (None, None)
+    session = UploadSession.objects.get(pk=session_id)
+    check_appendable(session, offset, length)
+
+    chunk, received = receive(stream, length, hasher)
+    with chunk:
+        if hasher and (received < length or hasher.digest() != expected):
+            raise ChecksumMismatch()
+        # Without a checksum a cut-off chunk still counts, so the client resumes after it
+        session.offset = offset + received
+        # Claimed here, so a retried last chunk cannot verify the file a second time
+        session.status = 'Verifying' if session.offset == session.size else 'Active'
+        session.updated_at = timezone.now()
+        with transaction.atomic():
+            claimed = UploadSession.objects.filter(pk=session.pk, status='Active', offset=offset).update(
+                offset=session.offset, status=session.status, updated_at=session.updated_at,
+            )
+            if not claimed:
+                check_appendable(UploadSession.objects.get(pk=session.pk), offset, length)
+                raise OffsetMismatch()
+            with open(partial_path(session), 'r+b') as handle:
+                # Drop anything a failed earlier attempt left past the offset
+                handle.seek(offset)
+                handle.truncate()
+                shutil.copyfileobj(chunk, handle, BLOCK_SIZE)
+    if session.status == 'Verifying' and not finish(session):
+        raise ValidationError({'sha256': 'The uploaded file does not match the declared SHA-256; upload it again.'})
+    return session
+
+
+def finish(session):
+    """
+    Verify and store a fully received file. Returns False if its digest is
+    not the declared one. Runs outside any transaction; only the final
+    bookkeeping in attach() writes to the database.
+    """
+    path = partial_path(session)
+    digest = file_digest(path)
+    if session.sha256 and digest != session.sha256:
+        # Start over: the assembled file is not the one the client meant to send
+        open(path, 'wb').close()
+        session.offset = 0
+        session.status = 'Active'
+        session.save(update_fields=['offset', 'status', 'updated_at'])
+        return False
+
+    stored = StoredFile.objects.filter(digest=digest).first()
+    if stored is None:
+        stored = StoredFile(digest=digest, size=session.size, content_type=session.content_type)
+        with open(path, 'rb') as handle:
+            stored.file.save(session.filename, File(handle), save=False)
+        try:
+            with transaction.atomic():
+                stored.save()
+        except IntegrityError:
+            # An identical file was stored concurrently
+            stored.file.delete(save=False)
+            stored = StoredFile.objects.get(digest=digest)
+    os.remove(path)
+    attach(session, stored)
+    return True
+
+
+def attach(session, stored):
+    session.stored_file = stored
+    session.offset = session.size
+    session.status = 'Complete'
+    with transaction.atomic():
+        session.save(update_fields=['stored_file', 'offset', 'status', 'updated_at'])
+        project = session.project
+        project.upload_path.name = stored.file.name
+        project.save(update_fields=['upload_path', 'updated_at'])
+
+
+def abort(session):
+    if os.path.exists(partial_path(session)):
+        os.remove(partial_path(session))
+    session.delete()
+
+
+def purge_stale(ttl=None):
+    """
+    Delete unfinished sessions idle for longer than ``ttl`` seconds, including
+    any whose verification was cut short. Returns how many.
+    """
+    ttl = ttl if ttl is not None else getattr(settings, 'RESUMABLE_UPLOAD_TTL', 24 * 60 * 60)
+    stale = UploadSession.objects.filter(status__in=['Active', 'Verifying'], updated_at__lt=timezone.now() - timedelta(seconds=ttl))
+    count = 0
+    for session in stale.iterator():
+        abort(session)
+        count += 1
+    return count
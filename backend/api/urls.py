@@ -1,5 +1,5 @@
 from django.urls import path, include
-from . import views
+from . import async_views, views
 from rest_framework import routers
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
 from .views import ProjectSearchView, UserRegistrationView, UserProjectsView
@@ -16,6 +16,7 @@ router.register('collaborations', views.CollaborationViewSet)
 router.register('notifications', views.NotificationViewSet)
 router.register('searchlogs', views.SearchLogViewSet)
 router.register('reports', views.ReportViewSet)
+router.register('uploads', views.UploadSessionViewSet, basename='upload')
 
 
 urlpatterns = [
@@ -25,5 +26,14 @@ urlpatterns = [
     path('auth/signup/', UserRegistrationView.as_view(), name='user_signup'),
     path('user/projects/', UserProjectsView.as_view(), name='user-projects'),
     path('projects/<int:project_id>/feedback/', views.ProjectFeedbackView.as_view(), name='project-feedback'),
+    path('projects/<int:project_id>/events/', views.ProjectEventsView.as_view(), name='project-events'),
+    path('leaderboard/', views.LeaderboardView.as_view(), name='leaderboard'),
+    path('images/', views.ImageUploadView.as_view(), name='image-upload'),
+    path('user/avatar/', views.AvatarView.as_view(), name='user-avatar'),
+    # Async counterparts of the hot read paths, for ASGI servers
+    path('async/projects/', async_views.project_list, name='async-project-list'),
+    path('async/projects/search/', async_views.project_search, name='async-project-search'),
+    path('async/projects/<int:pk>/', async_views.project_detail, name='async-project-detail'),
+    path('async/projects/<int:project_id>/feedback/', async_views.project_feedback, name='async-project-feedback'),
     path('', include(router.urls)),
 ]
\ No newline at end of file
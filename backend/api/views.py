@@ -1,5 +1,14 @@
+from itertools import islice
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.db import transaction
+from django.http import HttpResponse, StreamingHttpResponse
 from django.shortcuts import render
-from rest_framework import viewsets
+from django.utils.crypto import constant_time_compare
+from django.views import static
+from rest_framework import mixins, viewsets
 from .models import *
 from .serializers import *
 from rest_framework.views import APIView
@@ -7,15 +16,23 @@ from rest_framework.response import Response
 from rest_framework import status
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from rest_framework.decorators import action
-from rest_framework.exceptions import PermissionDenied
+from rest_framework.exceptions import NotFound, PermissionDenied, ValidationError
+from rest_framework.utils.encoders import JSONEncoder
+from rest_framework.utils.urls import replace_query_param
+from . import events, facets, fieldsets, idempotency, images, jobs, leaderboard, metrics, moderation, notifications, ratings, reactions, search, search_logs, uploads
+from .caching import ConditionalCacheMixin
+from .pagination import FeedbackThreadPagination, KeysetPagination, ModerationQueuePagination, ReportGroupPagination
+from .renderers import EventStreamRenderer, FastJSONRenderer
+from .permissions import IsAdminRole
 
 class UserViewSet(viewsets.ModelViewSet):
     queryset = User.objects.all()
     serializer_class = UserSerializer
 
-class ProjectViewSet(viewsets.ModelViewSet):
+class ProjectViewSet(ConditionalCacheMixin, viewsets.ModelViewSet):
     queryset = Project.objects.all()
     serializer_class = ProjectSerializer
+    pagination_class = KeysetPagination
 
     def get_permissions(self):
         if self.action in ['list', 'retrieve']:
@@ -26,9 +43,48 @@ class ProjectViewSet(viewsets.ModelViewSet):
 
     def get_queryset(self):
         if self.action in ['list', 'retrieve']:
-            return Project.objects.all()
+            # Only the columns, joins and prefetches the requested fields read
+            keep = [field.lstrip('-') for field in self.pagination_class.ordering]
+            queryset = Project.objects.all()
+            if self.action == 'list':
+                filters = self.selected_filters()
+                rating_index = facets.use_rating_index(filters, self.paginator.get_page_size(self.request))
+                queryset = facets.filter_queryset(queryset, filters, rating_index=rating_index)
+            return fieldsets.shape(queryset, ProjectSerializer, self.selected_fields(), keep)
         return Project.objects.filter(user=self.request.user)
 
+    def selected_fields(self):
+        if not hasattr(self, '_selected_fields'):
+            self._selected_fields = fieldsets.from_request(self.request, ProjectSerializer)
+        return self._selected_fields
+
+    def selected_filters(self):
+        if not hasattr(self, '_selected_filters'):
+            self._selected_filters = facets.from_request(self.request)
+        return self._selected_filters
+
+    def get_serializer(self, *args, **kwargs):
+        if self.action in ['list', 'retrieve']:
+            kwargs['fields'] = self.selected_fields()
+        return super().get_serializer(*args, **kwargs)
+
+    def get_cache_resources(self):
+        if self.action == 'retrieve':
+            return [f"project:{self.kwargs['pk']}", 'users']
+        return ['projects', 'users']
+
+    def list(self, request, *args, **kwargs):
+        def build():
+            names = facets.requested(request)
+            data = super(ProjectViewSet, self).list(request, *args, **kwargs).data
+            if names:
+                data['facets'] = facets.count(self.selected_filters(), names)
+            return data
+        return self.cached_response(request, build)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(request, lambda: super(ProjectViewSet, self).retrieve(request, *args, **kwargs).data)
+
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
 
@@ -37,7 +93,7 @@ class ProjectViewSet(viewsets.ModelViewSet):
             raise PermissionDenied("You can only edit your own projects")
         serializer.save()
 
-class FeedbackViewSet(viewsets.ModelViewSet):
+class FeedbackViewSet(ConditionalCacheMixin, viewsets.ModelViewSet):
     queryset = Feedback.objects.all()
     serializer_class = FeedbackSerializer
 
@@ -50,11 +106,25 @@ class FeedbackViewSet(viewsets.ModelViewSet):
 
     def get_queryset(self):
         if self.action in ['list', 'retrieve']:
-            return Feedback.objects.all()
+            return Feedback.objects.filter(is_hidden=False)
         return Feedback.objects.filter(user=self.request.user)
 
+    def get_cache_resources(self):
+        if self.action == 'retrieve':
+            return [f"feedback:{self.kwargs['pk']}"]
+        return ['feedbacks']
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(request, lambda: super(FeedbackViewSet, self).list(request, *args, **kwargs).data)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(request, lambda: super(FeedbackViewSet, self).retrieve(request, *args, **kwargs).data)
+
     def perform_create(self, serializer):
-        serializer.save(user=self.request.user)
+        # The notification job commits with the row; the fan-out runs in a worker
+        with transaction.atomic():
+            feedback = serializer.save(user=self.request.user)
+            notifications.queue_project_event('feedback', feedback.project_id, feedback.user_id)
 
     def perform_update(self, serializer):
         if serializer.instance.user != self.request.user:
@@ -65,43 +135,215 @@ class RatingViewSet(viewsets.ModelViewSet):
     queryset = Rating.objects.all()
     serializer_class = RatingSerializer
 
+    def perform_create(self, serializer):
+        with transaction.atomic():
+            rating = serializer.save()
+            notifications.queue_project_event('rating', rating.project_id, rating.user_id)
+
+    @action(detail=False, methods=['post'])
+    def batch(self, request):
+        # Retries with the same Idempotency-Key replay the first response
+        return idempotency.idempotent(request, lambda: self.submit_batch(request))
+
+    def submit_batch(self, request):
+        serializer = RatingBatchSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        with transaction.atomic():
+            created = ratings.submit_batch(request.user.id, serializer.validated_data['ratings'])
+            jobs.enqueue_many(notifications.PROJECT_EVENT, [
+                {'event': 'rating', 'project': project_id, 'actor': request.user.id}
+                for project_id, was_created in created.items() if was_created
+            ])
+        results = [{'project': project_id, 'created': was_created} for project_id, was_created in created.items()]
+        return Response({
+            'created': sum(created.values()),
+            'updated': len(created) - sum(created.values()),
+            'results': results,
+        }, status=status.HTTP_201_CREATED if any(created.values()) else status.HTTP_200_OK)
+
 class ReactionViewSet(viewsets.ModelViewSet):
     queryset = Reaction.objects.all()
     serializer_class = ReactionSerializer
 
+    def get_permissions(self):
+        if self.action in ['list', 'retrieve', 'counts']:
+            permission_classes = [AllowAny]
+        else:
+            permission_classes = [IsAuthenticated]
+        return [permission() for permission in permission_classes]
+
+    def perform_create(self, serializer):
+        reaction = serializer.save()
+        reactions.recount([reaction.project_id])
+        reactions.publish_counts(reaction.project_id)
+
+    def perform_destroy(self, instance):
+        instance.delete()
+        reactions.recount([instance.project_id])
+        reactions.publish_counts(instance.project_id)
+
+    @action(detail=False, methods=['post'])
+    def toggle(self, request):
+        # Buffered write: the row and counters are updated with the next batch
+        serializer = ReactionToggleSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        project = serializer.validated_data['project']
+        reaction_type = serializer.validated_data['reaction_type']
+        active = reactions.toggle(project.id, request.user.id, reaction_type, serializer.validated_data['active'])
+        return Response({
+            'project': project.id,
+            'reaction_type': reaction_type,
+            'active': active,
+            'counts': reactions.counts(project.id),
+        }, status=status.HTTP_200_OK)
+
+    @action(detail=False, methods=['get'])
+    def counts(self, request):
+        try:
+            project_id = int(request.query_params['project'])
+        except (KeyError, ValueError):
+            return Response({'detail': 'A numeric project parameter is required.'}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({'project': project_id, 'counts': reactions.counts(project_id)}, status=status.HTTP_200_OK)
+
 class CollaborationViewSet(viewsets.ModelViewSet):
     queryset = Collaboration.objects.all()
     serializer_class = CollaborationSerializer
 
+    def perform_create(self, serializer):
+        with transaction.atomic():
+            collaboration = serializer.save()
+            notifications.queue_project_event(
+                'collaboration_request', collaboration.project_id, collaboration.user_id
+            )
+
+    def perform_update(self, serializer):
+        previous_status = serializer.instance.status
+        with transaction.atomic():
+            collaboration = serializer.save()
+            if collaboration.status != previous_status and collaboration.status != 'Pending':
+                notifications.queue_project_event(
+                    'collaboration_status', collaboration.project_id, self.request.user.id,
+                    recipient=collaboration.user_id, status=collaboration.status,
+                )
+
 class NotificationViewSet(viewsets.ModelViewSet):
     queryset = Notification.objects.all()
     serializer_class = NotificationSerializer
+    pagination_class = KeysetPagination
+
+    def get_queryset(self):
+        # Each user only sees their own inbox, newest first
+        inbox = Notification.objects.filter(user=self.request.user)
+        if self.action == 'list' and self.request.query_params.get('unread') in ('1', 'true'):
+            inbox = inbox.filter(is_read=False)
+        return inbox
+
+    @action(detail=False, methods=['get'])
+    def unread_count(self, request):
+        return Response({'unread': notifications.unread_count(request.user.id)}, status=status.HTTP_200_OK)
+
+    @action(detail=False, methods=['post'])
+    def mark_read(self, request):
+        # Without ids every unread notification of the user is marked read
+        serializer = NotificationMarkReadSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        updated = notifications.mark_read(request.user.id, serializer.validated_data.get('ids'))
+        return Response({
+            'updated': updated,
+            'unread': notifications.unread_count(request.user.id),
+        }, status=status.HTTP_200_OK)
 
 class SearchLogViewSet(viewsets.ModelViewSet):
     queryset = SearchLog.objects.all()
     serializer_class = SearchLogSerializer
 
+    @action(detail=False, methods=['get'], permission_classes=[IsAdminRole])
+    def analytics(self, request):
+        # Served from the daily rollups, not from the raw log rows
+        try:
+            days = min(max(int(request.query_params.get('days', 7)), 1), 365)
+            limit = min(max(int(request.query_params.get('limit', 10)), 1), 100)
+        except ValueError:
+            return Response({'detail': 'days and limit must be numbers.'}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(search_logs.analytics(days, limit), status=status.HTTP_200_OK)
+
 class ReportViewSet(viewsets.ModelViewSet):
     queryset = Report.objects.all()
     serializer_class = ReportSerializer
+
+    @action(detail=False, methods=['get'], permission_classes=[IsAdminRole])
+    def queue(self, request):
+        # Pending reports oldest first, or ?group=project|feedback for counts per target
+        group = request.query_params.get('group')
+        if group is None:
+            paginator = ModerationQueuePagination()
+            page = paginator.paginate_queryset(moderation.queue(), request, view=self)
+            return paginator.get_paginated_response(ModerationReportSerializer(page, many=True).data)
+        if group not in moderation.GROUPS:
+            raise ValidationError({'group': f"Choose from {', '.join(moderation.GROUPS)}."})
+        paginator = ReportGroupPagination(group)
+        page = paginator.paginate_queryset(moderation.groups(group), request, view=self)
+        return paginator.get_paginated_response(moderation.describe(page, group))
+
+    @action(detail=False, methods=['post'], permission_classes=[IsAdminRole])
+    def transition(self, request):
+        serializer = ReportTransitionSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        reports = moderation.select(data.get('ids'), data.get('project'), data.get('feedback'))
+        updated, hidden = moderation.transition(reports, moderation.TRANSITIONS[data['action']], data['hide_feedback'])
+        return Response({'updated': updated, 'hidden_feedback': hidden}, status=status.HTTP_200_OK)
     
 class ProjectSearchView(APIView):
+    permission_classes = [AllowAny]
+    page_size = 20
+    max_page_size = 100
+
     def get(self, request):
-        # Get the search keyword from the query parameters
+        # Get the search keyword and optional category filters from the query parameters
         keyword = request.query_params.get('q', '')
+        categories = [
+            category
+            for value in request.query_params.getlist('category')
+            for category in value.split(',') if category
+        ]
+        page = self.get_int_param(request, 'page', 1)
+        page_size = min(self.get_int_param(request, 'page_size', self.page_size), self.max_page_size)
+        fields = fieldsets.from_request(request, ProjectSerializer)
+        offset = (page - 1) * page_size
 
-        # Filter projects based on the keyword (search in title and description)
-        projects = Project.objects.filter(
-            title__icontains=keyword
-        ) | Project.objects.filter(
-            description__icontains=keyword
-        )
+        # Rank matches through the search index; without terms, show the newest projects
+        if search.tokenize(keyword):
+            ids = [project_id for project_id, score in search.search(keyword, categories, offset, page_size + 1)]
+        else:
+            projects = Project.objects.order_by('-created_at', '-id')
+            if categories:
+                projects = projects.filter(category__in=categories)
+            ids = list(projects.values_list('id', flat=True)[offset:offset + page_size + 1])
 
-        # Serialize the filtered projects
-        serializer = ProjectSerializer(projects, many=True)
+        has_next = len(ids) > page_size
+        ids = ids[:page_size]
+        if page == 1:
+            search_logs.record(request.user.id, keyword, len(ids))
+        projects = fieldsets.shape(Project.objects.filter(id__in=ids), ProjectSerializer, fields)
+        position = {project_id: index for index, project_id in enumerate(ids)}
+        projects = sorted(projects, key=lambda project: position[project.id])
 
-        # Return the serialized data
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        # Serialize the matching projects in rank order
+        serializer = ProjectSerializer(projects, many=True, fields=fields, context={'request': request})
+        next_link = None
+        if has_next:
+            next_link = replace_query_param(request.build_absolute_uri(), 'page', page + 1)
+        return Response({'next': next_link, 'results': serializer.data}, status=status.HTTP_200_OK)
+
+    def get_int_param(self, request, name, default):
+        try:
+            value = int(request.query_params.get(name, default))
+        except ValueError:
+            raise NotFound(f'Invalid {name}.')
+        if value < 1:
+            raise NotFound(f'Invalid {name}.')
+        return value
     
 class UserRegistrationView(APIView):
     def post(self, request):
@@ -111,19 +353,186 @@ class UserRegistrationView(APIView):
             return Response({"message": "User registered successfully!"}, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
-class ProjectFeedbackView(APIView):
+class ProjectFeedbackView(ConditionalCacheMixin, APIView):
     permission_classes = [AllowAny]
-    
+    EXPORT_CHUNK_SIZE = 500
+
+    def get_cache_resources(self):
+        # Comments embed their author's name and avatar
+        return [f"project:{self.kwargs['project_id']}", 'users']
+
     def get(self, request, project_id):
-        feedbacks = Feedback.objects.filter(project_id=project_id)
-        serializer = FeedbackSerializer(feedbacks, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        if request.query_params.get('export') == 'ndjson':
+            return self.export(request, project_id)
+        return self.cached_response(request, lambda: self.serialize(request, project_id))
+
+    def get_queryset(self, project_id):
+        return Feedback.objects.filter(project_id=project_id, is_hidden=False).select_related('user__avatar').only(
+            'id', 'project_id', 'user_id', 'comment', 'created_at', 'user__username', 'user__profile_picture',
+            'user__avatar__original', 'user__avatar__width', 'user__avatar__height', 'user__avatar__status',
+            'user__avatar__variants',
+        )
+
+    def serialize(self, request, project_id):
+        paginator = FeedbackThreadPagination()
+        page = paginator.paginate_queryset(self.get_queryset(project_id), request, view=self)
+        serializer = FeedbackThreadSerializer(page, many=True, context={'request': request})
+        return paginator.get_paginated_response(serializer.data).data
+
+    def export(self, request, project_id):
+        # One JSON object per line, read and written in chunks so memory stays flat
+        def rows():
+            encoder = JSONEncoder(ensure_ascii=False)
+            feedbacks = self.get_queryset(project_id).order_by('created_at', 'id').iterator(chunk_size=self.EXPORT_CHUNK_SIZE)
+            while True:
+                chunk = list(islice(feedbacks, self.EXPORT_CHUNK_SIZE))
+                if not chunk:
+                    return
+                data = FeedbackThreadSerializer(chunk, many=True, context={'request': request}).data
+                yield ''.join(encoder.encode(item) + '\n' for item in data)
+
+        content = rows()
+        if isinstance(request._request, ASGIRequest):
+            # Django 4.2 reads a sync iterator to the end before sending it under ASGI
+            content = iterate_in_thread(content)
+        response = StreamingHttpResponse(content, content_type='application/x-ndjson')
+        response['Content-Disposition'] = f'attachment; filename="project-{project_id}-feedback.ndjson"'
+        return response
+
+async def iterate_in_thread(iterator):
+    """Yield from a sync iterator, advancing it in the request's sync thread."""
+    advance = sync_to_async(next)
+    while (item := await advance(iterator, None)) is not None:
+        yield item
+
+class ProjectEventsView(APIView):
+    """Server-Sent Events with a project's new feedback, reactions and ratings (api/events.py)."""
+    permission_classes = [AllowAny]
+    renderer_classes = [FastJSONRenderer, EventStreamRenderer]
+
+    def get(self, request, project_id):
+        if not Project.objects.filter(pk=project_id).exists():
+            raise NotFound('No Project matches the given query.')
+        return events.stream(request._request, project_id)
+
+class ImageUploadView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        # Only the original is written here; variants are generated in the background
+        serializer = ImageUploadSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        asset, created = images.store(serializer.validated_data['image'], request.user)
+        return Response(
+            ImageAssetSerializer(asset, context={'request': request}).data,
+            status=status.HTTP_201_CREATED if created else status.HTTP_200_OK,
+        )
+
+class AvatarView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        serializer = ImageUploadSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        asset = images.set_avatar(request.user, serializer.validated_data['image'])
+        return Response(ImageAssetSerializer(asset, context={'request': request}).data, status=status.HTTP_200_OK)
+
+class UploadSessionViewSet(mixins.CreateModelMixin, mixins.RetrieveModelMixin, mixins.DestroyModelMixin,
+                           viewsets.GenericViewSet):
+    """
+    Resumable uploads of project files: POST opens a session, PATCH appends
+    the raw bytes starting at Upload-Offset, GET/HEAD report the offset to
+    resume from and DELETE abandons the upload.
+    """
+    serializer_class = UploadSessionSerializer
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        return UploadSession.objects.filter(user=self.request.user).select_related('stored_file')
+
+    def upload_headers(self, session):
+        return {'Upload-Offset': str(session.offset), 'Upload-Length': str(session.size)}
+
+    def create(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        session = uploads.start(
+            request.user, data['project'], data['filename'], data['size'],
+            data.get('content_type', ''), data.get('sha256', ''),
+        )
+        headers = {**self.upload_headers(session), 'Location': request.build_absolute_uri(f'{session.pk}/')}
+        return Response(self.get_serializer(session).data, status=status.HTTP_201_CREATED, headers=headers)
+
+    def retrieve(self, request, *args, **kwargs):
+        session = self.get_object()
+        return Response(self.get_serializer(session).data, headers=self.upload_headers(session))
+
+    def partial_update(self, request, *args, **kwargs):
+        # The body is read from the raw stream in blocks, never parsed or buffered whole
+        session = self.get_object()
+        try:
+            offset = int(request.headers['Upload-Offset'])
+            length = int(request.headers['Content-Length'])
+        except (KeyError, ValueError):
+            return Response({'detail': 'Upload-Offset and Content-Length headers are required.'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        session = uploads.append(session.pk, offset, request._request, length, request.headers.get('Upload-Checksum'))
+        return Response(self.get_serializer(session).data, headers=self.upload_headers(session))
+
+    def perform_destroy(self, instance):
+        uploads.abort(instance)
+
+def prometheus_metrics(request):
+    # Plain Django view: scrapes skip DRF's authentication and content negotiation
+    token = getattr(settings, 'METRICS_TOKEN', '')
+    if token and not constant_time_compare(request.headers.get('Authorization', ''), f'Bearer {token}'):
+        return HttpResponse(status=401)
+    return HttpResponse(metrics.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+def serve_media(request, path):
+    response = static.serve(request, path, document_root=settings.MEDIA_ROOT)
+    if path.startswith('images/'):
+        # Content-addressed files never change, so clients may keep them for good
+        response['Cache-Control'] = images.IMMUTABLE_CACHE_CONTROL
+    return response
 
 class UserProjectsView(APIView):
     permission_classes = [IsAuthenticated]
     
     def get(self, request):
         # Get projects where the current user is the user
-        projects = Project.objects.filter(user=request.user)
-        serializer = ProjectSerializer(projects, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
\ No newline at end of file
+        fields = fieldsets.from_request(request, ProjectSerializer)
+        projects = fieldsets.shape(Project.objects.filter(user=request.user), ProjectSerializer, fields)
+        serializer = ProjectSerializer(projects, many=True, fields=fields, context={'request': request})
+        return Response(serializer.data, status=status.HTTP_200_OK)
+
+class LeaderboardView(APIView):
+    permission_classes = [AllowAny]
+
+    def get(self, request):
+        # Rankings come from a cached top-K that rating writes keep up to date
+        params = request.query_params
+        try:
+            board = leaderboard.board_params(
+                metric=params.get('metric', 'overall'),
+                window=params.get('window', 'all'),
+                category=params.get('category'),
+                event=params.get('event'),
+                start=params.get('start'),
+                end=params.get('end'),
+            )
+            limit = int(params.get('limit', leaderboard.BOARD_SIZE))
+        except (leaderboard.InvalidBoard, ValueError) as error:
+            return Response({'detail': str(error)}, status=status.HTTP_400_BAD_REQUEST)
+        if leaderboard.is_custom(board) and not IsAdminRole().has_permission(request, self):
+            # Ad hoc windows are built from the ratings on every request
+            raise PermissionDenied('Only admins may rank a custom window; use a named event.')
+
+        return Response({
+            'metric': board['metric'],
+            'window': board['window'],
+            'category': board['category'],
+            'event': board['event'],
+            'results': leaderboard.top(board, max(limit, 1)),
+        }, status=status.HTTP_200_OK)
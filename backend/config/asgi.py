@@ -11,6 +11,11 @@ import os
 
 from django.core.asgi import get_asgi_application
 
+from api.checks import require_shared_cache
+
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
 
 application = get_asgi_application()
+
+# Several workers must share one cache; see api/checks.py
+require_shared_cache()
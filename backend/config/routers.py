@@ -0,0 +1,42 @@
+import random
+from contextvars import ContextVar
+
+from django.conf import settings
+
+# Set once a request has written, so its later reads see its own writes
+_pinned_to_primary = ContextVar('pinned_to_primary', default=False)
+
+
+def unpin(**kwargs):
+    _pinned_to_primary.set(False)
+
+
+class PrimaryReplicaRouter:
+    """
+    Sends writes to the primary ('default') and spreads reads over the aliases
+    in settings.DATABASE_REPLICAS. After the first write in a request, reads
+    stay on the primary until the request finishes so replication lag never
+    hides the client's own changes.
+    """
+
+    def replicas(self):
+        return getattr(settings, 'DATABASE_REPLICAS', [])
+
+    def db_for_read(self, model, **hints):
+        replicas = self.replicas()
+        if not replicas or _pinned_to_primary.get():
+            return 'default'
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        _pinned_to_primary.set(True)
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {'default', *self.replicas()}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == 'default'
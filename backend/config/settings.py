@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/4.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -47,6 +48,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'api.middleware.PerformanceMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -81,11 +83,66 @@ WSGI_APPLICATION = 'config.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+# DB_ENGINE selects the profile: 'sqlite' (default) or 'postgres'. Reads go to
+# the replicas listed in DATABASE_REPLICAS and writes to 'default', see
+# config/routers.py. Connections are kept open for CONN_MAX_AGE seconds and
+# reused across requests; put PgBouncer in front of Postgres for a shared pool.
+
+DB_ENGINE = os.environ.get('DB_ENGINE', 'sqlite')
+CONN_MAX_AGE = int(os.environ.get('DB_CONN_MAX_AGE', 600))
+
+if DB_ENGINE == 'postgres':
+    def postgres_database(host):
+        return {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.environ.get('POSTGRES_DB', 'void'),
+            'USER': os.environ.get('POSTGRES_USER', 'void'),
+            'PASSWORD': os.environ.get('POSTGRES_PASSWORD', ''),
+            'HOST': host,
+            'PORT': os.environ.get('POSTGRES_PORT', '5432'),
+            'CONN_MAX_AGE': CONN_MAX_AGE,
+            'CONN_HEALTH_CHECKS': True,
+            # Server-side cursors do not survive PgBouncer's transaction pooling
+            'DISABLE_SERVER_SIDE_CURSORS': os.environ.get('PGBOUNCER') == '1',
+        }
+
+    DATABASES = {'default': postgres_database(os.environ.get('POSTGRES_HOST', 'localhost'))}
+    replica_hosts = [host for host in os.environ.get('POSTGRES_REPLICA_HOSTS', '').split(',') if host]
+    for index, host in enumerate(replica_hosts, start=1):
+        DATABASES[f'replica{index}'] = {**postgres_database(host), 'TEST': {'MIRROR': 'default'}}
+else:
+    SQLITE_PATH = Path(os.environ.get('SQLITE_PATH', BASE_DIR / 'db.sqlite3'))
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': SQLITE_PATH,
+            'CONN_MAX_AGE': CONN_MAX_AGE,
+            # Seconds to wait for the write lock (sqlite's busy_timeout)
+            'OPTIONS': {'timeout': 20},
+        }
     }
+    # With WAL, read-only connections to the same file read concurrently with the writer
+    for index in range(1, int(os.environ.get('SQLITE_READ_REPLICAS', 0)) + 1):
+        DATABASES[f'replica{index}'] = {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': f'file:{SQLITE_PATH}?mode=ro',
+            'CONN_MAX_AGE': CONN_MAX_AGE,
+            'OPTIONS': {'timeout': 20},
+            'TEST': {'MIRROR': 'default'},
+        }
+
+DATABASE_REPLICAS = [alias for alias in DATABASES if alias != 'default']
+DATABASE_ROUTERS = ['config.routers.PrimaryReplicaRouter']
+
+# Applied to every new SQLite connection (api/signals.py)
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': 20000,
+    'mmap_size': 256 * 1024 * 1024,
+    'cache_size': -32000,
+    'temp_store': 'MEMORY',
+    'foreign_keys': 'ON',
 }
 
 
@@ -125,6 +182,20 @@ USE_TZ = True
 
 STATIC_URL = 'static/'
 
+# Uploaded files. Images are stored content-addressed under media/images/
+MEDIA_URL = '/media/'
+MEDIA_ROOT = Path(os.environ.get('MEDIA_ROOT', BASE_DIR / 'media'))
+
+# Resumable uploads (api/uploads.py) are assembled here before they are stored
+RESUMABLE_UPLOAD_DIR = Path(os.environ.get('RESUMABLE_UPLOAD_DIR', BASE_DIR / 'partial_uploads'))
+RESUMABLE_UPLOAD_MAX_SIZE = 2 * 1024 ** 3
+RESUMABLE_UPLOAD_CHUNK_SIZE = 16 * 1024 ** 2
+# Unfinished sessions idle for longer are removed by purge_stale_uploads
+RESUMABLE_UPLOAD_TTL = 24 * 60 * 60
+
+# Largest image accepted by api/images.py; uploads are read into memory
+IMAGE_UPLOAD_MAX_SIZE = 20 * 1024 ** 2
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.2/ref/settings/#default-auto-field
 
@@ -135,11 +206,15 @@ CORS_ALLOW_ALL_ORIGINS = True #CHANGE THIS FOR PROD
 # REST Framework settings
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'api.authentication.CachedJWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
     ),
+    'DEFAULT_RENDERER_CLASSES': (
+        'api.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
 }
 
 # JWT settings
@@ -150,3 +225,67 @@ SIMPLE_JWT = {
     'ROTATE_REFRESH_TOKENS': False,
     'BLACKLIST_AFTER_ROTATION': True,
 }
+
+# Per-request SQL, serializer and total time as a Server-Timing header and as
+# per-view histograms at /metrics (api/metrics.py). Set METRICS_TOKEN to
+# require "Authorization: Bearer <token>" from the scraper.
+PERFORMANCE_METRICS = os.environ.get('PERFORMANCE_METRICS', '1') == '1'
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+
+# List serializers build rows from field accessors compiled once per list
+# (api/fast_serializers.py); False uses DRF's per-field path
+FAST_LIST_SERIALIZERS = True
+
+# Seconds an authenticated user's id, username, role and flags are reused
+# without reading the user row (api/authentication.py); 0 reads it every time
+AUTH_PRINCIPAL_TTL = int(os.environ.get('AUTH_PRINCIPAL_TTL', 60))
+# Principals kept per process; the least recently used are dropped beyond it
+AUTH_PRINCIPAL_CACHE_SIZE = 10000
+
+# Write-behind buffers (api/buffers.py) flush after this many writes,
+# or at the end of a request once the oldest write is this many seconds old
+WRITE_BEHIND_MAX_SIZE = 500
+WRITE_BEHIND_MAX_AGE = 1.0
+
+# Background jobs (api/jobs.py), run by `manage.py run_jobs`. A job is retried
+# with exponential backoff until it has failed JOB_MAX_ATTEMPTS times, and a
+# job locked for longer than JOB_LOCK_TIMEOUT seconds is assumed abandoned.
+JOB_BATCH_SIZE = 100
+JOB_MAX_ATTEMPTS = 5
+JOB_LOCK_TIMEOUT = 5 * 60
+
+# Live project updates over Server-Sent Events (api/events.py). The in-process
+# broker only reaches streams in the same worker; with several workers on one
+# host use 'api.events.LocalSocketBroker', which forwards events through Unix
+# sockets in EVENTS_SOCKET_DIR (a temporary directory by default). Streams
+# close after EVENTS_STREAM_TIMEOUT seconds and the browser reconnects.
+EVENTS_BROKER = os.environ.get('EVENTS_BROKER', 'api.events.InProcessBroker')
+EVENTS_SOCKET_DIR = os.environ.get('EVENTS_SOCKET_DIR', '')
+EVENTS_STREAM_TIMEOUT = 5 * 60
+EVENTS_HEARTBEAT = 15
+EVENTS_QUEUE_SIZE = 100
+
+# Named event windows for /api/leaderboard/?window=event&event=<name>, as
+# {'name': ('start', 'end')} dates. Only these boards are cached and kept up
+# to date by rating writes; admins may also pass start and end directly.
+LEADERBOARD_EVENTS = {}
+
+# Seconds a stored response is replayed for a retried Idempotency-Key
+IDEMPOTENCY_KEY_TTL = 24 * 60 * 60
+
+# Cache for response bodies, version stamps and leaderboards. The in-process
+# default is per worker, so running several workers (WEB_CONCURRENCY > 1)
+# needs REDIS_URL, e.g. redis://localhost:6379/0, for invalidations to reach
+# all of them; api/checks.py refuses to start them otherwise.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'void-default',
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    }
+}
+if os.environ.get('REDIS_URL'):
+    CACHES['default'] = {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.environ['REDIS_URL'],
+    }
@@ -14,12 +14,20 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
+from django.conf import settings
 from django.contrib import admin
-from django.urls import path
+from django.urls import path, re_path
 from django.urls import include
 
+from api.views import prometheus_metrics, serve_media
+
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/', include('api.urls')),
+    path('metrics', prometheus_metrics, name='metrics'),
 ]
+
+if settings.DEBUG:
+    # In production the web server serves MEDIA_ROOT with the same headers
+    urlpatterns += [re_path(r'^media/(?P<path>.*)$', serve_media)]